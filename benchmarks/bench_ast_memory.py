@@ -0,0 +1,47 @@
+"""AST 内存基准：解析完成、token 释放后，AST 仍占用的每源码行字节数
+
+长期运行的进程会常驻大量已解析模块，这里统计的就是它们的常驻开销。
+
+用法: python benchmarks/bench_ast_memory.py [代码片段数]
+"""
+import gc
+import sys
+import tracemalloc
+
+from common import count_nodes, generate_source
+
+from src.lexer import Lexer
+from src.parser import Parser
+
+
+def retained(func):
+    """返回 func 的结果，以及其中间数据被释放后结果仍占用的内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = generate_source(blocks)
+    lines = source.count('\n')
+    print(f"源码: {lines} 行")
+
+    cases = [
+        ('TokenStore', lambda: Parser(Lexer(source).tokenize()).parse()),
+        ('流式token', lambda: Parser(Lexer(source).iter_tokens()).parse()),
+    ]
+    for label, func in cases:
+        ast, size = retained(func)
+        nodes = count_nodes(ast)
+        print(f"{label:<10} 节点: {nodes:>8}  {size / lines:7.1f} 字节/行  {size / nodes:6.1f} 字节/节点")
+        del ast
+
+
+if __name__ == '__main__':
+    main()
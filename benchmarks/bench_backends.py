@@ -0,0 +1,60 @@
+"""执行后端基准：循环密集的程序分别在树遍历解释器和闭包编译后端上运行
+
+用法: python benchmarks/bench_backends.py [外层循环次数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+
+PROGRAM = '''
+def public square(x) {{
+    return x * x
+}}
+total = 0
+for(i = 0, i < {n}, i = i + 1) {{
+    for(j = 0, j < 100, j = j + 1) {{
+        total = total + i * j - j
+    }}
+    total = total + square(i)
+}}
+k = 0
+while(k < {n} * 10) {{
+    k = k + 1
+}}
+print(total + k)
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+]
+
+
+def run(interpreter_class, ast):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        interpreter_class().interpret(ast)
+    return output.getvalue()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    ast = Parser(Lexer(PROGRAM.format(n=n)).tokenize()).parse()
+    print(f"循环体执行约 {n * 100 + n * 10} 次")
+
+    baseline = None
+    for name, interpreter_class in BACKENDS:
+        elapsed, output = best_of(lambda: run(interpreter_class, ast))
+        baseline = baseline or elapsed
+        print(f"{name:<8} {elapsed * 1000:9.2f} ms  加速比 {baseline / elapsed:5.2f}x  输出: {output.strip()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""函数调用开销基准：全局变量从 10 个增加到 10 万个时，每次调用的耗时
+
+每次调用只为参数和局部变量分配栈帧，调用开销应当与全局变量的数量无关。
+
+用法: python benchmarks/bench_calls.py [调用次数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+PROGRAM = '''
+def public add(x, y) {{
+    z = x + y
+    return z + g0
+}}
+total = 0
+for(i = 0, i < {calls}, i = i + 1) {{
+    total = add(total, i)
+}}
+print(total)
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+GLOBAL_COUNTS = [10, 100, 1000, 10000, 100000]
+
+
+def run(interpreter, ast):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret(ast)
+    return output.getvalue()
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ast = Parser(Lexer(PROGRAM.format(calls=calls)).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    print(f"每轮调用 {calls} 次，单位: 微秒/次")
+    print(f"{'全局变量数':<10}" + ''.join(f"{name:>12}" for name, _ in BACKENDS))
+    for global_count in GLOBAL_COUNTS:
+        row = f"{global_count:<15}"
+        for _, interpreter_class in BACKENDS:
+            interpreter = interpreter_class()
+            interpreter.globals.update((f"g{n}", n) for n in range(global_count))
+            elapsed, _ = best_of(lambda: run(interpreter, ast))
+            row += f"{elapsed / calls * 1e6:12.2f}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""批量语法检查基准：生成大量源文件，比较不同进程数下 check_files 的吞吐量
+
+用法: python benchmarks/bench_check.py [文件数] [每个文件的代码片段数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from common import generate_source
+
+from src.checker import available_cpus, check_files, collect_files
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        for n in range(count):
+            with open(os.path.join(directory, f"script{n}.bcs"), 'w', encoding='utf-8') as f:
+                f.write(generate_source(blocks))
+        files = collect_files([directory])
+        print(f"文件: {len(files)} 个, 每个 {blocks} 个代码片段, 可用CPU: {available_cpus()}")
+
+        jobs = 1
+        while True:
+            start = time.perf_counter()
+            results = check_files(files, jobs)
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for result in results if not result['ok'])
+            print(f"进程数 {jobs:>3}: {elapsed:7.2f} 秒  {len(files) / elapsed:8.1f} 文件/秒  失败: {failed}")
+            if jobs >= available_cpus():
+                break
+            jobs = min(jobs * 2, available_cpus())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""计数循环基准：for(i = 0, i < n, i = i + 1) 在顶层和函数中各执行 n 次（默认 1000 万次）
+
+函数中的循环分别以常量和参数为终点。
+
+树遍历和闭包后端比较按 range 执行计数循环和逐次执行条件、更新语句的
+一般方式（参照实现不识别计数循环）。字节码虚拟机用比较跳转和自增的超级
+指令执行同样的循环，一并列出作为对照。
+
+用法: python benchmarks/bench_counted_loops.py [循环次数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+WORKLOADS = {
+    # 顶层循环，循环变量按名字保存在全局变量中
+    '顶层': '''
+total = 0
+for(i = 0, i < {n}, i = i + 1) {{
+    total = total + i
+}}
+print(total)
+print(i)
+''',
+    # 函数中的循环，循环变量保存在局部变量槽位中
+    '函数': '''
+def public sum() {{
+    total = 0
+    for(i = 0, i < {n}, i = i + 1) {{
+        total = total + i
+    }}
+    return total + i
+}}
+print(sum())
+''',
+    # 终点是函数参数，在循环开始时读取一次
+    '参数': '''
+def public sum(n) {{
+    total = 0
+    for(i = 0, i < n, i = i + 1) {{
+        total = total + i
+    }}
+    return total + i
+}}
+print(sum({n}))
+''',
+}
+
+
+class GeneralInterpreter(Interpreter):
+    """参照实现：不识别计数循环"""
+
+    def counted_loop(self, node):
+        return None
+
+
+class GeneralClosureInterpreter(ClosureInterpreter):
+    """参照实现：不识别计数循环"""
+
+    def counted_loop(self, node):
+        return None
+
+
+VARIANTS = [
+    ('tree', GeneralInterpreter, Interpreter),
+    ('closure', GeneralClosureInterpreter, ClosureInterpreter),
+    ('vm', None, VMInterpreter),
+]
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(interpreter_class, ast):
+    output = io.StringIO()
+    interpreter = interpreter_class()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret(ast)
+    return output.getvalue()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    print(f"{n} 次循环，单位: 秒")
+    print(f"{'后端':<10}{'循环':<6}{'一般方式':>10}{'计数循环':>10}{'加速':>8}")
+    outputs = {name: set() for name in WORKLOADS}
+    for backend, general_class, interpreter_class in VARIANTS:
+        for name, source in WORKLOADS.items():
+            ast = parse(source.format(n=n))
+            counted, output = best_of(lambda: execute(interpreter_class, ast), repeat=1)
+            outputs[name].add(output)
+            if general_class is None:
+                print(f"{backend:<12}{name:<6}{'':>12}{counted:10.2f}")
+                continue
+            general, output = best_of(lambda: execute(general_class, ast), repeat=1)
+            outputs[name].add(output)
+            print(f"{backend:<12}{name:<6}{general:12.2f}{counted:10.2f}{general / counted:9.2f}x")
+    if any(len(values) != 1 for values in outputs.values()):
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""执行钩子基准：没有注册钩子时的执行路径与完全去掉调试检查的解释器一样快
+
+在树遍历解释器上比较：
+  去掉检查    interpret 中没有任何调试或钩子检查的参照实现
+  无钩子      当前的 Interpreter，没有注册钩子
+  调试检查    interpret 和各处理方法像以前一样每个节点检查 self.debug
+  空钩子      注册了一个不处理任何事件的 ExecutionHook，走通知钩子的路径
+分别运行以语句为主的循环和以函数调用为主的递归。每种方式在单独的进程中
+运行，几种方式轮流运行多轮，各自取最短耗时，减少机器负载波动的影响。
+
+用法: python benchmarks/bench_hooks.py [轮数]
+"""
+import contextlib
+import gc
+import io
+import subprocess
+import sys
+
+from common import best_of
+
+from src.hooks import ExecutionHook
+from src.interpreter import Interpreter, InterpreterError
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+
+WORKLOADS = {
+    # 顶层循环，语句多，函数调用少
+    'loop': '''
+total = 0
+for(i = 0, i < {n}, i = i + 1) {{
+    total = total + i
+}}
+print(total)
+''',
+    # 递归调用
+    'fib': '''
+def public fib(n) {{
+    if (n < 2) {{
+        return n
+    }}
+    return fib(n - 1) + fib(n - 2)
+}}
+print(fib({n}))
+''',
+}
+
+# 各负载的默认规模
+SIZES = {'loop': 100000, 'fib': 20}
+
+
+class BareInterpreter(Interpreter):
+    """参照实现：interpret 中没有任何检查"""
+
+    def interpret(self, node):
+        if node is None:
+            return None
+        handler = self.interpret_handlers.get(type(node))
+        if handler is None:
+            raise InterpreterError(f"未知的节点类型: {type(node)}", node)
+        return handler(node)
+
+
+class DebugCheckInterpreter(BareInterpreter):
+    """以前的做法：每个节点和语句列表、赋值、打印、调用都检查 self.debug"""
+
+    def __init__(self):
+        self.debug = False
+        super().__init__()
+
+    def interpret(self, node):
+        if node is None:
+            return None
+        if self.debug:
+            print(f"DEBUG: 正在解释节点: {type(node)}")
+        return super().interpret(node)
+
+    def interpret_list(self, node):
+        if self.debug:
+            print("DEBUG: 处理语句列表")
+        return super().interpret_list(node)
+
+    def interpret_assign(self, node):
+        if self.debug:
+            print(f"DEBUG: 处理赋值: {node.name} = {node.value}")
+        return super().interpret_assign(node)
+
+    def interpret_local_assign(self, node):
+        if self.debug:
+            print(f"DEBUG: 处理赋值: {node.name} = {node.value}")
+        return super().interpret_local_assign(node)
+
+    def interpret_print(self, node):
+        if self.debug:
+            print("DEBUG: 执行打印操作")
+        return super().interpret_print(node)
+
+    def interpret_call(self, node):
+        if self.debug:
+            print(f"DEBUG: 调用函数: {node.name}")
+        return super().interpret_call(node)
+
+
+def empty_hook_interpreter():
+    interpreter = Interpreter()
+    interpreter.add_hook(ExecutionHook())
+    return interpreter
+
+
+VARIANTS = [
+    ('去掉检查', BareInterpreter),
+    ('无钩子', Interpreter),
+    ('调试检查', DebugCheckInterpreter),
+    ('空钩子', empty_hook_interpreter),
+]
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(make_interpreter, ast):
+    output = io.StringIO()
+    interpreter = make_interpreter()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret(ast)
+    return output.getvalue()
+
+
+def run_variant(index, workload, n):
+    """在本进程中运行一种方式，输出最短耗时和程序输出
+
+    与 timeit 一样在计时期间关闭垃圾回收，回收的时机对几种方式的影响不同。
+    """
+    gc.disable()
+    _, make_interpreter = VARIANTS[index]
+    ast = parse(WORKLOADS[workload].format(n=n))
+    elapsed, output = best_of(lambda: execute(make_interpreter, ast))
+    print(elapsed, output.strip())
+
+
+def measure(index, workload, n):
+    """在新的进程中运行，避免几种方式互相影响 Python 对调用点的特化"""
+    result = subprocess.run([sys.executable, __file__, '--variant', str(index), workload, str(n)],
+                            capture_output=True, text=True, check=True)
+    elapsed, output = result.stdout.split(maxsplit=1)
+    return float(elapsed), output
+
+
+def main():
+    if sys.argv[1:2] == ['--variant']:
+        run_variant(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]))
+        return
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{rounds} 轮，单位: 毫秒")
+    print(f"{'方式':<10}" + ''.join(f"{f'{name}({SIZES[name]})':>16}{'相对':>8}" for name in WORKLOADS))
+    best = {}
+    outputs = {workload: set() for workload in WORKLOADS}
+    for round_index in range(rounds):
+        # 每轮从不同的方式开始，机器负载的周期性波动不会总是落在同一种方式上
+        first = round_index % len(VARIANTS)
+        indexes = list(range(first, len(VARIANTS))) + list(range(first))
+        for workload in WORKLOADS:
+            for index in indexes:
+                name = VARIANTS[index][0]
+                elapsed, output = measure(index, workload, SIZES[workload])
+                best[name, workload] = min(best.get((name, workload), elapsed), elapsed)
+                outputs[workload].add(output)
+    for name, _ in VARIANTS:
+        row = f"{name:<12}"
+        for workload in WORKLOADS:
+            elapsed = best[name, workload]
+            row += f"{elapsed * 1000:16.2f}{elapsed / best['去掉检查', workload]:8.2f}"
+        print(row)
+    if any(len(values) != 1 for values in outputs.values()):
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""内联缓存基准：放大 test.bcs 中的类和方法调用，比较各执行后端的耗时和缓存命中率
+
+循环中反复调用实例的方法、读取属性；step 函数交替接收两个类的实例，
+其中的调用点在两个类之间切换，命中率低于只见过一个类的调用点。
+
+用法: python benchmarks/bench_inline_cache.py [循环次数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+PROGRAM = '''
+class Animal {{
+    name = ""
+    age = 0
+    species = "未知"
+
+    def public init(self, name, age, species) {{
+        self.name = name
+        self.age = age
+        self.species = species
+    }}
+
+    def public grow(self) {{
+        self.age = self.age + 1
+    }}
+
+    def public describe(self) {{
+        text = "这是一只" + self.species + "，名字叫" + self.name
+    }}
+}}
+
+class Dog {{
+    name = ""
+    age = 0
+    breed = "未知"
+
+    def public init(self, name, age, breed) {{
+        self.name = name
+        self.age = age
+        self.breed = breed
+    }}
+
+    def public grow(self) {{
+        self.age = self.age + 1
+    }}
+
+    def public birthday(self) {{
+        self.grow()
+        text = "生日快乐，" + self.name + "!"
+    }}
+}}
+
+def public step(animal) {{
+    animal.grow()
+}}
+
+cat = Animal()
+cat.init("Whiskers", 3, "猫")
+dog = Dog()
+dog.init("Buddy", 2, "金毛猎犬")
+total = 0
+for(i = 0, i < {n}, i = i + 1) {{
+    cat.describe()
+    cat.grow()
+    dog.birthday()
+    step(cat)
+    step(dog)
+    total = total + cat.age + dog.age
+}}
+print(total)
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(interpreter_class, ast):
+    output = io.StringIO()
+    interpreter = interpreter_class()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret(ast)
+    return output.getvalue(), interpreter
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    source = PROGRAM.format(n=n)
+    print(f"循环 {n} 次")
+    print(f"{'后端':<10}{'毫秒':>10}{'命中':>12}{'未命中':>10}{'命中率':>10}")
+    outputs = set()
+    for name, interpreter_class in BACKENDS:
+        ast = parse(source)
+        elapsed, (output, _) = best_of(lambda: execute(interpreter_class, ast))
+        outputs.add(output)
+        # 命中计数保存在 AST 上，用新解析的 AST 单独执行一次来统计
+        _, interpreter = execute(interpreter_class, parse(source))
+        hits, misses = interpreter.inline_cache_stats()
+        print(f"{name:<12}{elapsed * 1000:10.2f}{hits:14}{misses:10}{hits / (hits + misses):11.2%}")
+    if len(outputs) != 1:
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""实例布局基准：创建 100 万个 test.bcs 中 Dog 那样的实例，统计内存和耗时
+
+内存一项在 Python 中直接创建实例并像 init 方法一样设置三个属性，全部
+保留在列表里，用 tracemalloc 统计平均每个实例占用的字节数，并单独计时。
+耗时一项在各执行后端上运行 BCC 循环：每次创建实例、调用 init 并读取属性。
+
+用法: python benchmarks/bench_instances.py [实例数]
+"""
+import contextlib
+import io
+import sys
+import tracemalloc
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter, BCCInstance
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+CLASS = '''
+class Dog {
+    name = ""
+    age = 0
+    breed = "未知"
+
+    def public init(self, name, age, breed) {
+        self.name = name
+        self.age = age
+        self.breed = breed
+    }
+}
+'''
+
+LOOP = '''
+total = 0
+for(i = 0, i < {n}, i = i + 1) {{
+    dog = Dog()
+    dog.init("Buddy", i, "金毛猎犬")
+    total = total + dog.age
+}}
+print(total)
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(interpreter_class, ast):
+    output = io.StringIO()
+    interpreter = interpreter_class()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret(ast)
+    return output.getvalue(), interpreter
+
+
+def create_instances(dog_class, n):
+    """像 init 方法一样创建 n 个实例"""
+    instances = []
+    for i in range(n):
+        dog = BCCInstance(dog_class)
+        dog.set_attribute('name', "Buddy")
+        dog.set_attribute('age', i)
+        dog.set_attribute('breed', "金毛猎犬")
+        instances.append(dog)
+    return instances
+
+
+def measure_memory(dog_class, n):
+    """n 个实例平均每个占用的字节数"""
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    instances = create_instances(dog_class, n)
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    # 不计列表本身和 age 的整数对象
+    used -= sys.getsizeof(instances) + sum(sys.getsizeof(i) for i in range(256, n))
+    return used / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{n} 个实例")
+    _, interpreter = execute(Interpreter, parse(CLASS))
+    dog_class = interpreter.globals['Dog']
+    print(f"内存: 每个实例 {measure_memory(dog_class, n):.1f} 字节")
+    elapsed, _ = best_of(lambda: create_instances(dog_class, n))
+    print(f"创建并设置属性: {elapsed:.2f} 秒，{elapsed / n * 1e6:.2f} 微秒/实例")
+    ast = parse(CLASS + LOOP.format(n=n))
+    outputs = set()
+    for name, interpreter_class in BACKENDS:
+        elapsed, (output, _) = best_of(lambda: execute(interpreter_class, ast), repeat=1)
+        outputs.add(output)
+        print(f"{name:<10}{elapsed:8.2f} 秒{elapsed / n * 1e6:8.2f} 微秒/实例")
+    if len(outputs) != 1:
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
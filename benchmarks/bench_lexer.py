@@ -0,0 +1,73 @@
+"""词法分析吞吐量基准：对比主模式扫描器与原逐字符扫描器（MB/s）
+
+用法: python benchmarks/bench_lexer.py [代码片段数]
+"""
+import os
+import sys
+import tempfile
+
+from common import best_of, generate_source
+from legacy_lexer import LegacyLexer
+
+from src.bcc_token import TokenType
+from src.lexer import Lexer
+from src.source import MappedSource
+
+
+def positions_match(source, tokens):
+    """每个token的行列号是否指向源码中它的第一个字符
+
+    行首偏移直接从源码中的换行算出，不经过 TokenStore 的位置计算。
+    """
+    line_starts = [0] + [index + 1 for index, char in enumerate(source) if char == '\n']
+    previous = -1
+    for token in tokens:
+        offset = line_starts[token.line - 1] + token.column - 1
+        if token.type == TokenType.EOF:
+            return offset == len(source) and offset > previous
+        text = f'"{token.value}"' if token.type == TokenType.STRING else str(token.value)
+        if offset <= previous or not source.startswith(text, offset):
+            return False
+        previous = offset
+    return False
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = generate_source(blocks)
+    size_mb = len(source.encode('utf-8')) / (1024 * 1024)
+    print(f"源码: {source.count(chr(10))} 行, {size_mb:.2f} MB")
+
+    legacy_time, legacy_tokens = best_of(lambda: LegacyLexer(source).tokenize())
+    store_time, store = best_of(lambda: Lexer(source).tokenize())
+    stream_time, stream_tokens = best_of(lambda: list(Lexer(source).iter_tokens()))
+
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.bcs', delete=False) as f:
+        f.write(source)
+    try:
+        with MappedSource(f.name) as mapped:
+            mapped_time, mapped_store = best_of(lambda: Lexer(mapped).tokenize())
+            mapped_tokens = [(t.type, t.value) for t in mapped_store]
+            mapped_positions = positions_match(source, mapped_store)
+    finally:
+        os.remove(f.name)
+
+    # 原扫描器的行列号计算方式不同，这里只比较类型和值
+    expected = [(t.type, t.value) for t in legacy_tokens]
+    same = expected == [(t.type, t.value) for t in store] == \
+           [(t.type, t.value) for t in stream_tokens] == mapped_tokens
+    positions = positions_match(source, store) and positions_match(source, stream_tokens) and \
+        mapped_positions
+
+    print(f"tokens: {len(store)}, 输出一致: {same}, 位置正确: {positions}")
+    print(f"LegacyLexer:           {legacy_time:.3f}s  {size_mb / legacy_time:8.2f} MB/s")
+    print(f"Lexer.tokenize:        {store_time:.3f}s  {size_mb / store_time:8.2f} MB/s"
+          f"  ({legacy_time / store_time:.1f}x)")
+    print(f"Lexer.iter_tokens:     {stream_time:.3f}s  {size_mb / stream_time:8.2f} MB/s"
+          f"  ({legacy_time / stream_time:.1f}x)")
+    print(f"MappedSource:          {mapped_time:.3f}s  {size_mb / mapped_time:8.2f} MB/s"
+          f"  ({legacy_time / mapped_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
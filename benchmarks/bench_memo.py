@@ -0,0 +1,71 @@
+"""memo 函数基准：递归的 fib 在各执行后端上不缓存和用 memo 缓存结果的耗时
+
+不缓存时调用次数随参数指数增长，memo 函数每个参数只执行一次。每次运行
+都使用新的解释器，缓存从空开始。最后一列是 cacheInfo 报告的缓存统计。
+
+用法: python benchmarks/bench_memo.py [fib 参数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+FIB = '''
+def public {modifier}fib(n) {{
+    if (n < 2) {{
+        return n
+    }}
+    return fib(n - 1) + fib(n - 2)
+}}
+print(fib({n}))
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(interpreter_class, ast):
+    output = io.StringIO()
+    interpreter = interpreter_class()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret(ast)
+    return output.getvalue(), interpreter
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    plain = parse(FIB.format(modifier='', n=n))
+    memo = parse(FIB.format(modifier='memo ', n=n))
+    print(f"fib({n})，单位: 毫秒")
+    print(f"{'后端':<10}{'不缓存':>10}{'memo':>10}{'加速':>10}  缓存")
+    outputs = set()
+    for name, interpreter_class in BACKENDS:
+        plain_time, (output, _) = best_of(lambda: execute(interpreter_class, plain))
+        outputs.add(output)
+        memo_time, (output, interpreter) = best_of(lambda: execute(interpreter_class, memo))
+        outputs.add(output)
+        info = interpreter.builtin_cache_info(['fib'])
+        print(f"{name:<12}{plain_time * 1000:10.2f}{memo_time * 1000:10.2f}{plain_time / memo_time:9.0f}x  {info}")
+    if len(outputs) != 1:
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
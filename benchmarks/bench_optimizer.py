@@ -0,0 +1,99 @@
+"""AST 优化基准：同一程序在各执行后端上分别以优化级别 0/1/2 运行
+
+程序在循环中计算字面量表达式、经过条件为常量的 if、调用小型函数，
+分别对应常量折叠、删除常量条件和函数内联。
+
+用法: python benchmarks/bench_optimizer.py [循环次数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter, BUILTIN_FUNCTIONS
+from src.lexer import Lexer
+from src.optimizer import Optimizer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+PROGRAM = '''
+def public add(x, y) {{
+    return x + y
+}}
+def public concat(str1, str2) {{
+    return str1 + str2
+}}
+def public scale(v) {{
+    return v * 60 * 60 / 1000
+}}
+total = 0
+text = ""
+for(i = 0, i < {n}, i = i + 1) {{
+    total = add(total, i * (24 * 7) - 3 * 56)
+    if (1 < 2) {{
+        total = total + scale(i)
+    }}
+    if (2 * 2 == 5) {{
+        print("unreachable")
+    }}
+    text = concat("a", "b")
+}}
+print(total)
+print(text)
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+LEVELS = [0, 1, 2]
+
+
+def prepare(source, level):
+    """解析并按优化级别优化，返回 AST 和改写次数"""
+    ast = Parser(Lexer(source).tokenize()).parse()
+    changes = 0
+    if level:
+        optimizer = Optimizer(level, BUILTIN_FUNCTIONS)
+        ast = optimizer.optimize(ast)
+        changes = optimizer.change_count
+    Resolver().resolve_program(ast)
+    return ast, changes
+
+
+def execute(interpreter_class, ast):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        interpreter_class().interpret(ast)
+    return output.getvalue()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    source = PROGRAM.format(n=n)
+    print(f"循环 {n} 次，单位: 毫秒")
+    print(f"{'后端':<10}" + ''.join(f"{f'-O{level}':>12}" for level in LEVELS) + f"{'O2 加速':>10}")
+    outputs = set()
+    for name, interpreter_class in BACKENDS:
+        row = f"{name:<12}"
+        times = []
+        for level in LEVELS:
+            ast, _ = prepare(source, level)
+            elapsed, output = best_of(lambda: execute(interpreter_class, ast))
+            outputs.add(output)
+            times.append(elapsed)
+            row += f"{elapsed * 1000:12.2f}"
+        row += f"{times[0] / times[-1]:9.2f}x"
+        print(row)
+    print(f"改写次数: " + ', '.join(f"-O{level} {prepare(source, level)[1]}" for level in LEVELS))
+    if len(outputs) != 1:
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
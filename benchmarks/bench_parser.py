@@ -0,0 +1,34 @@
+"""语法分析吞吐量基准：对大规模生成程序计时 Parser.parse，以每秒节点数报告
+
+词法分析只做一次，计时只覆盖语法分析本身。
+
+用法: python benchmarks/bench_parser.py [代码片段数]
+"""
+import sys
+
+from common import best_of, count_nodes, generate_source
+
+from src.lexer import Lexer
+from src.parser import Parser
+
+# 以表达式为主的程序：每个操作数都要经过完整的优先级处理
+EXPRESSION_SNIPPET = 'v{n} = a * {n} + b / 2 - (c + d) * e - f * g + h\n' \
+                     'if(v{n} + 1 >= w * 2 - {n}) {{ w = w + v{n} * 3 }}\n'
+
+
+def measure(label, text):
+    tokens = list(Lexer(text).tokenize())
+    elapsed, ast = best_of(lambda: Parser(tokens).parse())
+    nodes = count_nodes(ast)
+    print(f"{label:<8} tokens: {len(tokens):>8}  节点: {nodes:>8}  "
+          f"{elapsed * 1000:8.2f} ms  {nodes / elapsed / 1e6:6.2f} M节点/s")
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    measure('综合', generate_source(blocks))
+    measure('表达式', ''.join(EXPRESSION_SNIPPET.format(n=n) for n in range(blocks * 4)))
+
+
+if __name__ == '__main__':
+    main()
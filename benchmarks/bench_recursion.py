@@ -0,0 +1,125 @@
+"""递归调用基准：fib 和 ackermann 在各执行后端上每次调用的耗时，以及深递归
+
+return 不再通过异常逐层抛出，字节码虚拟机在同一个指令循环中执行函数调用。
+深递归一项把 max_recursion_depth 设为递归深度的两倍，检查能否执行完成。
+
+用法: python benchmarks/bench_recursion.py [fib 参数] [深递归层数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter, InterpreterError
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+FIB = '''
+def public fib(n) {{
+    if (n < 2) {{
+        return n
+    }}
+    return fib(n - 1) + fib(n - 2)
+}}
+print(fib({n}))
+'''
+
+ACKERMANN = '''
+def public ack(m, n) {{
+    if (m == 0) {{
+        return n + 1
+    }}
+    if (n == 0) {{
+        return ack(m - 1, 1)
+    }}
+    return ack(m - 1, ack(m, n - 1))
+}}
+print(ack(2, {n}))
+'''
+
+DEEP = '''
+def public depth(n) {{
+    if (n == 0) {{
+        return 0
+    }}
+    return depth(n - 1) + 1
+}}
+print(depth({n}))
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+
+def fib_calls(n):
+    """fib(n) 的调用次数"""
+    a, b = 1, 1
+    for _ in range(n):
+        a, b = b, a + b + 1
+    return a
+
+
+def ackermann_calls(m, n):
+    """ack(m, n) 的调用次数"""
+    calls = 0
+    stack = [m]
+    while stack:
+        m = stack.pop()
+        calls += 1
+        if m == 0:
+            n += 1
+        elif n == 0:
+            stack.append(m - 1)
+            n = 1
+        else:
+            stack.extend((m - 1, m))
+            n -= 1
+    return calls
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(interpreter_class, ast, **options):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        interpreter_class(**options).interpret(ast)
+    return output.getvalue()
+
+
+def main():
+    fib_n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    deep_n = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    ack_n = 30
+    cases = [
+        (f"fib({fib_n})", parse(FIB.format(n=fib_n)), fib_calls(fib_n)),
+        (f"ack(2, {ack_n})", parse(ACKERMANN.format(n=ack_n)), ackermann_calls(2, ack_n)),
+    ]
+    print("单位: 微秒/调用")
+    print(f"{'后端':<10}" + ''.join(f"{name:>16}" for name, _, _ in cases) + f"{f'深递归 {deep_n}':>16}")
+    deep = parse(DEEP.format(n=deep_n))
+    for name, interpreter_class in BACKENDS:
+        row = f"{name:<12}"
+        for _, ast, calls in cases:
+            elapsed, _ = best_of(lambda: execute(interpreter_class, ast))
+            row += f"{elapsed / calls * 1e6:16.2f}"
+        try:
+            output = execute(interpreter_class, deep, max_recursion_depth=deep_n * 2)
+            row += f"{'完成' if output.strip() == str(deep_n) else '结果错误':>14}"
+        except (InterpreterError, RecursionError) as e:
+            row += f"{type(e).__name__:>16}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
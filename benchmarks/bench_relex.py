@@ -0,0 +1,48 @@
+"""增量词法分析基准：模拟逐字符输入，对比 Lexer.relex 与整篇 tokenize 的单次耗时
+
+用法: python benchmarks/bench_relex.py [代码片段数]
+"""
+import random
+import sys
+import time
+
+from common import best_of, generate_source
+
+from src.lexer import Lexer
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    text = generate_source(blocks)
+    print(f"源码: {text.count(chr(10))} 行")
+
+    full_time, tokens = best_of(lambda: Lexer(text).tokenize())
+
+    # 在随机位置附近连续输入若干字符，模拟编辑器中的按键
+    random.seed(0)
+    keystrokes = 0
+    elapsed = 0.0
+    rescanned = 0
+    for _ in range(50):
+        position = text.index('\n', random.randrange(len(text) - 1))
+        for char in ' x = x + 1':
+            new_text = text[:position] + char + text[position:]
+            start = time.perf_counter()
+            tokens, first, stop = Lexer(new_text).relex(tokens, position, position, position + 1)
+            elapsed += time.perf_counter() - start
+            rescanned += stop - first
+            keystrokes += 1
+            text = new_text
+            position += 1
+
+    check = Lexer(text).tokenize()
+    same = [(t.type, t.value) for t in check] == [(t.type, t.value) for t in tokens]
+
+    print(f"tokens: {len(tokens)}, 结果一致: {same}")
+    print(f"整篇 tokenize: {full_time * 1000:8.2f} ms/次")
+    print(f"增量 relex:    {elapsed / keystrokes * 1000:8.2f} ms/按键"
+          f"  (平均重新扫描 {rescanned / keystrokes:.1f} 个token)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""增量语法分析基准：模拟逐字符输入，对比 IncrementalParser.edit 与整篇重新解析的单次耗时
+
+用法: python benchmarks/bench_reparse.py [代码片段数]
+"""
+import random
+import sys
+import time
+
+from common import best_of, generate_source, iter_nodes
+
+from src.incremental import IncrementalParser
+from src.lexer import Lexer
+from src.parser import Parser
+
+
+def shape(statements):
+    """AST 的节点类型和位置序列，用于比较两次解析的结果"""
+    return [(type(node).__name__, getattr(node, 'position', None)) for node in iter_nodes(statements)]
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    text = generate_source(blocks)
+    print(f"源码: {text.count(chr(10))} 行")
+
+    full_time, _ = best_of(lambda: Parser(Lexer(text).tokenize()).parse())
+    parser = IncrementalParser(text)
+
+    # 模拟编辑器中的输入：在数字字面量后逐个输入数字（不改变行数），以及在
+    # 两个代码片段之间插入新的一行（后面所有语句的行号都要平移）
+    random.seed(0)
+    keystrokes = 0
+    elapsed = 0.0
+    reparsed = 0
+    for _ in range(50):
+        position = parser.text.index(' = 0\n', random.randrange(len(parser.text) - 10)) + 4
+        edits = [(position + i, '1') for i in range(5)]
+        position = parser.text.index('// 第', random.randrange(len(parser.text) - 10))
+        edits.append((position, 'y = 1\n'))
+        for position, piece in edits:
+            start = time.perf_counter()
+            statements, changed = parser.edit(position, position, piece)
+            elapsed += time.perf_counter() - start
+            reparsed += len(changed)
+            keystrokes += 1
+
+    same = shape(statements) == shape(Parser(Lexer(parser.text).tokenize()).parse())
+    print(f"顶层语句: {len(statements)}, 结果一致: {same}")
+    print(f"整篇解析:   {full_time * 1000:8.2f} ms/次")
+    print(f"增量解析:   {elapsed / keystrokes * 1000:8.2f} ms/按键"
+          f"  (平均重新解析 {reparsed / keystrokes:.1f} 个顶层语句)")
+
+
+if __name__ == '__main__':
+    main()
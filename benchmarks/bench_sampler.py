@@ -0,0 +1,109 @@
+"""采样性能分析器的开销：各执行后端上打开和不打开采样时的耗时，以及确定性分析器的耗时
+
+采样在后台线程中进行，程序仍在原来的执行后端上执行；确定性分析器注册
+执行钩子，各后端都退回树遍历执行。取栈占比是采样线程取调用栈的时间占
+总耗时的比例，这段时间程序不能执行，机器负载波动较大时比耗时的差别可靠。
+
+用法: python benchmarks/bench_sampler.py [采样间隔(秒)] [轮数]
+"""
+import contextlib
+import io
+import sys
+
+from common import best_of
+
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter
+from src.lexer import Lexer
+from src.parser import Parser
+from src.profiler import Profiler, SamplingProfiler
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+PROGRAM = '''
+class Counter {
+    n = 0
+    def public bump(self, k) {
+        self.n = self.n + k
+    }
+}
+def public fib(n) {
+    if (n < 2) {
+        return n
+    }
+    return fib(n - 1) + fib(n - 2)
+}
+c = Counter()
+for(i = 0, i < 30000, i = i + 1) {
+    c.bump(i)
+}
+print(fib(20) + c.n)
+'''
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+
+def parse(source):
+    ast = Parser(Lexer(source).tokenize()).parse()
+    Resolver().resolve_program(ast)
+    return ast
+
+
+def execute(interpreter_class, ast, mode, interval):
+    """mode 为 None、'sample' 或 'profile'，返回程序输出、采样次数和采样线程取调用栈的时间"""
+    output = io.StringIO()
+    interpreter = interpreter_class()
+    sampler = None
+    if mode == 'sample':
+        sampler = SamplingProfiler(interpreter, interval)
+        sampler.start()
+    elif mode == 'profile':
+        profiler = Profiler()
+        interpreter.add_hook(profiler)
+    try:
+        with contextlib.redirect_stdout(output):
+            interpreter.interpret(ast)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+    if sampler is None:
+        return output.getvalue(), 0, 0.0
+    return output.getvalue(), sampler.sample_count, sampler.sampling_time
+
+
+def main():
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else 0.01
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    ast = parse(PROGRAM)
+    print(f"采样间隔 {interval * 1000:.1f} 毫秒，{rounds} 轮，单位: 毫秒")
+    print(f"{'后端':<10}{'不分析':>10}{'采样':>10}{'开销':>10}{'采样次数':>10}{'取栈占比':>10}"
+          f"{'确定性分析':>12}{'开销':>10}")
+    outputs = set()
+    for name, interpreter_class in BACKENDS:
+        best = {}
+        samples = 0
+        sampling_share = 0.0
+        # 几种方式轮流运行，减少机器负载波动的影响
+        for _ in range(rounds):
+            for mode in (None, 'sample', 'profile'):
+                elapsed, (output, count, sampling_time) = best_of(
+                    lambda: execute(interpreter_class, ast, mode, interval))
+                if mode == 'sample' and elapsed < best.get(mode, float('inf')):
+                    # 取栈期间程序不能执行，这部分时间不受机器负载波动的影响
+                    sampling_share = sampling_time / elapsed
+                best[mode] = min(best.get(mode, elapsed), elapsed)
+                samples = max(samples, count)
+                outputs.add(output)
+        base = best[None]
+        print(f"{name:<12}{base * 1000:10.1f}{best['sample'] * 1000:10.1f}{best['sample'] / base - 1:10.1%}"
+              f"{samples:12}{sampling_share:12.2%}{best['profile'] * 1000:14.1f}{best['profile'] / base - 1:10.0%}")
+    if len(outputs) != 1:
+        print("输出不一致!")
+
+
+if __name__ == '__main__':
+    main()
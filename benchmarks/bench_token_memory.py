@@ -0,0 +1,46 @@
+"""token 内存基准：对比 Token 对象列表与 TokenStore 的每token字节数
+
+用法: python benchmarks/bench_token_memory.py [代码片段数]
+"""
+import sys
+import tracemalloc
+
+from common import generate_source
+from legacy_lexer import LegacyLexer
+
+from src.lexer import Lexer
+
+
+def measure(func):
+    """返回 func 的结果及其仍然存活的内存（字节）"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = generate_source(blocks)
+    print(f"源码: {source.count(chr(10))} 行, {len(source.encode('utf-8')) / 1024 / 1024:.2f} MB")
+
+    legacy, legacy_bytes = measure(lambda: LegacyLexer(source).tokenize())
+    objects, object_bytes = measure(lambda: list(Lexer(source).iter_tokens()))
+    store, store_bytes = measure(lambda: Lexer(source).tokenize())
+    count = len(store)
+    del legacy, objects
+
+    print(f"tokens: {count}")
+    print(f"LegacyLexer 列表:      {legacy_bytes / count:7.1f} 字节/token")
+    print(f"Token 对象列表:        {object_bytes / count:7.1f} 字节/token")
+    print(f"TokenStore:            {store_bytes / count:7.1f} 字节/token")
+
+    # 访问位置信息会建立行首索引，计入总占用
+    _, index_bytes = measure(lambda: store[count // 2].line)
+    print(f"TokenStore + 行首索引: {(store_bytes + index_bytes) / count:7.1f} 字节/token")
+
+
+if __name__ == '__main__':
+    main()
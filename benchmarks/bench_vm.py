@@ -0,0 +1,123 @@
+"""字节码虚拟机基准：示例程序和合成循环分别在三个执行后端上运行
+
+vm 一列包含编译时间，vm(预编译) 一列只计执行时间，对应字节码缓存命中的情况。
+
+用法: python benchmarks/bench_vm.py [循环规模]
+"""
+import contextlib
+import glob
+import io
+import os
+import sys
+
+from common import ROOT, best_of
+
+from src.bytecode import Compiler
+from src.closure_interpreter import ClosureInterpreter
+from src.interpreter import Interpreter, InterpreterError
+from src.lexer import Lexer
+from src.parser import Parser
+from src.resolver import Resolver
+from src.vm import VMInterpreter
+
+BACKENDS = [
+    ('tree', Interpreter),
+    ('closure', ClosureInterpreter),
+    ('vm', VMInterpreter),
+]
+
+# 合成循环：名称和程序模板，{n} 为循环规模
+LOOPS = [
+    ('计数循环', '''
+i = 0
+while(i < {n} * 100) {{
+    i = i + 1
+}}
+print(i)
+'''),
+    ('嵌套for', '''
+total = 0
+for(i = 0, i < {n}, i = i + 1) {{
+    for(j = 0, j < 100, j = j + 1) {{
+        total = total + i * j - j
+    }}
+}}
+print(total)
+'''),
+    ('函数调用', '''
+def public square(x) {{
+    return x * x
+}}
+total = 0
+for(i = 0, i < {n} * 10, i = i + 1) {{
+    total = total + square(i)
+}}
+print(total)
+'''),
+    ('方法调用', '''
+class Counter {{
+    count = 0
+    def public add(self, n) {{
+        self.count = self.count + n
+    }}
+}}
+c = Counter()
+for(i = 0, i < {n} * 10, i = i + 1) {{
+    c.add(i)
+}}
+print(c.count)
+'''),
+]
+
+
+def execute(interpreter_class, program):
+    """在新的解释器上执行程序，返回输出"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            interpreter_class().interpret(program)
+        except InterpreterError as e:
+            print(f"错误: {e.message}")
+    return output.getvalue()
+
+
+def compare(name, ast):
+    """输出一个程序在各后端上的耗时，并检查输出一致"""
+    row = [f"{name:<16}"]
+    outputs = set()
+    baseline = None
+    for _, interpreter_class in BACKENDS:
+        elapsed, output = best_of(lambda: execute(interpreter_class, ast))
+        baseline = baseline or elapsed
+        outputs.add(output)
+        row.append(f"{elapsed * 1000:9.2f} ms {baseline / elapsed:5.2f}x")
+    code = Compiler().compile_program(ast)
+    elapsed, output = best_of(lambda: execute(VMInterpreter, code))
+    outputs.add(output)
+    row.append(f"{elapsed * 1000:9.2f} ms {baseline / elapsed:5.2f}x")
+    if len(outputs) != 1:
+        row.append("输出不一致!")
+    print('  '.join(row))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    # 解释器从当前目录下的 lib 加载基础库
+    os.chdir(ROOT)
+    header = ['程序'.ljust(16 - 2)] + [name.ljust(20) for name, _ in BACKENDS] + ['vm(预编译)']
+    print('  '.join(header))
+
+    for filename in sorted(glob.glob(os.path.join('examples', '*.bcs'))):
+        with open(filename, encoding='utf-8') as f:
+            ast = Parser(Lexer(f.read()).tokenize()).parse()
+            Resolver().resolve_program(ast)
+        compare(os.path.basename(filename), ast)
+
+    for name, template in LOOPS:
+        ast = Parser(Lexer(template.format(n=n)).tokenize()).parse()
+        Resolver().resolve_program(ast)
+        compare(name, ast)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""基准测试的公共工具：定位项目根目录、生成大规模 BCC 源码、计时"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 一个覆盖常见语法的代码片段，{n} 用于生成不重复的名字
+SNIPPET = '''// 第 {n} 段
+def public add{n}(x, y) {{
+    return x + y
+}}
+total{n} = 0
+for(i = 1, i <= 10, i = i + 1) {{
+    total{n} = total{n} + add{n}(i, {n})
+}}
+if(total{n} > 100) {{
+    printnln("total: ")
+    print(str(total{n}))
+}}
+class Point{n} {{
+    x = 0
+    y = 0
+    def public move(self, dx, dy) {{
+        self.x = self.x + dx
+        self.y = self.y + dy
+    }}
+}}
+'''
+
+
+def generate_source(blocks):
+    """生成由 blocks 个代码片段拼接而成的源码"""
+    return ''.join(SNIPPET.format(n=n) for n in range(blocks))
+
+
+def best_of(func, repeat=3):
+    """运行 func 若干次，返回最短耗时（秒）和最后一次的结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def iter_nodes(node):
+    """深度优先遍历 AST，依次产出每个节点（兼容 __dict__ 与 __slots__ 两种节点类）"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+            continue
+        if isinstance(node, dict):
+            stack.extend(node.values())
+            continue
+        if not hasattr(node, '__dict__') and not hasattr(type(node), '__slots__'):
+            continue
+        if type(node).__module__ != 'src.parser':
+            continue
+        yield node
+        fields = getattr(node, '__dict__', None) or {
+            name: getattr(node, name, None)
+            for cls in type(node).__mro__ for name in getattr(cls, '__slots__', ())
+        }
+        stack.extend(fields.values())
+
+
+def count_nodes(nodes):
+    """统计 AST 节点总数"""
+    return sum(1 for _ in iter_nodes(nodes))
@@ -1,6 +1,15 @@
 from src.lexer import Lexer
+from src.source import MappedSource, StringSource
 from src.parser import Parser, ParserError
-from src.interpreter import Interpreter, InterpreterError
+from src.interpreter import Interpreter, InterpreterError, BUILTIN_FUNCTIONS
+from src.closure_interpreter import ClosureInterpreter
+from src.vm import VMInterpreter
+from src.bytecode import Compiler, disassemble
+from src.resolver import Resolver
+from src.optimizer import Optimizer
+from src.cache import ASTCache
+from src.checker import collect_files, check_files, summarize
+from src.profiler import Profiler, SamplingProfiler
 import sys
 import argparse
 import logging
@@ -19,6 +28,14 @@ class Colors:
     GREEN = '\033[92m'
     END = '\033[0m'
 
+# 可选的执行后端：tree 逐节点遍历AST，closure 先把AST编译成闭包再执行，
+# vm 把AST编译成字节码后由栈式虚拟机执行
+BACKENDS = {
+    'tree': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VMInterpreter,
+}
+
 # 配置类
 class Config:
     def __init__(self):
@@ -27,7 +44,11 @@ class Config:
             "debug_mode": False,
             "log_file": "bcc.log",
             "max_recursion_depth": 1000,
+            "memo_cache_size": 128,
             "show_performance_stats": False,
+            "sampling_profiler": False,
+            "sampling_interval": 0.01,
+            "sampling_output": "bcc_profile.folded",
             "auto_save_history": True,
             "history_file": ".bcc_history",
             "theme": {
@@ -219,7 +240,8 @@ This document provides a brief syntax guide. For detailed syntax, please refer t
     print(help_text)
 
 @profile_performance
-def run_file(filename, show_tokens=False, show_perror=False, debug=False):
+def run_file(filename, show_tokens=False, show_perror=False, debug=False, use_cache=True, backend='tree',
+             optimize=0, show_optimizations=False, profile=None, sample=None):
     start_time = time.time()
     logging.info(f"开始执行文件: {filename}")
     
@@ -230,16 +252,46 @@ def run_file(filename, show_tokens=False, show_perror=False, debug=False):
         return
         
     try:
-        # 使用 UTF-8 编码读取文件
-        with open(filename, 'r', encoding='utf-8') as f:
-            source = f.read()
-            source_lines = source.splitlines()
-        interpreter = Interpreter(debug=debug)  # 传递调试标志
-        run(source, interpreter, show_tokens, show_perror, filename, source_lines)
+        ast_cache = ASTCache(enabled=use_cache)
+        # 用 mmap 映射 UTF-8 源文件，词法分析器直接扫描映射的字节
+        with MappedSource(filename) as source:
+            interpreter = BACKENDS[backend](debug=debug, ast_cache=ast_cache, optimize=optimize,  # 传递调试标志
+                                            max_recursion_depth=config.settings["max_recursion_depth"])
+            interpreter.filename = filename
+            interpreter.memo_size = config.settings["memo_cache_size"]
+            profiler = sampler = None
+            if profile:
+                # 按 BCC 函数和源码行统计耗时，结果另外写入 JSON 文件
+                profiler = Profiler()
+                interpreter.add_hook(profiler)
+                profiler.start()
+            if sample:
+                # 后台线程定期记录 BCC 调用栈，写成折叠栈供火焰图工具使用
+                sampler = SamplingProfiler(interpreter, config.settings["sampling_interval"])
+                sampler.start()
+            try:
+                run(source, interpreter, show_tokens, show_perror, filename, ast_cache=ast_cache,
+                    show_optimizations=show_optimizations)
+            finally:
+                if sampler is not None:
+                    sampler.stop()
+                    sampler.write_collapsed(sample)
+                    print(f"采样 {sampler.sample_count} 次，折叠栈已写入: {sample}")
+                if profiler is not None:
+                    profiler.stop()
+                    print(f"\n{Colors.BLUE}BCC 性能分析:{Colors.END}")
+                    print(profiler.format_report())
+                    profiler.write_json(profile)
+                    print(f"性能分析结果已写入: {profile}")
         
         end_time = time.time()
         execution_time = end_time - start_time
         logging.info(f"文件执行完成，耗时: {execution_time:.2f}秒")
+        logging.info(f"AST 缓存: 命中 {ast_cache.hits} 次，未命中 {ast_cache.misses} 次")
+        hits, misses = interpreter.inline_cache_stats()
+        logging.info(f"内联缓存: 命中 {hits} 次，未命中 {misses} 次")
+        hits, misses, evictions = interpreter.memo_stats()
+        logging.info(f"memo 缓存: 命中 {hits} 次，未命中 {misses} 次，淘汰 {evictions} 次")
         
     except UnicodeDecodeError:
         logging.error(f"文件编码错误: {filename}")
@@ -326,25 +378,61 @@ def format_error(filename, line, message, token=None, source_lines=None):
     
     return result
 
+def read_source_lines(source):
+    """获取源码的所有行，用于错误提示
+
+    source 为字符串、StringSource/MappedSource 或已读取过的文件对象，
+    MappedSource 的代码行按需从映射中读取。
+    """
+    if isinstance(source, str):
+        return source.splitlines()
+    if isinstance(source, StringSource):
+        return source.lines
+    source.seek(0)
+    return source.read().splitlines()
+
 @profile_performance
-def run(source, interpreter, show_tokens=False, show_perror=False, filename="<stdin>", source_lines=None):
+def run(source, interpreter, show_tokens=False, show_perror=False, filename="<stdin>", source_lines=None, ast_cache=None,
+        show_optimizations=False):
+    """执行源码，source 可以是字符串、MappedSource 或以文本模式打开的文件对象
+
+    传入 ast_cache 时，来自文件的源码优先使用缓存的解析结果。
+    show_optimizations 为 True 时把优化报告输出到标准错误。
+    """
     try:
         lexer = Lexer(source)
-        tokens = lexer.tokenize()
         
         if show_tokens:
+            tokens = lexer.tokenize()
             logging.debug("显示词法分析tokens")
             for token in tokens:
                 print(token)
+        else:
+            # 解析器按需从词法分析器拉取token
+            tokens = lexer.iter_tokens()
+        
+        def parse():
+            return Parser(tokens).parse()
         
-        parser = Parser(tokens)
         try:
-            ast = parser.parse()
+            # 显示tokens时需要完整扫描源码，不使用缓存
+            ast = interpreter.load_program(source, parse, None if show_tokens else ast_cache)
+            # 名字解析发现的问题只作为警告，程序照常执行
+            for warning in interpreter.warnings:
+                logging.warning(f"名字解析警告: {str(warning)}")
+                print(f"{Colors.YELLOW}警告:{Colors.END} {format_position(filename, warning.token)} {str(warning)}",
+                      file=sys.stderr)
+            interpreter.warnings.clear()
+            for optimizer in interpreter.optimizations:
+                logging.info(f"优化完成: {optimizer.change_count} 处改写")
+                if show_optimizations:
+                    print(optimizer.format_report(), file=sys.stderr)
+            interpreter.optimizations.clear()
             logging.debug("语法分析完成")
         except ParserError as e:
             logging.error(f"解析错误: {str(e)}")
             if source_lines is None:
-                source_lines = source.splitlines()
+                source_lines = read_source_lines(source)
             print(format_error(filename, e.token.line if e.token else 1, str(e), e.token, source_lines))
             return
         
@@ -355,16 +443,21 @@ def run(source, interpreter, show_tokens=False, show_perror=False, filename="<st
             logging.error(f"解释器错误: {str(e)}")
             if hasattr(e, 'line'):
                 if source_lines is None:
-                    source_lines = source.splitlines()
+                    source_lines = read_source_lines(source)
                 print(format_error(filename, e.line, e.message, e.token, source_lines))
             else:
                 print(f"{Colors.RED}错误:{Colors.END} {e.message}")
             if show_perror:
                 raise
+    except UnicodeDecodeError:
+        # 流式读取文件时的编码错误交给 run_file 处理
+        raise
     except Exception as e:
         logging.error(f"执行过程中发生错误: {str(e)}", exc_info=True)
         if show_perror:
             raise
+        if source_lines is None:
+            source_lines = read_source_lines(source)
         print(format_error(filename, 1, str(e), None, source_lines))
 
 class REPL:
@@ -502,17 +595,25 @@ class REPL:
                 print(f"{Colors.RED}错误:{Colors.END} {str(e)}")
                 first_line = True
 
-def check_syntax(filename):
-    """检查文件语法"""
+def check_syntax(filename, all_errors=False):
+    """检查文件语法
+
+    Args:
+        all_errors: 为 True 时使用错误恢复模式解析，一次报告文件中的全部语法错误
+    """
     logging.info(f"开始语法检查: {filename}")
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            source = f.read()
-        
-        lexer = Lexer(source)
-        tokens = lexer.tokenize()
-        parser = Parser(tokens)
-        parser.parse()
+        with MappedSource(filename) as source:
+            parser = Parser(Lexer(source).iter_tokens(), recover=all_errors)
+            parser.parse()
+            # 错误中的token引用映射的源码，需要在文件关闭前输出
+            for error in parser.errors:
+                logging.error(f"语法检查失败: {str(error)}")
+                print(f"{Colors.RED}语法错误:{Colors.END} {format_position(filename, error.token)} {str(error)}",
+                      file=sys.stderr)
+        if parser.errors:
+            print(f"{Colors.RED}共 {len(parser.errors)} 个语法错误{Colors.END}", file=sys.stderr)
+            return False
         logging.info("语法检查通过")
         print(f"{Colors.GREEN}语法检查通过{Colors.END}")
         return True
@@ -521,15 +622,81 @@ def check_syntax(filename):
         print(f"{Colors.RED}语法错误:{Colors.END} {str(e)}", file=sys.stderr)
         return False
 
+def disassemble_file(filename, optimize=0):
+    """把文件编译成字节码并输出反汇编结果，optimize 为优化级别"""
+    try:
+        with MappedSource(filename) as source:
+            ast = Parser(Lexer(source).iter_tokens()).parse()
+            if optimize:
+                ast = Optimizer(optimize, BUILTIN_FUNCTIONS).optimize(ast)
+            Resolver().resolve_program(ast)
+            code = Compiler().compile_program(ast)
+            print(disassemble(code))
+        return True
+    except Exception as e:
+        logging.error(f"反汇编失败: {str(e)}")
+        print(f"{Colors.RED}错误:{Colors.END} {str(e)}", file=sys.stderr)
+        return False
+
+def format_position(filename, token):
+    """以 文件:行:列: 的形式表示错误位置"""
+    if token is None:
+        return f"{filename}:"
+    return f"{filename}:{token.line}:{token.column}:"
+
+def run_check(paths, output_format='text', jobs=None):
+    """批量语法检查：展开目录和通配符，多进程检查全部文件并输出汇总报告
+
+    Returns:
+        所有文件都没有语法错误时返回 True
+    """
+    files = collect_files(paths)
+    logging.info(f"开始批量语法检查: {len(files)} 个文件")
+    start_time = time.perf_counter()
+    results = check_files(files, jobs)
+    summary = summarize(results, time.perf_counter() - start_time)
+    logging.info(f"批量语法检查完成: {summary['failed']} 个文件有错误，耗时: {summary['elapsed']:.2f}秒")
+    
+    if output_format == 'json':
+        print(json.dumps({'summary': summary, 'results': results}, ensure_ascii=False, indent=2))
+        return summary['failed'] == 0
+    
+    for result in results:
+        status = f"{Colors.GREEN}通过{Colors.END}" if result['ok'] else f"{Colors.RED}失败{Colors.END}"
+        print(f"{status} {result['file']} ({result['time'] * 1000:.1f} ms)")
+        for error in result['errors']:
+            position = f"{result['file']}:{error['line']}:{error['column']}:" if error['line'] else f"{result['file']}:"
+            print(f"  {Colors.RED}语法错误:{Colors.END} {position} {error['message']}")
+        for warning in result['warnings']:
+            position = f"{result['file']}:{warning['line']}:{warning['column']}:" if warning['line'] else f"{result['file']}:"
+            print(f"  {Colors.YELLOW}警告:{Colors.END} {position} {warning['message']}")
+    color = Colors.GREEN if summary['failed'] == 0 else Colors.RED
+    print(f"{color}检查了 {summary['files']} 个文件，{summary['failed']} 个文件共 {summary['errors']} 个语法错误{Colors.END}"
+          f"，耗时 {summary['elapsed']:.2f} 秒 ({summary['files_per_second']:.1f} 文件/秒)")
+    return summary['failed'] == 0
+
 def main():
     parser = argparse.ArgumentParser(description='BCC语言解释器')
     parser.add_argument('file', nargs='?', help='要执行的源代码文件')
     parser.add_argument('-t', '--show-tokens', action='store_true', help='显示词法分析结果')
     parser.add_argument('-p', '--show-perror', action='store_true', help='显示详细的解析错误信息')
     parser.add_argument('-d', '--debug', action='store_true', help='启用调试模式，显示详细的执行信息')
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不写入 AST 缓存（__bcccache__）')
     parser.add_argument('--help-bcc', action='store_true', help='显示BCC语言使用说明')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='tree', help='执行后端：tree 为树遍历解释器，closure 为闭包编译，vm 为字节码虚拟机')
+    parser.add_argument('-O', dest='optimize', type=int, choices=[0, 1, 2], default=0, help='优化级别：0 不优化，1 常量折叠并删除条件为常量的 if，2 另外内联小型函数')
+    parser.add_argument('--optimize-report', action='store_true', help='输出各个优化遍改写了什么（不使用 AST 缓存）')
+    parser.add_argument('--disassemble', action='store_true', help='只编译文件并输出字节码的反汇编结果')
+    parser.add_argument('--check', nargs='+', metavar='PATH', help='只检查语法，可以是文件、目录或通配符（如 "src/**/*.bcs"）')
+    parser.add_argument('--format', choices=['text', 'json'], default='text', help='--check 报告的格式')
+    parser.add_argument('--profile', nargs='?', const='bcc_profile.json', metavar='JSON', help='按 BCC 函数、方法和源码行统计耗时，输出报告并写入 JSON 文件（默认 bcc_profile.json）')
+    parser.add_argument('--sample', nargs='?', const=config.settings["sampling_output"], metavar='FILE', help='采样记录 BCC 调用栈，写成火焰图工具使用的折叠栈格式（默认取配置中的 sampling_output）')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='--check 使用的进程数，0 或不指定时为 CPU 核数')
     
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 0:
+        # 0 和不指定一样使用全部 CPU 核
+        parser.error("-j/--jobs 不能为负数")
     
     if args.help_bcc:
         show_bcc_help()
@@ -538,12 +705,29 @@ def main():
     # 设置日志级别
     setup_logging(args.debug)
     
+    if args.check:
+        sys.exit(0 if run_check(args.check, args.format, args.jobs) else 1)
+    
+    if args.file and args.disassemble:
+        sys.exit(0 if disassemble_file(args.file, args.optimize) else 1)
+    
     if args.file:
-        run_file(args.file, args.show_tokens, args.show_perror, args.debug)
+        # 缓存命中时不会重新优化，需要报告时不使用缓存
+        use_cache = not args.no_cache and not args.optimize_report
+        # 配置中打开 sampling_profiler 时总是采样
+        sample = args.sample
+        if sample is None and config.settings["sampling_profiler"]:
+            sample = config.settings["sampling_output"]
+        run_file(args.file, args.show_tokens, args.show_perror, args.debug, use_cache, args.backend,
+                 args.optimize, args.optimize_report, args.profile, sample)
     else:
         # REPL模式
         repl = REPL()
-        repl.interpreter = Interpreter(debug=args.debug)  # 使用带调试标志的解释器
+        # 使用带调试标志的解释器，基础库模块同样可以使用 AST 缓存
+        repl.interpreter = BACKENDS[args.backend](debug=args.debug, ast_cache=ASTCache(enabled=not args.no_cache),
+                                                  optimize=args.optimize,
+                                                  max_recursion_depth=config.settings["max_recursion_depth"])
+        repl.interpreter.memo_size = config.settings["memo_cache_size"]
         repl.run()
 
 if __name__ == '__main__':
@@ -1,5 +1,8 @@
+from array import array
 from enum import Enum
 
+from .source import StringSource
+
 class TokenType(Enum):
     # 数据类型
     NUMBER = 1      # 数字
@@ -68,6 +71,8 @@ class TokenType(Enum):
     RBRACKET = 44    # ]
 
 class Token:
+    __slots__ = ('type', 'value', 'line', 'column')
+
     def __init__(self, type, value, line=0, column=0):
         self.type = type      # token 类型
         self.value = value    # token 值
@@ -75,4 +80,135 @@ class Token:
         self.column = column  # 列号
 
     def __str__(self):
-        return f'Token({self.type}, {self.value}, line={self.line}, col={self.column})' 
\ No newline at end of file
+        return f'Token({self.type}, {self.value}, line={self.line}, col={self.column})'
+
+# 按枚举值查找 TokenType，用于从紧凑存储中还原类型
+TOKEN_TYPES = {token_type.value: token_type for token_type in TokenType}
+
+class TokenStore:
+    """紧凑的token存储（结构数组）
+
+    类型和起止偏移分别保存在 array 中，每个token只占几个字节。
+    token 的值在访问时才从源码切片得到，行号和列号由源码的行首偏移
+    索引按需计算。
+    """
+    def __init__(self, source):
+        # source 为 StringSource 或 MappedSource，也可以直接传入字符串
+        if isinstance(source, str):
+            source = StringSource(source)
+        self.source = source
+        self.types = array('B')   # TokenType 的枚举值
+        self.starts = array('i')  # token 在源码中的起始偏移
+        self.ends = array('i')    # token 在源码中的结束偏移
+        # 增量重新扫描后，索引 >= shift_index 的偏移还需要加上 shift 才是实际偏移，
+        # 这样编辑点之后的token不必逐个改写
+        self.shift = 0
+        self.shift_index = 0
+
+    def append(self, type, start, end):
+        """追加一个token"""
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def position(self, offset):
+        """将源码偏移转换为 (行号, 列号)，两者都从1开始"""
+        return self.source.position(offset)
+
+    def start_of(self, index):
+        if index >= self.shift_index:
+            return self.starts[index] + self.shift
+        return self.starts[index]
+
+    def end_of(self, index):
+        if index >= self.shift_index:
+            return self.ends[index] + self.shift
+        return self.ends[index]
+
+    def count_ending_before(self, offset):
+        """结束偏移小于 offset 的token数量（不含 EOF）"""
+        low, high = 0, len(self.types) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.end_of(middle) < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def rebased(self, offsets, start, stop, shift):
+        """取出 offsets[start:stop]，使每个值加上 shift 后等于实际偏移
+
+        只有与 shift_index 不在同一侧的部分需要逐个改写。
+        """
+        split = min(max(self.shift_index, start), stop)
+        before = offsets[start:split]
+        after = offsets[split:stop]
+        if shift:
+            before = array('i', [offset - shift for offset in before])
+        if self.shift != shift:
+            after = array('i', [offset + self.shift - shift for offset in after])
+        return before + after
+
+    def value_of(self, index):
+        type = self.types[index]
+        if type == TokenType.EOF.value:
+            return None
+        text = self.source.slice(self.start_of(index), self.end_of(index))
+        if type == TokenType.NUMBER.value:
+            return int(text)
+        if type == TokenType.STRING.value:
+            return text[1:-1]
+        return text
+
+    def line_of(self, index):
+        return self.position(self.start_of(index))[0]
+
+    def column_of(self, index):
+        return self.position(self.start_of(index))[1]
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TokenView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token 索引越界")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield TokenView(self, index)
+
+class TokenView:
+    """TokenStore 中单个token的轻量视图，属性与 Token 相同
+
+    解析器频繁检查类型，因此类型在创建视图时就取出，其余属性按需计算。
+    """
+    __slots__ = ('store', 'index', 'type')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+        self.type = TOKEN_TYPES[store.types[index]]
+
+    @property
+    def value(self):
+        return self.store.value_of(self.index)
+
+    @property
+    def line(self):
+        return self.store.line_of(self.index)
+
+    @property
+    def column(self):
+        return self.store.column_of(self.index)
+
+    def __reduce__(self):
+        # 序列化（如写入 AST 缓存）时转换为独立的 Token
+        return Token, (self.type, self.value, self.line, self.column)
+
+    __str__ = Token.__str__
@@ -0,0 +1,589 @@
+from array import array
+
+from .bcc_token import TokenType
+from .parser import (
+    PARSER_VERSION,
+    NumberNode, BinOpNode, PrintNode, PrintlnNode,
+    VariableNode, AssignNode, StringNode, IfNode,
+    ForNode, FunctionNode, CallNode, ReturnNode,
+    ImportNode, ArrayAccessNode, DotAccessNode, NsReturnNode,
+    ExprNode, WhileNode, ClassNode,
+    LocalVariableNode, GlobalVariableNode, LocalAssignNode
+)
+
+# 字节码格式版本，指令集或 CodeObject 结构变化时递增，用于使缓存失效
+BYTECODE_VERSION = 5
+# 缓存编译结果时使用的版本号，解析器或字节码任一变化都会使缓存失效
+CACHE_VERSION = f"{PARSER_VERSION}.{BYTECODE_VERSION}"
+
+# 操作码。每条指令是一个操作码加上 OPERAND_COUNTS 中规定个数的整数操作数
+LOAD_CONST = 0            # k: 压入 consts[k]
+LOAD_NAME = 1             # n: 按名字压入变量 names[n]
+STORE_NAME = 2            # n: 弹出值并按名字赋给变量 names[n]
+POP_TOP = 3               # 弹出栈顶
+DUP_TOP = 4               # 复制栈顶
+BINARY_ADD = 5
+BINARY_SUBTRACT = 6
+BINARY_MULTIPLY = 7
+BINARY_DIVIDE = 8
+COMPARE_EQ = 9
+COMPARE_LT = 10
+COMPARE_GT = 11
+COMPARE_LE = 12
+COMPARE_GE = 13
+JUMP = 14                 # t: 跳转到 t
+POP_JUMP_IF_FALSE = 15    # t: 弹出栈顶，为假时跳转到 t
+PRINT = 16                # 弹出并打印（换行）
+PRINTNLN = 17             # 弹出并打印（不换行）
+LOAD_CALLEE = 18          # k: 按 evaluate 语义查找 consts[k] 调用点的内置函数或函数
+LOAD_CALLEE_OR_CLASS = 19 # k t: 按 interpret 语义查找，是类名时压入新实例并跳转到 t
+CALL = 20                 # n: 弹出 n 个参数和被调用者并调用
+LOAD_METHOD = 21          # k: 弹出对象，压入 consts[k] 调用点的方法和对象
+CALL_METHOD = 22          # n: 弹出 n 个参数、对象和方法并调用
+RETURN_VALUE = 23         # 弹出返回值；函数中返回，函数外返回 Return 信号
+END = 24                  # 代码结束，返回栈顶（栈为空时返回 None）
+NSRETURN = 25             # 弹出值，是代码块时执行它，代码块中执行了 return 时一同返回
+DEFINE_FUNCTION = 26      # k: 定义函数 consts[k] = (FunctionNode, CodeObject)
+DEFINE_CLASS = 27         # k: 弹出各属性初始值，定义类 consts[k]
+IMPORT = 28               # k: 导入模块 consts[k]
+CHECK_INSTANCE = 29       # k: 栈顶不是对象实例时抛出 consts[k] 描述的错误
+STORE_ATTR = 30           # k: 弹出值和对象，设置 consts[k] 赋值处的属性，再压入值
+LOAD_ATTR = 31            # k: 弹出对象，压入 consts[k] 调用点的属性
+LOAD_ARRAY = 32           # k: 查找并检查 consts[k] 中的数组变量后压入
+ARRAY_INDEX = 33          # k: 弹出索引和数组，检查后压入元素
+RAISE_ERROR = 34          # k: 抛出 consts[k] 描述的错误
+# 超级指令：把常见的指令序列合并为一条
+ADD_NAME_CONST = 35       # n k: names[n] = names[n] + consts[k]（语句 x = x + 1）
+SUBTRACT_NAME_CONST = 36  # n k: names[n] = names[n] - consts[k]
+JUMP_IF_NOT_LESS = 37     # n k t: names[n] < consts[k] 不成立时跳转到 t
+JUMP_IF_NOT_LESS_EQUAL = 38  # n k t: names[n] <= consts[k] 不成立时跳转到 t
+# 经过 resolver 解析的函数中按槽位访问局部变量
+LOAD_FAST = 39            # s: 压入局部变量槽位 s，未赋值时读取同名全局变量
+STORE_FAST = 40           # s: 弹出值并赋给局部变量槽位 s
+LOAD_GLOBAL = 41          # n: 压入全局变量 names[n]
+ADD_FAST_CONST = 42       # s k: 槽位 s 加上 consts[k]
+SUBTRACT_FAST_CONST = 43  # s k: 槽位 s 减去 consts[k]
+JUMP_IF_NOT_LESS_FAST = 44        # s k t: 槽位 s < consts[k] 不成立时跳转到 t
+JUMP_IF_NOT_LESS_EQUAL_FAST = 45  # s k t: 槽位 s <= consts[k] 不成立时跳转到 t
+
+OPCODE_NAMES = {
+    LOAD_CONST: 'LOAD_CONST', LOAD_NAME: 'LOAD_NAME', STORE_NAME: 'STORE_NAME',
+    POP_TOP: 'POP_TOP', DUP_TOP: 'DUP_TOP',
+    BINARY_ADD: 'BINARY_ADD', BINARY_SUBTRACT: 'BINARY_SUBTRACT',
+    BINARY_MULTIPLY: 'BINARY_MULTIPLY', BINARY_DIVIDE: 'BINARY_DIVIDE',
+    COMPARE_EQ: 'COMPARE_EQ', COMPARE_LT: 'COMPARE_LT', COMPARE_GT: 'COMPARE_GT',
+    COMPARE_LE: 'COMPARE_LE', COMPARE_GE: 'COMPARE_GE',
+    JUMP: 'JUMP', POP_JUMP_IF_FALSE: 'POP_JUMP_IF_FALSE',
+    PRINT: 'PRINT', PRINTNLN: 'PRINTNLN',
+    LOAD_CALLEE: 'LOAD_CALLEE', LOAD_CALLEE_OR_CLASS: 'LOAD_CALLEE_OR_CLASS', CALL: 'CALL',
+    LOAD_METHOD: 'LOAD_METHOD', CALL_METHOD: 'CALL_METHOD',
+    RETURN_VALUE: 'RETURN_VALUE', END: 'END', NSRETURN: 'NSRETURN',
+    DEFINE_FUNCTION: 'DEFINE_FUNCTION', DEFINE_CLASS: 'DEFINE_CLASS', IMPORT: 'IMPORT',
+    CHECK_INSTANCE: 'CHECK_INSTANCE', STORE_ATTR: 'STORE_ATTR', LOAD_ATTR: 'LOAD_ATTR',
+    LOAD_ARRAY: 'LOAD_ARRAY', ARRAY_INDEX: 'ARRAY_INDEX', RAISE_ERROR: 'RAISE_ERROR',
+    ADD_NAME_CONST: 'ADD_NAME_CONST', SUBTRACT_NAME_CONST: 'SUBTRACT_NAME_CONST',
+    JUMP_IF_NOT_LESS: 'JUMP_IF_NOT_LESS', JUMP_IF_NOT_LESS_EQUAL: 'JUMP_IF_NOT_LESS_EQUAL',
+    LOAD_FAST: 'LOAD_FAST', STORE_FAST: 'STORE_FAST', LOAD_GLOBAL: 'LOAD_GLOBAL',
+    ADD_FAST_CONST: 'ADD_FAST_CONST', SUBTRACT_FAST_CONST: 'SUBTRACT_FAST_CONST',
+    JUMP_IF_NOT_LESS_FAST: 'JUMP_IF_NOT_LESS_FAST',
+    JUMP_IF_NOT_LESS_EQUAL_FAST: 'JUMP_IF_NOT_LESS_EQUAL_FAST',
+}
+
+# 每个操作码的操作数个数，未列出的为 1
+OPERAND_COUNTS = {
+    POP_TOP: 0, DUP_TOP: 0,
+    BINARY_ADD: 0, BINARY_SUBTRACT: 0, BINARY_MULTIPLY: 0, BINARY_DIVIDE: 0,
+    COMPARE_EQ: 0, COMPARE_LT: 0, COMPARE_GT: 0, COMPARE_LE: 0, COMPARE_GE: 0,
+    PRINT: 0, PRINTNLN: 0, RETURN_VALUE: 0, END: 0, NSRETURN: 0,
+    LOAD_CALLEE_OR_CLASS: 2, ADD_NAME_CONST: 2, SUBTRACT_NAME_CONST: 2,
+    JUMP_IF_NOT_LESS: 3, JUMP_IF_NOT_LESS_EQUAL: 3,
+    ADD_FAST_CONST: 2, SUBTRACT_FAST_CONST: 2,
+    JUMP_IF_NOT_LESS_FAST: 3, JUMP_IF_NOT_LESS_EQUAL_FAST: 3,
+}
+
+# 操作数中是跳转目标的位置（操作数下标）
+JUMP_OPERANDS = {
+    JUMP: 0, POP_JUMP_IF_FALSE: 0, LOAD_CALLEE_OR_CLASS: 1,
+    JUMP_IF_NOT_LESS: 2, JUMP_IF_NOT_LESS_EQUAL: 2,
+    JUMP_IF_NOT_LESS_FAST: 2, JUMP_IF_NOT_LESS_EQUAL_FAST: 2,
+}
+
+BINARY_OPCODES = {
+    TokenType.PLUS: BINARY_ADD,
+    TokenType.MINUS: BINARY_SUBTRACT,
+    TokenType.MULTIPLY: BINARY_MULTIPLY,
+    TokenType.DIVIDE: BINARY_DIVIDE,
+    TokenType.EQ: COMPARE_EQ,
+    TokenType.LT: COMPARE_LT,
+    TokenType.GT: COMPARE_GT,
+    TokenType.LE: COMPARE_LE,
+    TokenType.GE: COMPARE_GE,
+}
+
+# 条件为 变量 < 常量、变量 <= 常量 时使用的比较跳转超级指令
+COMPARE_JUMP_OPCODES = {
+    TokenType.LT: JUMP_IF_NOT_LESS,
+    TokenType.LE: JUMP_IF_NOT_LESS_EQUAL,
+}
+COMPARE_JUMP_FAST_OPCODES = {
+    TokenType.LT: JUMP_IF_NOT_LESS_FAST,
+    TokenType.LE: JUMP_IF_NOT_LESS_EQUAL_FAST,
+}
+
+class CodeObject:
+    """编译后的字节码
+
+    code 是紧凑的整数数组，consts 是常量池（字面量、调用点、函数定义等），
+    names 是变量名和成员名表，varnames 是局部变量槽位对应的名字。nodes
+    记录读取变量的指令对应的变量节点，只在变量未定义、需要报告位置时
+    使用。只包含可序列化的数据，可以直接用 pickle 缓存；执行时 VM 会把
+    code 转成列表以加快取指。
+    """
+    __slots__ = ('name', 'code', 'consts', 'names', 'is_function', 'varnames', 'nodes')
+
+    def __init__(self, name, code, consts, names, is_function=False, varnames=(), nodes=None):
+        self.name = name                # 代码名称（函数名或 <module>）
+        self.code = code                # array('i') 指令序列
+        self.consts = consts            # 常量池
+        self.names = names              # 名字表
+        self.is_function = is_function  # 是否为函数体，决定 RETURN_VALUE 的行为
+        self.varnames = varnames        # 局部变量槽位的名字
+        self.nodes = nodes or {}        # 指令位置 -> 变量节点
+
+    def __str__(self):
+        return f"CodeObject({self.name}, {len(self.code)} words)"
+
+class Compiler:
+    """把AST编译成 CodeObject
+
+    与树遍历解释器一样区分两种语义：statement() 对应 interpret，
+    expression() 对应 evaluate，编译出的字节码执行结果和错误信息与
+    Interpreter 一致。keep 为 True 时语句的值留在栈上（函数体的最后一个
+    语句、interpret 单个节点时需要它的值），否则保持栈平衡。
+    """
+    def __init__(self, name='<module>', is_function=False):
+        self.name = name
+        self.is_function = is_function
+        self.code = []
+        self.consts = []
+        self.const_indexes = {}
+        self.names = []
+        self.name_indexes = {}
+        self.nodes = {}
+        # 编译经过解析的函数时为名字到槽位的映射，否则为 None
+        self.slot_index = None
+        self.varnames = ()
+
+    # ---- 入口 ----
+
+    def compile_program(self, statements):
+        """编译语句列表（整个程序或模块）"""
+        for stmt in statements:
+            self.statement(stmt, keep=False)
+        self.emit(END)
+        return self.finish()
+
+    def compile_node(self, node):
+        """编译单个节点，执行结果为 interpret(node) 的值"""
+        self.statement(node, keep=True)
+        self.emit(END)
+        return self.finish()
+
+    def compile_expression(self, node):
+        """编译单个表达式，执行结果为 evaluate(node) 的值"""
+        self.expression(node)
+        self.emit(END)
+        return self.finish()
+
+    def compile_function(self, func):
+        """编译函数体：返回最后一个语句的值，或 return 语句的值"""
+        if func.slot_index is not None:
+            self.slot_index = func.slot_index
+            self.varnames = func.local_names
+        for index, stmt in enumerate(func.body):
+            self.statement(stmt, keep=index == len(func.body) - 1)
+        if not func.body:
+            self.emit(LOAD_CONST, self.const(None))
+        self.emit(RETURN_VALUE)
+        return self.finish()
+
+    def finish(self):
+        return CodeObject(self.name, array('i', self.code), tuple(self.consts),
+                          tuple(self.names), self.is_function, self.varnames, self.nodes)
+
+    # ---- 工具 ----
+
+    def emit(self, opcode, *operands):
+        """追加一条指令，返回其位置"""
+        position = len(self.code)
+        self.code.append(opcode)
+        self.code.extend(operands)
+        return position
+
+    def patch(self, position, target=None):
+        """把 position 处指令的跳转目标改为 target（默认为当前位置）"""
+        opcode = self.code[position]
+        self.code[position + 1 + JUMP_OPERANDS[opcode]] = len(self.code) if target is None else target
+
+    def const(self, value):
+        """常量在常量池中的下标；可哈希的字面量会被复用"""
+        try:
+            key = (type(value), value)
+            index = self.const_indexes.get(key)
+        except TypeError:
+            key = index = None
+        if index is None:
+            index = len(self.consts)
+            self.consts.append(value)
+            if key is not None:
+                self.const_indexes[key] = index
+        return index
+
+    def name_index(self, name):
+        index = self.name_indexes.get(name)
+        if index is None:
+            index = self.name_indexes[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def error(self, error_type, message, node):
+        """编译一个运行时抛出错误的指令；error_type 为 'interpreter' 或 'generic'"""
+        self.emit(RAISE_ERROR, self.const((error_type, message, node)))
+
+    def push_none(self, keep):
+        if keep:
+            self.emit(LOAD_CONST, self.const(None))
+
+    def mark(self, node):
+        """记录下一条指令读取的变量节点，变量未定义时用它报告位置"""
+        self.nodes[len(self.code)] = node
+
+    def load_variable(self, node):
+        """按变量节点的种类编译变量读取"""
+        self.mark(node)
+        node_type = type(node)
+        if node_type is LocalVariableNode:
+            self.emit(LOAD_FAST, node.slot)
+        elif node_type is GlobalVariableNode:
+            self.emit(LOAD_GLOBAL, self.name_index(node.name))
+        else:
+            self.emit(LOAD_NAME, self.name_index(node.name))
+
+    # ---- 语句（interpret 语义） ----
+
+    def statement(self, node, keep):
+        if node is None:
+            self.push_none(keep)
+            return
+        if isinstance(node, list):
+            for stmt in node:
+                self.statement(stmt, keep=False)
+            self.push_none(keep)
+            return
+        handler = STATEMENT_COMPILERS.get(type(node))
+        if handler is None:
+            self.error('interpreter', f"未知的节点类型: {type(node)}", node)
+            return
+        handler(self, node, keep)
+
+    def value(self, node):
+        """编译 interpret(node) 并把值留在栈上"""
+        self.statement(node, keep=True)
+
+    def finish_value(self, keep):
+        if not keep:
+            self.emit(POP_TOP)
+
+    def constant_statement(self, node, keep):
+        if keep:
+            self.emit(LOAD_CONST, self.const(node.value))
+
+    def variable_statement(self, node, keep):
+        self.load_variable(node)
+        self.finish_value(keep)
+
+    def import_statement(self, node, keep):
+        self.emit(IMPORT, self.const(node.module_name))
+        self.push_none(keep)
+
+    def local_assign_statement(self, node, keep):
+        # 超级指令：局部变量 x = x + 常量 / x = x - 常量
+        value = node.value
+        if not keep and self.is_increment(value) and \
+                type(value.left) is LocalVariableNode and value.left.slot == node.slot:
+            self.mark(value.left)
+            opcode = ADD_FAST_CONST if value.op == TokenType.PLUS else SUBTRACT_FAST_CONST
+            self.emit(opcode, node.slot, self.const(value.right.value))
+            return
+        self.value(value)
+        if keep:
+            self.emit(DUP_TOP)
+        self.emit(STORE_FAST, node.slot)
+
+    def is_increment(self, value):
+        """是否为 变量 + 数字 / 变量 - 数字"""
+        return isinstance(value, BinOpNode) and value.op in (TokenType.PLUS, TokenType.MINUS) and \
+            isinstance(value.right, NumberNode)
+
+    def assign_statement(self, node, keep):
+        if isinstance(node.name, str):
+            # 超级指令：x = x + 常量 / x = x - 常量
+            value = node.value
+            if not keep and self.is_increment(value) and \
+                    type(value.left) is VariableNode and value.left.name == node.name:
+                self.mark(value.left)
+                opcode = ADD_NAME_CONST if value.op == TokenType.PLUS else SUBTRACT_NAME_CONST
+                self.emit(opcode, self.name_index(node.name), self.const(value.right.value))
+                return
+            self.value(value)
+            if keep:
+                self.emit(DUP_TOP)
+            self.emit(STORE_NAME, self.name_index(node.name))
+            return
+
+        if isinstance(node.name, DotAccessNode):
+            self.load_variable(node.name.receiver)
+            self.emit(CHECK_INSTANCE, self.const(('interpreter', "无法给非对象类型赋值属性", node)))
+            self.value(node.value)
+            self.emit(STORE_ATTR, self.const((node.name.member_name, node.name.cache)))
+            self.finish_value(keep)
+            return
+
+        self.error('interpreter', "无效的赋值目标", node)
+
+    def binop_statement(self, node, keep):
+        self.expression(node)
+        self.finish_value(keep)
+
+    def print_statement(self, node, keep):
+        self.value(node.expr)
+        self.emit(PRINT if isinstance(node, PrintNode) else PRINTNLN)
+        self.push_none(keep)
+
+    def condition(self, node):
+        """编译条件表达式，条件为假时跳转；返回需要回填跳转目标的指令位置"""
+        if isinstance(node, BinOpNode) and node.op in COMPARE_JUMP_OPCODES and \
+                isinstance(node.right, NumberNode):
+            # 超级指令：变量与常量比较后条件跳转
+            left_type = type(node.left)
+            if left_type is LocalVariableNode:
+                self.mark(node.left)
+                return self.emit(COMPARE_JUMP_FAST_OPCODES[node.op], node.left.slot,
+                                 self.const(node.right.value), 0)
+            if left_type is VariableNode:
+                self.mark(node.left)
+                return self.emit(COMPARE_JUMP_OPCODES[node.op], self.name_index(node.left.name),
+                                 self.const(node.right.value), 0)
+        self.expression(node)
+        return self.emit(POP_JUMP_IF_FALSE, 0)
+
+    def if_statement(self, node, keep):
+        jump = self.condition(node.condition)
+        for stmt in node.body:
+            self.statement(stmt, keep=False)
+        self.patch(jump)
+        self.push_none(keep)
+
+    def for_statement(self, node, keep):
+        self.statement(node.init, keep=False)
+        top = len(self.code)
+        jump = self.condition(node.condition)
+        for stmt in node.body:
+            self.statement(stmt, keep=False)
+        self.statement(node.update, keep=False)
+        self.emit(JUMP, top)
+        self.patch(jump)
+        self.push_none(keep)
+
+    def while_statement(self, node, keep):
+        top = len(self.code)
+        jump = self.condition(node.condition)
+        for stmt in node.body:
+            self.statement(stmt, keep=False)
+        self.emit(JUMP, top)
+        self.patch(jump)
+        self.push_none(keep)
+
+    def function_statement(self, node, keep):
+        code = Compiler(node.name, is_function=True).compile_function(node)
+        self.emit(DEFINE_FUNCTION, self.const((node, code)))
+        self.push_none(keep)
+
+    def call_statement(self, node, keep):
+        if isinstance(node.name, DotAccessNode):
+            self.method_call(node, self.value)
+        elif isinstance(node.name, str):
+            # 内置函数、类实例化或普通函数调用；类实例化不计算参数
+            load = self.emit(LOAD_CALLEE_OR_CLASS, self.const((node.name, node)), 0)
+            for arg in node.args:
+                self.value(arg)
+            self.emit(CALL, len(node.args))
+            self.patch(load)
+        else:
+            self.error('interpreter', "无效的函数调用", node)
+            return
+        self.finish_value(keep)
+
+    def method_call(self, node, compile_arg):
+        self.load_variable(node.name.receiver)
+        self.emit(LOAD_METHOD, self.const((node.name.member_name, node, node.name.cache)))
+        for arg in node.args:
+            compile_arg(arg)
+        self.emit(CALL_METHOD, len(node.args))
+
+    def return_statement(self, node, keep):
+        self.value(node.value)
+        if not self.is_function:
+            # 函数外的 return 在不处于函数调用中时报错
+            self.mark(node)
+        self.emit(RETURN_VALUE)
+
+    def array_access_statement(self, node, keep):
+        site = self.const((node.array, node))
+        self.emit(LOAD_ARRAY, site)
+        self.value(node.index)
+        self.emit(ARRAY_INDEX, site)
+        self.finish_value(keep)
+
+    def nsreturn_statement(self, node, keep):
+        self.value(node.value)
+        self.emit(NSRETURN)
+        self.push_none(keep)
+
+    def class_statement(self, node, keep):
+        methods = tuple((method, Compiler(method.name, is_function=True).compile_function(method))
+                        for method in node.methods)
+        for value_node in node.attributes.values():
+            self.value(value_node)
+        self.emit(DEFINE_CLASS, self.const((node, methods)))
+        self.finish_value(keep)
+
+    # ---- 表达式（evaluate 语义） ----
+
+    def expression(self, node):
+        handler = EXPRESSION_COMPILERS.get(type(node))
+        if handler is None:
+            self.error('generic', f"无法计算表达式: {node}", node)
+            return
+        handler(self, node)
+
+    def constant_expression(self, node):
+        self.emit(LOAD_CONST, self.const(node.value))
+
+    def expr_expression(self, node):
+        self.expression(node.expr)
+
+    def variable_expression(self, node):
+        self.load_variable(node)
+
+    def binop_expression(self, node):
+        self.expression(node.left)
+        self.expression(node.right)
+        self.emit(BINARY_OPCODES[node.op])
+
+    def call_expression(self, node):
+        if isinstance(node.name, DotAccessNode):
+            self.method_call(node, self.expression)
+        elif isinstance(node.name, str):
+            self.emit(LOAD_CALLEE, self.const((node.name, node)))
+            for arg in node.args:
+                self.expression(arg)
+            self.emit(CALL, len(node.args))
+        else:
+            self.error('interpreter', "无效的函数调用", node)
+
+    def dot_access_expression(self, node):
+        self.load_variable(node.receiver)
+        self.emit(LOAD_ATTR, self.const((node.member_name, node, node.cache)))
+
+STATEMENT_COMPILERS = {
+    NumberNode: Compiler.constant_statement,
+    StringNode: Compiler.constant_statement,
+    VariableNode: Compiler.variable_statement,
+    LocalVariableNode: Compiler.variable_statement,
+    GlobalVariableNode: Compiler.variable_statement,
+    ImportNode: Compiler.import_statement,
+    AssignNode: Compiler.assign_statement,
+    LocalAssignNode: Compiler.local_assign_statement,
+    BinOpNode: Compiler.binop_statement,
+    PrintNode: Compiler.print_statement,
+    PrintlnNode: Compiler.print_statement,
+    IfNode: Compiler.if_statement,
+    ForNode: Compiler.for_statement,
+    WhileNode: Compiler.while_statement,
+    FunctionNode: Compiler.function_statement,
+    CallNode: Compiler.call_statement,
+    ReturnNode: Compiler.return_statement,
+    ArrayAccessNode: Compiler.array_access_statement,
+    NsReturnNode: Compiler.nsreturn_statement,
+    ClassNode: Compiler.class_statement,
+}
+
+EXPRESSION_COMPILERS = {
+    NumberNode: Compiler.constant_expression,
+    StringNode: Compiler.constant_expression,
+    ExprNode: Compiler.expr_expression,
+    VariableNode: Compiler.variable_expression,
+    LocalVariableNode: Compiler.variable_expression,
+    GlobalVariableNode: Compiler.variable_expression,
+    BinOpNode: Compiler.binop_expression,
+    CallNode: Compiler.call_expression,
+    DotAccessNode: Compiler.dot_access_expression,
+}
+
+def disassemble(code, indent=''):
+    """返回 CodeObject 的反汇编文本，函数和方法的字节码跟在后面"""
+    lines = [f"{indent}代码 {code.name}:"]
+    nested = []
+    position = 0
+    while position < len(code.code):
+        opcode = code.code[position]
+        count = OPERAND_COUNTS.get(opcode, 1)
+        operands = list(code.code[position + 1:position + 1 + count])
+        lines.append(f"{indent}{position:>6} {OPCODE_NAMES[opcode]:<24} "
+                     f"{' '.join(str(operand) for operand in operands):<10} "
+                     f"{describe(code, opcode, operands, nested)}".rstrip())
+        position += 1 + count
+    for child in nested:
+        lines.append('')
+        lines.append(disassemble(child, indent))
+    return '\n'.join(lines)
+
+def describe(code, opcode, operands, nested):
+    """反汇编时对操作数的说明"""
+    if opcode in (LOAD_NAME, STORE_NAME, LOAD_GLOBAL):
+        return f"({code.names[operands[0]]})"
+    if opcode in (LOAD_FAST, STORE_FAST):
+        return f"({code.varnames[operands[0]]})"
+    if opcode in (ADD_FAST_CONST, SUBTRACT_FAST_CONST):
+        sign = '+' if opcode == ADD_FAST_CONST else '-'
+        name = code.varnames[operands[0]]
+        return f"({name} = {name} {sign} {code.consts[operands[1]]!r})"
+    if opcode in (JUMP_IF_NOT_LESS_FAST, JUMP_IF_NOT_LESS_EQUAL_FAST):
+        compare = '<' if opcode == JUMP_IF_NOT_LESS_FAST else '<='
+        return f"(not {code.varnames[operands[0]]} {compare} {code.consts[operands[1]]!r} -> {operands[2]})"
+    if opcode in (ADD_NAME_CONST, SUBTRACT_NAME_CONST):
+        sign = '+' if opcode == ADD_NAME_CONST else '-'
+        name = code.names[operands[0]]
+        return f"({name} = {name} {sign} {code.consts[operands[1]]!r})"
+    if opcode in (JUMP_IF_NOT_LESS, JUMP_IF_NOT_LESS_EQUAL):
+        compare = '<' if opcode == JUMP_IF_NOT_LESS else '<='
+        return f"(not {code.names[operands[0]]} {compare} {code.consts[operands[1]]!r} -> {operands[2]})"
+    if opcode in (JUMP, POP_JUMP_IF_FALSE):
+        return f"(-> {operands[0]})"
+    if opcode in (LOAD_CONST, IMPORT):
+        return f"({code.consts[operands[0]]!r})"
+    if opcode in (LOAD_CALLEE, LOAD_CALLEE_OR_CLASS, LOAD_METHOD, LOAD_ATTR, STORE_ATTR,
+                  LOAD_ARRAY, ARRAY_INDEX):
+        return f"({code.consts[operands[0]][0]})"
+    if opcode in (RAISE_ERROR, CHECK_INSTANCE):
+        return f"({code.consts[operands[0]][1]})"
+    if opcode == DEFINE_FUNCTION:
+        func, func_code = code.consts[operands[0]]
+        nested.append(func_code)
+        return f"({func.name})"
+    if opcode == DEFINE_CLASS:
+        node, methods = code.consts[operands[0]]
+        nested.extend(method_code for _, method_code in methods)
+        return f"({node.name})"
+    return ''
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from .parser import PARSER_VERSION
+
+# 缓存目录名，位于源文件所在目录下（类似 __pycache__）
+CACHE_DIR = '__bcccache__'
+MAGIC = b'BCCAST'
+
+class ASTCache:
+    """解析结果的磁盘缓存
+
+    每个 .bcs/.bcm 文件的AST序列化后保存在同目录的 __bcccache__ 中。
+    缓存文件的第一行记录解析器版本和源码内容的 SHA-256，两者都与当前
+    一致时才使用缓存，因此源码或解析器变化后缓存自动失效。写入时先写
+    临时文件再原子替换，多个进程同时写入也不会留下不完整的缓存。
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.hits = 0     # 命中次数
+        self.misses = 0   # 未命中次数
+
+    def cache_path(self, filename, suffix='.ast'):
+        """源文件对应的缓存文件路径"""
+        directory, name = os.path.split(os.path.abspath(filename))
+        return os.path.join(directory, CACHE_DIR, name + suffix)
+
+    def header(self, source, version=PARSER_VERSION):
+        """缓存文件头：魔数、解析器（或编译器）版本和源码哈希"""
+        digest = hashlib.sha256(source.data).hexdigest()
+        return b'%s %s %s\n' % (MAGIC, str(version).encode('ascii'), digest.encode('ascii'))
+
+    def parse(self, source, parse, suffix='.ast', version=PARSER_VERSION):
+        """返回 source 的AST
+
+        缓存命中时直接反序列化，完全跳过词法和语法分析；否则调用
+        parse() 解析并写入缓存。没有文件名的源码（如 REPL 输入）不缓存。
+        parse() 也可以返回AST之外的可序列化结果（如字节码），此时用不同
+        的 suffix 和 version 区分缓存文件。
+        """
+        filename = getattr(source, 'filename', None)
+        if not self.enabled or filename is None:
+            return parse()
+        
+        path = self.cache_path(filename, suffix)
+        header = self.header(source, version)
+        try:
+            with open(path, 'rb') as f:
+                if f.readline() == header:
+                    ast = pickle.load(f)
+                    self.hits += 1
+                    return ast
+        except Exception:
+            # 缓存不存在、损坏或无法读取时重新解析
+            pass
+        
+        self.misses += 1
+        ast = parse()
+        self.write(path, header, ast)
+        return ast
+
+    def write(self, path, header, ast):
+        """原子地写入缓存文件，失败时静默放弃（如目录不可写）"""
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                pickle.dump(ast, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
@@ -0,0 +1,112 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .lexer import Lexer
+from .parser import Parser
+from .resolver import Resolver
+from .source import MappedSource
+
+# 参与语法检查的源文件扩展名
+SOURCE_EXTENSIONS = ('.bcs', '.bcm')
+# 遍历目录时跳过的子目录
+SKIP_DIRS = {'__bcccache__', '__pycache__', 'node_modules', '.git'}
+
+def collect_files(paths):
+    """把目录、通配符和文件路径展开为去重且排序的源文件列表
+
+    目录会递归查找 .bcs/.bcm 文件；含 * ? [ 的路径按通配符展开（支持 **）；
+    其他路径按普通文件处理，即使扩展名不同也会检查。
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = [name for name in dirs if name not in SKIP_DIRS]
+                files.update(os.path.join(root, name) for name in names
+                             if name.endswith(SOURCE_EXTENSIONS))
+        elif glob.has_magic(path):
+            for name in glob.glob(path, recursive=True):
+                if os.path.isfile(name):
+                    files.add(name)
+                elif os.path.isdir(name):
+                    files.update(collect_files([name]))
+        else:
+            files.add(path)
+    return sorted(files)
+
+def check_file(filename):
+    """以错误恢复模式解析一个文件，返回可序列化的检查结果
+
+    语法正确的部分再做名字解析，函数中无法解析的名字作为警告报告，
+    不影响 ok。
+    Returns:
+        {'file', 'ok', 'errors': [{'line', 'column', 'message'}], 'warnings': [...], 'time'}
+    """
+    start = time.perf_counter()
+    errors = []
+    warnings = []
+    try:
+        with MappedSource(filename) as source:
+            parser = Parser(Lexer(source).iter_tokens(), recover=True)
+            statements = parser.parse()
+            # 错误中的token引用映射的源码，需要在文件关闭前取出位置
+            errors.extend(describe_error(error) for error in parser.errors)
+            warnings.extend(describe_error(warning) for warning in Resolver().resolve_program(statements))
+    except UnicodeDecodeError:
+        errors.append({'line': None, 'column': None, 'message': "文件编码错误，请确保文件使用 UTF-8 编码保存"})
+    except Exception as e:
+        errors.append({'line': None, 'column': None, 'message': str(e)})
+    return {
+        'file': filename,
+        'ok': not errors,
+        'errors': errors,
+        'warnings': warnings,
+        'time': time.perf_counter() - start,
+    }
+
+def describe_error(error):
+    """把带位置的错误转换为可序列化的字典"""
+    token = error.token
+    return {
+        'line': token.line if token else None,
+        'column': token.column if token else None,
+        'message': str(error),
+    }
+
+def available_cpus():
+    """当前进程可以使用的CPU核数"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def check_files(files, jobs=None, chunksize=None):
+    """检查多个文件，返回与 files 顺序一致的结果列表
+
+    文件分块交给进程池，每个工作进程一次领取 chunksize 个文件，减少
+    进程间通信的次数。jobs 默认为 CPU 核数，为 1 或文件很少时在当前
+    进程中依次检查，省去启动进程池的开销。
+    """
+    jobs = jobs or available_cpus()
+    if jobs == 1 or len(files) < 2:
+        return [check_file(filename) for filename in files]
+    if chunksize is None:
+        # 每个进程大约分到 4 块，兼顾负载均衡与通信开销
+        chunksize = max(1, len(files) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(check_file, files, chunksize=chunksize))
+
+def summarize(results, elapsed):
+    """汇总检查结果"""
+    error_count = sum(len(result['errors']) for result in results)
+    warning_count = sum(len(result['warnings']) for result in results)
+    failed = sum(1 for result in results if not result['ok'])
+    return {
+        'files': len(results),
+        'failed': failed,
+        'errors': error_count,
+        'warnings': warning_count,
+        'elapsed': elapsed,
+        'files_per_second': len(results) / elapsed if elapsed else 0.0,
+    }
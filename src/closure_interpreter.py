@@ -0,0 +1,660 @@
+from .bcc_token import TokenType
+from .parser import (
+    NumberNode, BinOpNode, PrintNode, PrintlnNode,
+    VariableNode, AssignNode, StringNode, IfNode,
+    ForNode, FunctionNode, CallNode, ReturnNode,
+    ImportNode,
+    ArrayAccessNode, DotAccessNode, NsReturnNode,
+    ExprNode, WhileNode, ClassNode,
+    LocalVariableNode, GlobalVariableNode, LocalAssignNode
+)
+from .interpreter import (
+    Interpreter, InterpreterError, Return, DEFAULT_MAX_RECURSION_DEPTH,
+    CodeBlock, BCCClass, BCCInstance, UNBOUND
+)
+
+def may_return(statements):
+    """语句中是否可能执行 return（包括 nsreturn 执行的代码块中的 return）
+
+    不进入嵌套定义的函数和类。不会返回的语句列表编译成不检查 Return
+    信号的循环。
+    """
+    stack = [statements]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, (ReturnNode, NsReturnNode)):
+            return True
+        elif isinstance(node, (IfNode, ForNode, WhileNode)):
+            stack.append(node.body)
+    return False
+
+class ClosureInterpreter(Interpreter):
+    """闭包编译后端
+
+    每个AST节点第一次执行时被编译成一个针对该节点形状特化的 Python 闭包，
+    子节点的闭包在编译时就已确定，之后再执行时直接调用闭包，不再逐个
+    isinstance 判断节点类型。循环体、函数体中的语句因此只分派一次。
+
+    与树遍历解释器一样，语句（interpret）和表达式（evaluate）是两套语义，
+    分别由 compile_statement 和 compile_expression 编译，二者的结果和错误
+    信息与 Interpreter 完全一致。注册了执行钩子时退回树遍历执行（见
+    Interpreter.install_hooks）。
+
+    return 语句的闭包返回 Return 信号；可能执行 return 的语句列表（见
+    may_return）在每个语句之后检查信号，其余的不检查。
+    """
+    def __init__(self, parent_module_manager=None, debug=False, ast_cache=None, optimize=0,
+                 max_recursion_depth=DEFAULT_MAX_RECURSION_DEPTH):
+        super().__init__(parent_module_manager, debug, ast_cache, optimize, max_recursion_depth)
+        # 已编译的闭包，以节点对象为键缓存（节点按对象身份比较和哈希）
+        self.statement_closures = {}
+        self.expression_closures = {}
+        self.function_bodies = {}
+
+        self.statement_compilers = {
+            type(None): self.compile_none,
+            NumberNode: self.compile_constant,
+            StringNode: self.compile_constant,
+            VariableNode: self.compile_variable,
+            LocalVariableNode: self.compile_local_variable,
+            GlobalVariableNode: self.compile_global_variable,
+            ImportNode: self.compile_import,
+            AssignNode: self.compile_assign,
+            LocalAssignNode: self.compile_local_assign,
+            BinOpNode: self.compile_expression_statement,
+            PrintNode: self.compile_print,
+            PrintlnNode: self.compile_print,
+            IfNode: self.compile_if,
+            ForNode: self.compile_for,
+            FunctionNode: self.compile_function,
+            CallNode: self.compile_call_statement,
+            ReturnNode: self.compile_return,
+            ArrayAccessNode: self.compile_array_access,
+            NsReturnNode: self.compile_nsreturn,
+            WhileNode: self.compile_while,
+            ClassNode: self.compile_class,
+        }
+        self.expression_compilers = {
+            NumberNode: self.compile_constant,
+            StringNode: self.compile_constant,
+            ExprNode: self.compile_expr,
+            VariableNode: self.compile_variable,
+            LocalVariableNode: self.compile_local_variable,
+            GlobalVariableNode: self.compile_global_variable,
+            BinOpNode: self.compile_binop,
+            CallNode: self.compile_call_expression,
+            DotAccessNode: self.compile_dot_access,
+        }
+
+    def interpret(self, node):
+        """解释执行AST节点"""
+        if isinstance(node, list):
+            # 语句列表（如整个程序）只执行一次，其中的语句各自缓存
+            return self.compile_list(node)()
+        closure = self.statement_closures.get(node)
+        if closure is None:
+            closure = self.compile_statement(node)
+        return closure()
+
+    def evaluate(self, node):
+        """计算表达式的值"""
+        closure = self.expression_closures.get(node)
+        if closure is None:
+            closure = self.compile_expression(node)
+        return closure()
+
+    def execute_function(self, func, args):
+        """执行函数调用，函数体在第一次调用时编译"""
+        frame = self.new_frame(func, args)
+
+        body = self.function_bodies.get(func)
+        if body is None:
+            body = self.function_bodies[func] = self.compile_block(func.body)
+
+        self.enter_frame(frame)
+        self.call_depth += 1
+
+        try:
+            # 执行函数体
+            result = None
+            for stmt in body:
+                result = stmt()
+                if type(result) is Return:
+                    return result.value
+            return result
+
+        finally:
+            # 回到调用者的栈帧
+            self.call_depth -= 1
+            self.enter_frame(frame.parent)
+
+    # ---- 语句（interpret 语义） ----
+
+    def compile_statement(self, node):
+        """把节点按 interpret 的语义编译成闭包"""
+        if isinstance(node, list):
+            return self.compile_list(node)
+        closure = self.statement_closures.get(node)
+        if closure is None:
+            compiler = self.statement_compilers.get(type(node), self.compile_unknown)
+            closure = self.statement_closures[node] = compiler(node)
+        return closure
+
+    def compile_block(self, statements):
+        """编译语句列表，返回闭包元组"""
+        return tuple(self.compile_statement(stmt) for stmt in statements)
+
+    def compile_none(self, node):
+        def none():
+            return None
+        return none
+
+    def compile_list(self, node):
+        body = self.compile_block(node)
+        if may_return(node):
+            def returning_statements():
+                for stmt in body:
+                    result = stmt()
+                    if type(result) is Return:
+                        return result
+                return None
+            return returning_statements
+
+        def statements():
+            for stmt in body:
+                stmt()
+            return None
+        return statements
+
+    def compile_unknown(self, node):
+        def unknown():
+            raise InterpreterError(f"未知的节点类型: {type(node)}", node)
+        return unknown
+
+    def compile_constant(self, node):
+        value = node.value
+        def constant():
+            return value
+        return constant
+
+    def compile_variable(self, node):
+        name = node.name
+        interpreter = self
+        load_variable = self.load_variable
+        def variable():
+            try:
+                return interpreter.variables[name]
+            except KeyError:
+                # 局部变量槽位和全局变量
+                return load_variable(node)
+        return variable
+
+    def compile_local_variable(self, node):
+        slot = node.slot
+        interpreter = self
+        load_global = self.load_global
+        def local_variable():
+            value = interpreter.frame.slots[slot]
+            if value is UNBOUND:
+                return load_global(node)
+            return value
+        return local_variable
+
+    def compile_global_variable(self, node):
+        name = node.name
+        global_variables = self.globals
+        def global_variable():
+            try:
+                return global_variables[name]
+            except KeyError:
+                raise InterpreterError(f"未定义的变量: {name}", node) from None
+        return global_variable
+
+    def compile_import(self, node):
+        module_name = node.module_name
+        import_module = self.import_module
+        def import_statement():
+            import_module(module_name)
+            return None
+        return import_statement
+
+    def compile_assign(self, node):
+        interpreter = self
+        value = self.compile_statement(node.value)
+
+        if isinstance(node.name, str):
+            # 普通变量赋值
+            name = node.name
+            def assign():
+                result = value()
+                interpreter.variables[name] = result
+                return result
+            return assign
+
+        if isinstance(node.name, DotAccessNode):
+            # 对象属性赋值
+            target = self.compile_statement(node.name.receiver)
+            member = node.name.member_name
+            cache = node.name.cache
+            def assign_attribute():
+                obj = target()
+                if isinstance(obj, BCCInstance):
+                    result = value()
+                    if cache.key is obj.shape:
+                        cache.hits += 1
+                        obj.values[cache.value] = result
+                    else:
+                        interpreter.cached_store(obj, member, result, cache)
+                    return result
+                raise InterpreterError(f"无法给非对象类型赋值属性", node)
+            return assign_attribute
+
+        def invalid_target():
+            raise InterpreterError(f"无效的赋值目标", node)
+        return invalid_target
+
+    def compile_local_assign(self, node):
+        interpreter = self
+        value = self.compile_statement(node.value)
+        slot = node.slot
+        def local_assign():
+            result = value()
+            interpreter.frame.slots[slot] = result
+            return result
+        return local_assign
+
+    def compile_expression_statement(self, node):
+        return self.compile_expression(node)
+
+    def compile_print(self, node):
+        expr = self.compile_statement(node.expr)
+        end = '\n' if isinstance(node, PrintNode) else ''
+        def print_statement():
+            print(expr(), end=end)
+            return None
+        return print_statement
+
+    def compile_if(self, node):
+        condition = self.compile_expression(node.condition)
+        body = self.compile_block(node.body)
+        if may_return(node.body):
+            def returning_if():
+                if condition():
+                    for stmt in body:
+                        result = stmt()
+                        if type(result) is Return:
+                            return result
+                return None
+            return returning_if
+
+        def if_statement():
+            if condition():
+                for stmt in body:
+                    stmt()
+            return None
+        return if_statement
+
+    def compile_for(self, node):
+        init = self.compile_statement(node.init)
+        loop = self.compile_for_loop(node)
+        counted = self.counted_loop(node)
+        if counted is None:
+            def for_statement():
+                init()
+                return loop()
+            return for_statement
+
+        # 计数循环按 range 执行（见 Interpreter.interpret_counted_for），起点或
+        # 终点不是整数、循环变量或终点变量被改变时由 loop 按一般的方式继续
+        update = self.compile_statement(node.update)
+        body = self.compile_block(node.body)
+        interpreter = self
+        name, slot, offset, step = counted.name, counted.slot, counted.offset, counted.step
+        def counted_for():
+            init()
+            if slot is None:
+                variables, key = interpreter.variables, name
+            else:
+                variables, key = interpreter.frame.slots, slot
+            start = variables[key]
+            location = interpreter.loop_limit(counted)
+            if type(start) is not int or location is None:
+                return loop()
+            limits, limit_key = location
+            limit = limits[limit_key]
+            if type(limit) is not int:
+                return loop()
+            counters = range(start, limit + offset, step)
+            for counter in counters:
+                variables[key] = counter
+                for stmt in body:
+                    result = stmt()
+                    if type(result) is Return:
+                        return result
+                if variables[key] is not counter or limits[limit_key] is not limit:
+                    update()
+                    return loop()
+            if counters:
+                variables[key] = counters[-1] + step
+            return None
+        return counted_for
+
+    def compile_for_loop(self, node):
+        """编译 for 循环中初始化语句之后的部分"""
+        condition = self.compile_expression(node.condition)
+        update = self.compile_statement(node.update)
+        body = self.compile_block(node.body)
+
+        if may_return(node.body):
+            def returning_for():
+                while condition():
+                    for stmt in body:
+                        result = stmt()
+                        if type(result) is Return:
+                            return result
+                    update()
+                return None
+            return returning_for
+
+        if len(body) == 1:
+            stmt = body[0]
+            def for_single():
+                while condition():
+                    stmt()
+                    update()
+                return None
+            return for_single
+
+        def for_loop():
+            while condition():
+                for stmt in body:
+                    stmt()
+                update()
+            return None
+        return for_loop
+
+    def compile_while(self, node):
+        condition = self.compile_expression(node.condition)
+        body = self.compile_block(node.body)
+
+        if may_return(node.body):
+            def returning_while():
+                while condition():
+                    for stmt in body:
+                        result = stmt()
+                        if type(result) is Return:
+                            return result
+                return None
+            return returning_while
+
+        if len(body) == 1:
+            stmt = body[0]
+            def while_single():
+                while condition():
+                    stmt()
+                return None
+            return while_single
+
+        def while_loop():
+            while condition():
+                for stmt in body:
+                    stmt()
+            return None
+        return while_loop
+
+    def compile_function(self, node):
+        functions = self.functions
+        name = node.name
+        def define_function():
+            functions[name] = node
+            return None
+        return define_function
+
+    def compile_call_statement(self, node):
+        interpreter = self
+        builtins = self.builtin_functions
+        functions = self.functions
+        args = self.compile_block(node.args)
+
+        # 处理方法调用
+        if isinstance(node.name, DotAccessNode):
+            target = self.compile_statement(node.name.receiver)
+            member = node.name.member_name
+            cache = node.name.cache
+            def call_method():
+                obj = target()
+                if isinstance(obj, BCCInstance):
+                    if cache.key is obj.bcc_class:
+                        cache.hits += 1
+                        method = cache.value
+                    else:
+                        method = interpreter.cached_method(obj, member, cache)
+                    values = [arg() for arg in args]
+                    # 将实例作为第一个参数（self）传入
+                    return interpreter.execute_function(method, [obj] + values)
+                raise InterpreterError(f"无法在非对象类型上调用方法", node)
+            return call_method
+
+        if not isinstance(node.name, str):
+            def invalid_call():
+                raise InterpreterError(f"无效的函数调用", node)
+            return invalid_call
+
+        # 处理内置函数、类实例化或普通函数调用
+        name = node.name
+        def call():
+            if name in builtins:
+                return builtins[name]([arg() for arg in args])
+            bcc_class = interpreter.get_variable(name)
+            if isinstance(bcc_class, BCCClass):
+                # 创建类实例
+                return BCCInstance(bcc_class)
+            func = functions.get(name)
+            if func is None:
+                raise InterpreterError(f"未定义的函数或类: {name}", node, node.token)
+            if func.memo:
+                return interpreter.call_memoized(func, [arg() for arg in args])
+            return interpreter.execute_function(func, [arg() for arg in args])
+        return call
+
+    def compile_return(self, node):
+        value = self.compile_statement(node.value)
+        interpreter = self
+        def return_statement():
+            result = value()
+            if not interpreter.call_depth:
+                raise InterpreterError("return 语句只能在函数中使用", node)
+            return Return(result)
+        return return_statement
+
+    def compile_array_access(self, node):
+        interpreter = self
+        name = node.array
+        index_closure = self.compile_statement(node.index)
+        def array_access():
+            array = interpreter.get_variable(name)
+            if array is None:
+                raise InterpreterError(f"未定义的变量: {name}", node)
+            if not hasattr(array, 'lines'):
+                raise InterpreterError(f"变量 {name} 不是数组", node)
+            index = index_closure()
+            if not isinstance(index, int):
+                raise InterpreterError("数组索引必须是整数", node)
+            if index < 0 or index >= len(array.lines):
+                raise InterpreterError("数组索引越界", node)
+            return array.lines[index]
+        return array_access
+
+    def compile_nsreturn(self, node):
+        value = self.compile_statement(node.value)
+        def nsreturn():
+            result = value()
+            if isinstance(result, CodeBlock):
+                result = result.execute()
+                if type(result) is Return:
+                    return result
+            return None  # 不中断执行
+        return nsreturn
+
+    def compile_class(self, node):
+        interpreter = self
+        attribute_closures = [(name, self.compile_statement(value_node))
+                              for name, value_node in node.attributes.items()]
+        def define_class():
+            # 处理方法
+            methods = {}
+            for method in node.methods:
+                methods[method.name] = method
+
+            # 处理属性的初始值
+            attributes = {}
+            for name, value in attribute_closures:
+                attributes[name] = value()
+
+            # 创建类对象
+            bcc_class = BCCClass(node.name, methods, attributes)
+            interpreter.store_variable(node.name, bcc_class)
+            return bcc_class
+        return define_class
+
+    # ---- 表达式（evaluate 语义） ----
+
+    def compile_expression(self, node):
+        """把节点按 evaluate 的语义编译成闭包"""
+        closure = self.expression_closures.get(node)
+        if closure is None:
+            compiler = self.expression_compilers.get(type(node), self.compile_invalid_expression)
+            closure = self.expression_closures[node] = compiler(node)
+        return closure
+
+    def compile_invalid_expression(self, node):
+        def invalid_expression():
+            raise Exception(f"无法计算表达式: {node}")
+        return invalid_expression
+
+    def compile_expr(self, node):
+        return self.compile_expression(node.expr)
+
+    def compile_binop(self, node):
+        op = node.op
+        left = self.compile_expression(node.left)
+
+        # 右操作数是常量时省去一次闭包调用，如 i + 1、x < 10
+        if isinstance(node.right, (NumberNode, StringNode)):
+            constant = node.right.value
+            if op == TokenType.PLUS:
+                def add_constant():
+                    return left() + constant
+                return add_constant
+            if op == TokenType.MINUS:
+                def subtract_constant():
+                    return left() - constant
+                return subtract_constant
+            if op == TokenType.LT:
+                def less_than_constant():
+                    return left() < constant
+                return less_than_constant
+            if op == TokenType.LE:
+                def less_equal_constant():
+                    return left() <= constant
+                return less_equal_constant
+
+        right = self.compile_expression(node.right)
+        if op == TokenType.PLUS:
+            def add():
+                return left() + right()
+            return add
+        if op == TokenType.MINUS:
+            def subtract():
+                return left() - right()
+            return subtract
+        if op == TokenType.MULTIPLY:
+            def multiply():
+                return left() * right()
+            return multiply
+        if op == TokenType.DIVIDE:
+            def divide():
+                return left() / right()
+            return divide
+        if op == TokenType.EQ:
+            def equal():
+                return left() == right()
+            return equal
+        if op == TokenType.LT:
+            def less_than():
+                return left() < right()
+            return less_than
+        if op == TokenType.GT:
+            def greater_than():
+                return left() > right()
+            return greater_than
+        if op == TokenType.LE:
+            def less_equal():
+                return left() <= right()
+            return less_equal
+        if op == TokenType.GE:
+            def greater_equal():
+                return left() >= right()
+            return greater_equal
+        return self.compile_invalid_expression(node)
+
+    def compile_call_expression(self, node):
+        interpreter = self
+        builtins = self.builtin_functions
+        functions = self.functions
+        args = tuple(self.compile_expression(arg) for arg in node.args)
+
+        # 处理方法调用
+        if isinstance(node.name, DotAccessNode):
+            target = self.compile_expression(node.name.receiver)
+            member = node.name.member_name
+            cache = node.name.cache
+            def call_method():
+                obj = target()
+                if isinstance(obj, BCCInstance):
+                    if cache.key is obj.bcc_class:
+                        cache.hits += 1
+                        method = cache.value
+                    else:
+                        method = interpreter.cached_method(obj, member, cache)
+                    values = [arg() for arg in args]
+                    # 将实例作为第一个参数（self）传入
+                    return interpreter.execute_function(method, [obj] + values)
+                raise InterpreterError(f"无法在非对象类型上调用方法", node)
+            return call_method
+
+        if not isinstance(node.name, str):
+            def invalid_call():
+                raise InterpreterError(f"无效的函数调用", node)
+            return invalid_call
+
+        # 处理内置函数或普通函数调用
+        name = node.name
+        def call():
+            if name in builtins:
+                return builtins[name]([arg() for arg in args])
+            func = functions.get(name)
+            if func is None:
+                raise InterpreterError(f"未定义的函数: {name}", node, node.token)
+            if func.memo:
+                return interpreter.call_memoized(func, [arg() for arg in args])
+            return interpreter.execute_function(func, [arg() for arg in args])
+        return call
+
+    def compile_dot_access(self, node):
+        interpreter = self
+        target = self.compile_expression(node.receiver)
+        member = node.member_name
+        cache = node.cache
+        def dot_access():
+            # 处理对象属性访问
+            obj = target()
+            if isinstance(obj, BCCInstance):
+                if cache.key is obj.shape:
+                    cache.hits += 1
+                    return obj.values[cache.value]
+                return interpreter.cached_attribute(obj, member, cache)
+            raise InterpreterError(f"无法访问非对象类型的属性", node)
+        return dot_access
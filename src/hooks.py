@@ -0,0 +1,90 @@
+from .parser import (
+    ASTNode, PositionedNode, COLUMN_BITS,
+    PrintNode, AssignNode, LocalAssignNode, FunctionNode, CallNode, ClassNode
+)
+
+
+class ExecutionHook:
+    """观察解释器执行过程的钩子，用 Interpreter.add_hook 注册
+
+    子类只需覆盖关心的事件，没有覆盖的事件不会被调用。每个方法的第一个
+    参数是产生事件的解释器（导入的模块由各自的解释器执行）：
+
+    on_node(interpreter, node)          即将按语句语义执行节点（interpret）
+    on_line(interpreter, line)          执行到另一行源码，只有带位置的节点才有行号
+    on_call(interpreter, func, args)    即将调用 BCC 函数或方法
+    on_return(interpreter, func, value) 函数返回，因错误退出时 value 为 None
+    on_error(interpreter, error, node)  执行节点时出错，同一个错误只报告一次
+    on_module(interpreter, message)     模块管理器加载配置和模块的消息
+
+    注册了钩子的解释器（包括闭包编译和字节码后端）按树遍历执行，
+    没有钩子时不做任何检查。
+    """
+    EVENTS = ('on_node', 'on_line', 'on_call', 'on_return', 'on_error', 'on_module')
+
+    def on_node(self, interpreter, node):
+        pass
+
+    def on_line(self, interpreter, line):
+        pass
+
+    def on_call(self, interpreter, func, args):
+        pass
+
+    def on_return(self, interpreter, func, value):
+        pass
+
+    def on_error(self, interpreter, error, node):
+        pass
+
+    def on_module(self, interpreter, message):
+        pass
+
+    def overrides(self, event):
+        """子类是否覆盖了事件方法"""
+        return getattr(type(self), event) is not getattr(ExecutionHook, event)
+
+
+class DebugHook(ExecutionHook):
+    """-d/--debug 的输出：逐节点打印正在解释的节点，以及模块加载的过程"""
+
+    def on_node(self, interpreter, node):
+        print(f"DEBUG: 正在解释节点: {type(node)}")
+        node_type = type(node)
+        if node_type is list:
+            print("DEBUG: 处理语句列表")
+        elif node_type is AssignNode or node_type is LocalAssignNode:
+            print(f"DEBUG: 处理赋值: {node.name} = {node.value}")
+        elif node_type is PrintNode:
+            print("DEBUG: 执行打印操作")
+        elif node_type is FunctionNode:
+            print(f"DEBUG: 定义函数: {node.name}")
+        elif node_type is CallNode:
+            print(f"DEBUG: 调用函数: {node.name}")
+        elif node_type is ClassNode:
+            print(f"DEBUG: 定义类: {node.name}")
+
+    def on_module(self, interpreter, message):
+        print(message)
+
+
+def node_line(node):
+    """节点所在的源码行号：节点自己或其中第一个带位置的子节点的行号
+
+    不进入语句列表（函数体、循环体等），找不到时返回 None。
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, PositionedNode):
+            if node.position is not None:
+                return node.position >> COLUMN_BITS
+        if isinstance(node, ASTNode):
+            children = []
+            for cls in type(node).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    child = getattr(node, slot, None)
+                    if isinstance(child, ASTNode):
+                        children.append(child)
+            stack.extend(reversed(children))
+    return None
@@ -0,0 +1,156 @@
+from array import array
+from bisect import bisect_left
+
+from .lexer import Lexer
+from .parser import Parser, ASTNode, PositionedNode, COLUMN_BITS
+
+class IncrementalParser:
+    """增量语法分析器
+
+    缓存每个顶层语句（类、函数定义和普通语句）的AST及其token范围。源码
+    被编辑后先用 Lexer.relex 增量重新扫描，再只重新解析token范围与变化
+    区域相交的顶层语句；一旦新解析的语句边界与某个旧语句的起点重合，
+    后面的语句就原样复用。
+
+    用法:
+        parser = IncrementalParser(text)
+        statements, changed = parser.edit(start, end, new_text)
+    changed 是新语句列表中被重新解析的下标，下游工具只需重做这些语句的工作。
+    """
+    def __init__(self, text):
+        self.text = text
+        self.tokens = None
+        self.statements = None
+        self.starts = array('i')  # 每个顶层语句第一个token的下标
+        self.ends = array('i')    # 每个顶层语句之后第一个token的下标
+        self.positioned = []      # 每个顶层语句中带源码位置的节点，行号平移时使用
+        self.reparse()
+
+    def reparse(self):
+        """整篇重新解析，返回语句列表"""
+        self.tokens = Lexer(self.text).tokenize()
+        self.statements = None
+        self.statements, self.starts, self.ends = self.parse_from(0, lambda index: False)
+        self.positioned = [positioned_nodes(stmt) for stmt in self.statements]
+        return self.statements
+
+    def parse_from(self, index, can_resync):
+        """从第 index 个token开始逐个解析顶层语句
+
+        每个语句开始前调用 can_resync(当前token下标)，返回 True 时停止。
+        Returns:
+            (语句列表, 起始下标数组, 结束下标数组)
+        """
+        tokens = self.tokens
+        parser = Parser(tokens[i] for i in range(index, len(tokens)))
+        statements = []
+        starts = array('i')
+        ends = array('i')
+        while not parser.at_end():
+            start = index + parser.pos
+            if can_resync(start):
+                break
+            stmt = parser.top_level_statement()
+            if stmt:  # 忽略None返回
+                statements.append(stmt)
+                starts.append(start)
+                ends.append(index + parser.pos)
+        return statements, starts, ends
+
+    def edit(self, start, end, new_text):
+        """把源码的 [start, end) 替换为 new_text 并增量重新解析
+
+        词法或语法错误照常抛出，编辑仍然生效，此后的第一次编辑会整篇重新解析。
+        Returns:
+            (statements, changed)：更新后的顶层语句列表，以及其中被重新
+            解析的语句下标列表
+        """
+        old_text = self.text
+        text = old_text[:start] + new_text + old_text[end:]
+        self.text = text
+
+        if self.statements is None:
+            # 上一次解析失败，没有可复用的语句
+            statements = self.reparse()
+            return statements, list(range(len(statements)))
+
+        old_tokens = self.tokens
+        try:
+            tokens, first, stop = Lexer(text).relex(old_tokens, start, end, start + len(new_text))
+        except Exception:
+            self.statements = None
+            raise
+        self.tokens = tokens
+
+        delta = len(tokens) - len(old_tokens)
+        old_stop = stop - delta  # 旧token中 [first, old_stop) 被替换
+        starts, ends = self.starts, self.ends
+
+        # 第一个受影响的语句：结束位置不早于第一个变化的token。紧跟在语句
+        # 后面的token也要算进去，因为解析器靠它判断语句是否结束
+        first_item = bisect_left(ends, first)
+        index = min(starts[first_item], first) if first_item < len(starts) else first
+        reusable = bisect_left(starts, old_stop, first_item)
+        resynced = False
+        # 编辑区域之后的内容整体移动的行数
+        line_shift = new_text.count('\n') - old_text.count('\n', start, end)
+
+        def can_resync(new_index):
+            nonlocal reusable, resynced
+            if new_index < stop:
+                return False
+            old_index = new_index - delta
+            reusable = bisect_left(starts, old_index, reusable)
+            if reusable == len(starts) or starts[reusable] != old_index:
+                return False
+            # 与编辑区域同一行的语句列号会变，不能直接复用。这里直接在源码
+            # 中找行首，避免为每个新版本的源码建立完整的行首索引
+            new_offset = tokens.start_of(new_index)
+            old_offset = old_tokens.start_of(old_index)
+            if new_offset - text.rfind('\n', 0, new_offset) != \
+                    old_offset - old_text.rfind('\n', 0, old_offset):
+                return False
+            resynced = True
+            return True
+
+        try:
+            items, item_starts, item_ends = self.parse_from(index, can_resync)
+        except Exception:
+            self.statements = None
+            raise
+
+        # 重新同步之后的语句原样复用，只需平移行号和token下标
+        tail = reusable if resynced else len(starts)
+        kept = self.positioned[tail:]
+        if line_shift:
+            offset = line_shift << COLUMN_BITS
+            for nodes in kept:
+                for node in nodes:
+                    node.position += offset
+
+        self.statements = self.statements[:first_item] + items + self.statements[tail:]
+        self.positioned = self.positioned[:first_item] + \
+            [positioned_nodes(stmt) for stmt in items] + kept
+        self.starts = starts[:first_item] + item_starts + \
+            array('i', [offset + delta for offset in starts[tail:]])
+        self.ends = ends[:first_item] + item_ends + \
+            array('i', [offset + delta for offset in ends[tail:]])
+        return self.statements, list(range(first_item, first_item + len(items)))
+
+def positioned_nodes(node):
+    """收集语句中所有记录了源码位置的节点"""
+    result = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, ASTNode):
+            if isinstance(node, PositionedNode) and node.position is not None:
+                result.append(node)
+            for cls in type(node).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    stack.append(getattr(node, name, None))
+    return result
@@ -1,15 +1,24 @@
-from .bcc_token import TokenType
 from .parser import (
     NumberNode, BinOpNode, PrintNode, PrintlnNode, 
     VariableNode, AssignNode, StringNode, IfNode, 
     ForNode, FunctionNode, CallNode, ReturnNode, 
     CodeBlockNode, CodeBlockParamNode, ImportNode,
-    Parser, ArrayAccessNode, DotAccessNode, NsReturnNode,
-    ExprNode, WhileNode, ClassNode
+    Parser, PARSER_VERSION, ArrayAccessNode, DotAccessNode, NsReturnNode,
+    ExprNode, WhileNode, ClassNode, ASTNode,
+    LocalVariableNode, GlobalVariableNode, LocalAssignNode
 )
+from .bcc_token import TokenType
+from .resolver import Resolver
+from .optimizer import Optimizer, OPTIMIZER_VERSION
 from .lexer import Lexer
+from .source import MappedSource
+from .hooks import ExecutionHook, DebugHook, node_line
 import json
 import logging
+import sys
+import traceback
+from collections import OrderedDict
+from types import MethodType
 
 class InterpreterError(Exception):
     """解释器错误，包含错误发生时的Token信息"""
@@ -20,7 +29,7 @@ class InterpreterError(Exception):
         if token:
             self.line = token.line
             self.column = token.column
-        elif hasattr(node, 'token'):  # 如果节点有token属性
+        elif getattr(node, 'token', None):  # 如果节点带有位置
             self.line = node.token.line
             self.column = node.token.column
         else:
@@ -28,22 +37,170 @@ class InterpreterError(Exception):
             self.column = 0
         super().__init__(message)
 
-class ReturnException(Exception):
-    """用于处理函数返回值的特殊异常"""
+class Return:
+    """return 语句的完成信号
+
+    执行 return 语句的结果。语句列表遇到 Return 时停止执行，把它原样
+    交给外层，直到函数调用处取出 value 作为返回值；不再通过抛出异常
+    逐层返回。
+    """
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
+# 没有配置时允许的最大函数调用深度（见 main.py 的 max_recursion_depth）
+DEFAULT_MAX_RECURSION_DEPTH = 1000
+# 树遍历和闭包后端中，一层 BCC 函数调用最多占用的 Python 栈帧数
+PYTHON_FRAMES_PER_CALL = 16
+
+# 局部变量槽位尚未赋值时的标记
+UNBOUND = object()
+
+# 没有配置时每个 memo 函数最多缓存的结果数（见 main.py 的 memo_cache_size）
+DEFAULT_MEMO_SIZE = 128
+# memo 函数的参数全是这些不可变类型的值时才缓存结果
+MEMO_ARGUMENT_TYPES = frozenset({int, float, str, bool, type(None)})
+
+class Frame:
+    """函数调用的栈帧
+
+    经过 resolver 解析的函数，参数和局部变量按槽位保存在 slots 列表中，
+    未赋值的槽位为 UNBOUND；没有解析过的函数 slots 为 None，局部变量
+    按名字保存在 variables 中。在栈帧中找不到的名字再到解释器的全局变量
+    中查找，赋值总是写入当前栈帧。parent 指向调用者的栈帧，顶层代码的
+    栈帧以全局变量作为 variables，没有 parent。
+    """
+    __slots__ = ('function', 'variables', 'parent', 'slots')
+
+    def __init__(self, function, variables, parent, slots=None):
+        self.function = function
+        self.variables = variables
+        self.parent = parent
+        self.slots = slots
+
+class CountedLoop:
+    """可以按 range 执行的计数循环 for(i = 起点, i < 终点, i = i + 步长)
+
+    循环变量是局部变量时 slot 为它的槽位，否则为 None，按 name 读写当前
+    栈帧的变量。limit 是条件中的终点：整数常量的 NumberNode，或者循环体
+    中没有赋值的变量。循环变量依次取 range(起点, 终点 + offset, step)
+    中的值。
+    """
+    __slots__ = ('name', 'slot', 'limit', 'offset', 'step')
+
+    def __init__(self, name, slot, limit, offset, step):
+        self.name = name
+        self.slot = slot
+        self.limit = limit
+        self.offset = offset
+        self.step = step
+
+# 计数循环的条件：比较运算符 -> (步长的方向, range 终点相对于条件中终点的偏移)
+COUNTED_LOOP_COMPARISONS = {
+    TokenType.LT: (1, 0),
+    TokenType.LE: (1, 1),
+    TokenType.GT: (-1, 0),
+    TokenType.GE: (-1, -1),
+}
+
+def counted_loop(node):
+    """ForNode 是计数循环时返回 CountedLoop，否则返回 None
+
+    计数循环的初始化语句给变量赋值；条件是这个变量与终点比较，递增时用
+    < 或 <=，递减时用 > 或 >=；更新语句是 变量 = 变量 + 整数常量（或减去
+    整数常量）；循环体中没有给这个变量赋值的语句（不进入嵌套定义的函数）。
+    终点是整数常量，或者另一个循环体中没有赋值的变量。起点和变量终点要到
+    运行时才知道，不是整数时仍按一般的方式执行。
+    """
+    init = node.init
+    if type(init) is AssignNode and isinstance(init.name, str):
+        name, slot = init.name, None
+        variable_type = VariableNode
+    elif type(init) is LocalAssignNode:
+        name, slot = init.name, init.slot
+        variable_type = LocalVariableNode
+    else:
+        return None
+
+    def is_counter(expr):
+        if type(expr) is not variable_type:
+            return False
+        return expr.name == name if slot is None else expr.slot == slot
+
+    def is_int_constant(expr):
+        return type(expr) is NumberNode and type(expr.value) is int
+
+    def is_limit(expr):
+        if is_int_constant(expr):
+            return True
+        return type(expr) in (VariableNode, LocalVariableNode, GlobalVariableNode) and \
+            expr.name != name and not assigns(node.body, expr.name)
+
+    condition = node.condition
+    if type(condition) is not BinOpNode or condition.op not in COUNTED_LOOP_COMPARISONS or \
+            not is_counter(condition.left) or not is_limit(condition.right):
+        return None
+    update = node.update
+    if type(update) is not type(init) or update.name != name or \
+            (slot is not None and update.slot != slot):
+        return None
+    value = update.value
+    if type(value) is not BinOpNode or value.op not in (TokenType.PLUS, TokenType.MINUS) or \
+            not is_counter(value.left) or not is_int_constant(value.right):
+        return None
+    step = value.right.value if value.op == TokenType.PLUS else -value.right.value
+    direction, offset = COUNTED_LOOP_COMPARISONS[condition.op]
+    if step * direction <= 0:
+        # 步长为 0 或与比较的方向相反，循环不会正常结束
+        return None
+    if assigns(node.body, name):
+        return None
+    return CountedLoop(name, slot, condition.right, offset, step)
+
+def assigns(statements, name):
+    """语句中是否有给名字 name 赋值的语句（包括定义同名的类），不进入嵌套的函数"""
+    stack = [statements]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, ASTNode) and not isinstance(node, FunctionNode):
+            if isinstance(node, (AssignNode, LocalAssignNode, ClassNode)) and node.name == name:
+                return True
+            for cls in type(node).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    stack.append(getattr(node, slot, None))
+    return False
+
 class CodeBlock:
     """代码块类，用于存储和执行代码块"""
-    def __init__(self, statements, interpreter):
+    def __init__(self, statements, interpreter, frame=None):
         self.statements = statements
         self.interpreter = interpreter
+        self.frame = frame  # 代码块所在的栈帧，执行时在其中读写变量
         
     def execute(self):
         """执行代码块"""
+        interpreter = self.interpreter
+        if self.frame is None:
+            return self.run()
+        current = interpreter.frame
+        interpreter.enter_frame(self.frame)
+        try:
+            return self.run()
+        finally:
+            interpreter.enter_frame(current)
+
+    def run(self):
         result = None
         for stmt in self.statements:
             result = self.interpreter.interpret(stmt)
+            if type(result) is Return:
+                # 代码块中的 return 使调用代码块的函数返回
+                return result
         return result
         
     @property
@@ -57,39 +214,41 @@ class ModuleManager:
         self.loaded_files = set()
         self.lib_path = "./lib/bcc"
         self.parent_interpreter = parent_interpreter
-        self.debug = parent_interpreter.debug if parent_interpreter else False
+        self.ast_cache = parent_interpreter.ast_cache if parent_interpreter else None
+        self.optimize = parent_interpreter.optimize if parent_interpreter else 0
+        self.max_recursion_depth = parent_interpreter.max_recursion_depth if parent_interpreter else \
+            DEFAULT_MAX_RECURSION_DEPTH
         # 只有主解释器才加载配置
         if parent_interpreter is None:
             try:
                 self.load_config()
             except Exception as e:
-                if self.debug:
-                    print(f"警告: 加载基础库失败 - {str(e)}")
-                    import traceback
-                    print(traceback.format_exc())
+                self.trace(f"警告: 加载基础库失败 - {str(e)}")
+                self.trace(traceback.format_exc())
+
+    def trace(self, message):
+        """把加载过程的消息交给主解释器的钩子（ExecutionHook.on_module）"""
+        if self.parent_interpreter is not None:
+            for hook in self.parent_interpreter.module_hooks:
+                hook(self.parent_interpreter, message)
         
     def load_config(self):
         """加载配置文件"""
         try:
             config_path = f"{self.lib_path}/config.json"
-            if self.debug:
-                print(f"尝试加载配置文件: {config_path}")
+            self.trace(f"尝试加载配置文件: {config_path}")
             
             with open(config_path, "r", encoding='utf-8') as f:
                 config = json.load(f)
                 self.lib_path = config.get("libPath", self.lib_path)
                 # 自动加载默认库
                 for module in config.get("autoload", []):
-                    if self.debug:
-                        print(f"自动加载模块: {module}")
+                    self.trace(f"自动加载模块: {module}")
                     self.load_module(module)
         except FileNotFoundError:
-            if self.debug:
-                print(f"找不到配置文件: {config_path}")
-            pass
+            self.trace(f"找不到配置文件: {config_path}")
         except Exception as e:
-            if self.debug:
-                print(f"加载配置文件时出错: {str(e)}")
+            self.trace(f"加载配置文件时出错: {str(e)}")
             raise
 
     def load_module(self, filename):
@@ -101,61 +260,124 @@ class ModuleManager:
             else:
                 filepath = filename
                 
-            if self.debug:
-                print(f"尝试加载模块: {filepath}")
+            self.trace(f"尝试加载模块: {filepath}")
             
             # 检查是否已加载
             if filepath in self.loaded_files:
-                if self.debug:
-                    print(f"模块 {filepath} 已加载，直接返回")
+                self.trace(f"模块 {filepath} 已加载，直接返回")
                 return self.modules[filepath]
                 
-            # 使用 UTF-8 编码读取文件
-            with open(filepath, 'r', encoding='utf-8') as f:
-                source = f.read()
-                
-            if self.debug:
-                print(f"成功读取文件内容: {filepath}")
+            # 用 mmap 映射 UTF-8 源文件；AST 中的token引用该映射，映射随 AST 一起释放
+            source = MappedSource(filepath)
+            self.trace(f"成功映射文件: {filepath}")
             
-            lexer = Lexer(source)
-            tokens = lexer.tokenize()
-            parser = Parser(tokens)
-            ast = parser.parse()
+            def parse():
+                return Parser(Lexer(source).iter_tokens()).parse()
             
-            # 创建新的解释器实例用于模块
-            module_interpreter = Interpreter(self, self.debug)
-            module_interpreter.interpret(ast)
+            # 创建新的解释器实例用于模块，与主解释器使用相同的执行后端和钩子
+            interpreter_class = type(self.parent_interpreter) if self.parent_interpreter else Interpreter
+            module_interpreter = interpreter_class(self, optimize=self.optimize,
+                                                   max_recursion_depth=self.max_recursion_depth)
+            module_interpreter.filename = filepath
+            if self.parent_interpreter is not None:
+                module_interpreter.memo_size = self.parent_interpreter.memo_size
+                for hook in self.parent_interpreter.hooks:
+                    module_interpreter.add_hook(hook)
+            program = module_interpreter.load_program(source, parse, self.ast_cache)
+            module_interpreter.interpret(program)
             
             self.modules[filepath] = module_interpreter
             self.loaded_files.add(filepath)
             
-            if self.debug:
-                print(f"成功加载模块: {filepath}")
+            self.trace(f"成功加载模块: {filepath}")
             return module_interpreter
             
         except FileNotFoundError:
-            if self.debug:
-                print(f"找不到模块文件: {filepath}")
+            self.trace(f"找不到模块文件: {filepath}")
             raise InterpreterError(f"找不到模块: {filename}", None)
         except Exception as e:
-            if self.debug:
-                print(f"加载模块时出错: {str(e)}")
-                import traceback
-                print(traceback.format_exc())
+            self.trace(f"加载模块时出错: {str(e)}")
+            self.trace(traceback.format_exc())
             raise
 
+class Shape:
+    """实例属性的布局（hidden class）
+
+    names 是按加入顺序排列的属性名，index 把属性名映射到实例 values 列表
+    中的下标。实例从所属类的 shape 开始，添加新属性时沿 transitions 转移
+    到多一个属性的 shape，按相同顺序添加属性的实例共享同一个 shape。
+    shape 创建后不再改变，内联缓存按 shape 缓存属性的下标。
+    """
+    __slots__ = ('names', 'index', 'transitions')
+
+    def __init__(self, names):
+        self.names = names
+        self.index = {name: position for position, name in enumerate(names)}
+        self.transitions = {}
+
+    def add(self, name):
+        """添加属性 name 之后的 shape"""
+        shape = self.transitions.get(name)
+        if shape is None:
+            shape = self.transitions[name] = Shape(self.names + (name,))
+        return shape
+
+class MemoCache:
+    """memo 函数的结果缓存
+
+    以参数为键，按最近使用的顺序保存在 results 中，超过 maxsize 时淘汰
+    最久没有用到的结果；maxsize 为 None 时不限数量。hits、misses 和
+    evictions 统计命中、未命中和淘汰的次数。
+    """
+    __slots__ = ('results', 'maxsize', 'hits', 'misses', 'evictions')
+
+    def __init__(self, maxsize):
+        self.results = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def store(self, key, value):
+        """记入结果，超出容量时淘汰最久没有用到的"""
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        self.results[key] = value
+        if self.maxsize is not None and len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """清空结果和统计"""
+        self.results.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __str__(self):
+        maxsize = "不限" if self.maxsize is None else self.maxsize
+        return (f"命中 {self.hits} 次，未命中 {self.misses} 次，淘汰 {self.evictions} 次，"
+                f"缓存 {len(self.results)}/{maxsize}")
+
 class BCCClass:
     """BCC 类的运行时表示"""
     def __init__(self, name, methods, attributes):
         self.name = name
         self.methods = methods
         self.attributes = attributes.copy()
+        # 新实例的 shape 和属性初始值
+        self.shape = Shape(tuple(self.attributes))
+        self.defaults = list(self.attributes.values())
 
 class BCCInstance:
-    """BCC 类的实例"""
+    """BCC 类的实例
+
+    属性值按 shape 中的顺序保存在 values 列表里，不为每个实例复制属性字典。
+    """
+    __slots__ = ('bcc_class', 'shape', 'values')
+
     def __init__(self, bcc_class):
         self.bcc_class = bcc_class
-        self.attributes = bcc_class.attributes.copy()
+        self.shape = bcc_class.shape
+        self.values = bcc_class.defaults.copy()
 
     def get_method(self, name):
         """获取实例方法"""
@@ -165,18 +387,29 @@ class BCCInstance:
 
     def get_attribute(self, name):
         """获取实例属性"""
-        if name in self.attributes:
-            return self.attributes[name]
-        raise InterpreterError(f"实例没有属性 {name}")
+        index = self.shape.index.get(name)
+        if index is None:
+            raise InterpreterError(f"实例没有属性 {name}")
+        return self.values[index]
 
     def set_attribute(self, name, value):
-        """设置实例属性"""
-        self.attributes[name] = value
+        """设置实例属性，添加新属性时转移到新的 shape"""
+        index = self.shape.index.get(name)
+        if index is None:
+            self.shape = self.shape.add(name)
+            self.values.append(value)
+        else:
+            self.values[index] = value
+
+    @property
+    def attributes(self):
+        """属性名到值的字典（副本）"""
+        return dict(zip(self.shape.names, self.values))
 
     def __str__(self):
         """返回实例的字符串表示"""
         attrs = []
-        for name, value in self.attributes.items():
+        for name, value in zip(self.shape.names, self.values):
             attrs.append(f"{name}={value}")
         return f"{self.bcc_class.name}({', '.join(attrs)})"
 
@@ -184,12 +417,98 @@ class BCCInstance:
         """返回实例的详细字符串表示"""
         return self.__str__()
 
+# 内置函数名对应的方法名
+BUILTIN_FUNCTIONS = {
+    'len': 'builtin_len',
+    'eval': 'builtin_eval',
+    'str': 'builtin_str',
+    'int': 'builtin_int',
+    'float': 'builtin_float',
+    'bool': 'builtin_bool',
+    'print': 'builtin_print',
+    'type': 'builtin_type',
+    'cacheInfo': 'builtin_cache_info',
+    'cacheClear': 'builtin_cache_clear',
+}
+
+# interpret() 按 type(node) 分派到的方法名（语句语义）
+INTERPRET_HANDLERS = {
+    list: 'interpret_list',
+    ImportNode: 'interpret_import',
+    NumberNode: 'interpret_constant',
+    StringNode: 'interpret_constant',
+    VariableNode: 'interpret_variable',
+    LocalVariableNode: 'interpret_local_variable',
+    GlobalVariableNode: 'interpret_global_variable',
+    AssignNode: 'interpret_assign',
+    LocalAssignNode: 'interpret_local_assign',
+    BinOpNode: 'interpret_binop',
+    PrintNode: 'interpret_print',
+    PrintlnNode: 'interpret_println',
+    IfNode: 'interpret_if',
+    ForNode: 'interpret_for',
+    WhileNode: 'interpret_while',
+    FunctionNode: 'interpret_function',
+    CallNode: 'interpret_call',
+    ReturnNode: 'interpret_return',
+    ArrayAccessNode: 'interpret_array_access',
+    NsReturnNode: 'interpret_nsreturn',
+    ClassNode: 'interpret_class',
+}
+
+# evaluate() 按 type(node) 分派到的方法名（表达式语义）
+EVALUATE_HANDLERS = {
+    NumberNode: 'evaluate_constant',
+    StringNode: 'evaluate_constant',
+    ExprNode: 'evaluate_expr',
+    VariableNode: 'evaluate_variable',
+    LocalVariableNode: 'evaluate_local_variable',
+    GlobalVariableNode: 'evaluate_global_variable',
+    BinOpNode: 'evaluate_binop',
+    CallNode: 'evaluate_call',
+    DotAccessNode: 'evaluate_dot_access',
+}
+
 class Interpreter:
-    def __init__(self, parent_module_manager=None, debug=False):
-        # 存储变量的字典
-        self.variables = {}
+    def __init__(self, parent_module_manager=None, debug=False, ast_cache=None, optimize=0,
+                 max_recursion_depth=DEFAULT_MAX_RECURSION_DEPTH):
+        self.warnings = []  # 名字解析时发现的问题（ResolverError）
+        self.optimize = optimize  # 优化级别（见 optimizer），0 表示不优化
+        self.optimizations = []  # 每次优化程序的 Optimizer，记录了各遍的改写
+        self.max_recursion_depth = max_recursion_depth
+        self.call_depth = 0  # 正在执行的函数调用层数
+        self.inline_caches = set()  # 未命中过的内联缓存（见 parser.InlineCache），用于统计命中率
+        self.memo_size = DEFAULT_MEMO_SIZE  # 每个 memo 函数最多缓存的结果数，None 表示不限
+        self.memo_caches = {}  # memo 函数的结果缓存（MemoCache），以 FunctionNode 为键
+        self.counted_loops = {}  # for 循环是否为计数循环（CountedLoop 或 None），以节点对象为键
+        # 函数调用在 Python 栈上递归执行时，Python 的递归限制要容得下
+        # max_recursion_depth 层调用（另外留出调用解释器的代码使用的栈帧），
+        # 超过时报告 BCC 的错误而不是 RecursionError
+        recursion_limit = max_recursion_depth * PYTHON_FRAMES_PER_CALL + 1000
+        if sys.getrecursionlimit() < recursion_limit:
+            sys.setrecursionlimit(recursion_limit)
+        # 全局变量，顶层代码的栈帧直接使用它
+        self.globals = {}
+        self.frame = Frame(None, self.globals, None)
+        # 当前栈帧的变量，顶层时就是全局变量
+        self.variables = self.globals
         self.functions = {}  # 存储函数定义
-        self.debug = debug  # 添加调试标志
+        self.ast_cache = ast_cache  # 模块的 AST 缓存（ASTCache），None 表示不缓存
+        self.filename = "<stdin>"  # 执行的源文件，用于性能分析等报告
+        # 执行钩子（见 hooks.ExecutionHook），以及按事件分组的钩子方法
+        self.hooks = []
+        self.node_hooks = []
+        self.line_hooks = []
+        self.call_hooks = []
+        self.return_hooks = []
+        self.error_hooks = []
+        self.module_hooks = []
+        self.line = None  # 钩子最近一次报告的行号
+        self.node_lines = {}  # 节点的行号，以节点对象为键缓存
+        self.reported_error = None  # 最近一次报告给钩子的错误
+        if debug:
+            # 调试模式就是注册打印调试信息的钩子，模块管理器加载配置时也要用到
+            self.add_hook(DebugHook())
         
         # 如果有父模块管理器，使用它，否则创建新的
         if isinstance(parent_module_manager, ModuleManager):
@@ -198,16 +517,11 @@ class Interpreter:
             self.module_manager = ModuleManager(self)
         
         # 添加内置函数
-        self.builtin_functions = {
-            'len': self.builtin_len,
-            'eval': self.builtin_eval,
-            'str': self.builtin_str,
-            'int': self.builtin_int,
-            'float': self.builtin_float,
-            'bool': self.builtin_bool,
-            'print': self.builtin_print,
-            'type': self.builtin_type,
-        }
+        self.builtin_functions = {name: getattr(self, method) for name, method in BUILTIN_FUNCTIONS.items()}
+        
+        # 按节点类型分派的处理方法，子类覆盖的方法同样生效
+        self.interpret_handlers = {node_type: getattr(self, name) for node_type, name in INTERPRET_HANDLERS.items()}
+        self.evaluate_handlers = {node_type: getattr(self, name) for node_type, name in EVALUATE_HANDLERS.items()}
     
     def builtin_len(self, args):
         """内置的 len 函数"""
@@ -278,270 +592,463 @@ class Interpreter:
             raise InterpreterError("type() 函数需要一个参数")
         return type(args[0]).__name__
     
+    def builtin_cache_info(self, args):
+        """内置的 cacheInfo 函数，返回 memo 函数结果缓存的统计"""
+        if len(args) != 1:
+            raise InterpreterError("cacheInfo() 函数需要一个参数")
+        return f"{args[0]}: {self.memo_cache(self.memo_function(args[0]))}"
+
+    def builtin_cache_clear(self, args):
+        """内置的 cacheClear 函数，清空一个 memo 函数的结果缓存，没有参数时清空全部"""
+        if len(args) > 1:
+            raise InterpreterError("cacheClear() 函数最多需要一个参数")
+        if args:
+            self.memo_cache(self.memo_function(args[0])).clear()
+        else:
+            for cache in self.memo_caches.values():
+                cache.clear()
+        return None
+
+    def memo_function(self, name):
+        """按名字查找 memo 函数"""
+        func = self.functions.get(name) if isinstance(name, str) else None
+        if func is None or not func.memo:
+            raise InterpreterError(f"{name} 不是 memo 函数")
+        return func
+
+    def memo_cache(self, func):
+        """memo 函数在本解释器中的结果缓存"""
+        cache = self.memo_caches.get(func)
+        if cache is None:
+            cache = self.memo_caches[func] = MemoCache(self.memo_size)
+        return cache
+
+    def call_memoized(self, func, args):
+        """调用 memo 函数：同样的参数再次调用时直接返回缓存的结果
+
+        参数连同类型一起作为键，1 和 1.0 分别缓存。只有参数全是不可变的值
+        （见 MEMO_ARGUMENT_TYPES）时才使用缓存：实例的属性可能在两次调用
+        之间被修改，代码块不能哈希，这些参数直接执行函数。执行出错时不缓存。
+        """
+        types = tuple(map(type, args))
+        if not MEMO_ARGUMENT_TYPES.issuperset(types):
+            return self.execute_function(func, args)
+        cache = self.memo_cache(func)
+        key = (*args, *types)
+        value = cache.results.get(key, UNBOUND)
+        if value is not UNBOUND:
+            cache.hits += 1
+            cache.results.move_to_end(key)
+            return value
+        cache.misses += 1
+        value = self.execute_function(func, args)
+        cache.store(key, value)
+        return value
+
+    def memo_stats(self):
+        """本解释器中 memo 函数结果缓存的 (命中次数, 未命中次数, 淘汰次数)"""
+        caches = self.memo_caches.values()
+        return (sum(cache.hits for cache in caches), sum(cache.misses for cache in caches),
+                sum(cache.evictions for cache in caches))
+
     def evaluate(self, node):
         """计算表达式的值"""
-        if isinstance(node, NumberNode):
-            return node.value
+        handler = self.evaluate_handlers.get(type(node))
+        if handler is None:
+            raise Exception(f"无法计算表达式: {node}")
+        return handler(node)
+
+    def evaluate_constant(self, node):
+        return node.value
+
+    def evaluate_expr(self, node):
+        return self.evaluate(node.expr)
+
+    def evaluate_variable(self, node):
+        return self.load_variable(node)
+
+    def evaluate_local_variable(self, node):
+        value = self.frame.slots[node.slot]
+        if value is UNBOUND:
+            # 局部变量还没有赋值时读取同名的全局变量
+            return self.load_global(node)
+        return value
+
+    def evaluate_global_variable(self, node):
+        return self.load_global(node)
+
+    def evaluate_binop(self, node):
+        left = self.evaluate(node.left)
+        right = self.evaluate(node.right)
+        # 运算函数在解析时已经确定
+        if node.function is None:
+            raise Exception(f"无法计算表达式: {node}")
+        return node.function(left, right)
+
+    def evaluate_call(self, node):
+        # 检查是否是内置函数
+        if isinstance(node.name, str) and node.name in self.builtin_functions:
+            args = [self.evaluate(arg) for arg in node.args]
+            return self.builtin_functions[node.name](args)
         
-        if isinstance(node, StringNode):
-            return node.value
-            
-        if isinstance(node, ExprNode):
-            return self.evaluate(node.expr)
-            
-        if isinstance(node, VariableNode):
-            if node.name not in self.variables:
-                raise InterpreterError(f"未定义的变量: {node.name}", node)
-            return self.variables[node.name]
-            
-        if isinstance(node, BinOpNode):
-            left = self.evaluate(node.left)
-            right = self.evaluate(node.right)
-            
-            if node.op.type == TokenType.PLUS:
-                return left + right
-            elif node.op.type == TokenType.MINUS:
-                return left - right
-            elif node.op.type == TokenType.MULTIPLY:
-                return left * right
-            elif node.op.type == TokenType.DIVIDE:
-                return left / right
-            elif node.op.type == TokenType.EQ:
-                return left == right
-            elif node.op.type == TokenType.LT:
-                return left < right
-            elif node.op.type == TokenType.GT:
-                return left > right
-            elif node.op.type == TokenType.LE:
-                return left <= right
-            elif node.op.type == TokenType.GE:
-                return left >= right
-                
-        if isinstance(node, CallNode):
-            # 检查是否是内置函数
-            if isinstance(node.name, str) and node.name in self.builtin_functions:
-                args = [self.evaluate(arg) for arg in node.args]
-                return self.builtin_functions[node.name](args)
-            
-            # 处理方法调用
-            if isinstance(node.name, DotAccessNode):
-                obj = self.evaluate(VariableNode(node.name.object_name))
-                if isinstance(obj, BCCInstance):
-                    method = obj.get_method(node.name.member_name)
-                    args = [self.evaluate(arg) for arg in node.args]
-                    # 将实例作为第一个参数（self）传入
-                    return self.execute_function(method, [obj] + args)
-                raise InterpreterError(f"无法在非对象类型上调用方法", node)
-            
-            # 处理普通函数调用
-            if isinstance(node.name, str):
-                if node.name not in self.functions:
-                    raise InterpreterError(f"未定义的函数: {node.name}", node, node.token)
-                
-                func = self.functions[node.name]
-                args = [self.evaluate(arg) for arg in node.args]
-                return self.execute_function(func, args)
-            
-            raise InterpreterError(f"无效的函数调用", node)
-            
-        if isinstance(node, DotAccessNode):
-            # 处理对象属性访问
-            obj = self.evaluate(VariableNode(node.object_name))
+        # 处理方法调用
+        if isinstance(node.name, DotAccessNode):
+            target = node.name
+            obj = self.evaluate(target.receiver)
             if isinstance(obj, BCCInstance):
-                return obj.get_attribute(node.member_name)
-            raise InterpreterError(f"无法访问非对象类型的属性", node)
+                cache = target.cache
+                if cache.key is obj.bcc_class:
+                    cache.hits += 1
+                    method = cache.value
+                else:
+                    method = self.cached_method(obj, target.member_name, cache)
+                args = [self.evaluate(arg) for arg in node.args]
+                # 将实例作为第一个参数（self）传入
+                return self.execute_function(method, [obj] + args)
+            raise InterpreterError(f"无法在非对象类型上调用方法", node)
+        
+        # 处理普通函数调用
+        if isinstance(node.name, str):
+            if node.name not in self.functions:
+                raise InterpreterError(f"未定义的函数: {node.name}", node, node.token)
             
-        raise Exception(f"无法计算表��式: {node}")
+            func = self.functions[node.name]
+            args = [self.evaluate(arg) for arg in node.args]
+            if func.memo:
+                return self.call_memoized(func, args)
+            return self.execute_function(func, args)
+        
+        raise InterpreterError(f"无效的函数调用", node)
+
+    def evaluate_dot_access(self, node):
+        # 处理对象属性访问
+        obj = self.evaluate(node.receiver)
+        if isinstance(obj, BCCInstance):
+            cache = node.cache
+            if cache.key is obj.shape:
+                cache.hits += 1
+                return obj.values[cache.value]
+            return self.cached_attribute(obj, node.member_name, cache)
+        raise InterpreterError(f"无法访问非对象类型的属性", node)
 
     def interpret(self, node):
         """解释执行AST节点"""
         if node is None:
             return None
-            
-        if self.debug:
-            print(f"DEBUG: 正在解释节点: {type(node)}")
-            
-        if isinstance(node, ImportNode):
-            self.import_module(node.module_name)
-            return None
-            
-        if isinstance(node, list):
-            # 处理语句列表
-            if self.debug:
-                print("DEBUG: 处理语句列表")
-            for statement in node:
-                self.interpret(statement)
-            return None
-            
-        # 处理数字节点
-        if isinstance(node, NumberNode):
-            return node.value
-        
-        # 处理字符串节点
-        if isinstance(node, StringNode):
-            return node.value
-        
-        # 处理变量节点    
-        if isinstance(node, VariableNode):
-            if node.name not in self.variables:
-                raise InterpreterError(f"未定义的变量: {node.name}", node)
-            return self.variables[node.name]
-            
-        # 处理赋值节点
-        if isinstance(node, AssignNode):
-            if self.debug:
-                print(f"DEBUG: 处理赋值: {node.name} = {node.value}")
-            if isinstance(node.name, str):
-                # 普通变量赋值
+        handler = self.interpret_handlers.get(type(node))
+        if handler is None:
+            raise InterpreterError(f"未知的节点类型: {type(node)}", node)
+        return handler(node)
+
+    def interpret_import(self, node):
+        self.import_module(node.module_name)
+        return None
+
+    def interpret_list(self, node):
+        # 处理语句列表
+        for statement in node:
+            result = self.interpret(statement)
+            if type(result) is Return:
+                return result
+        return None
+
+    def interpret_constant(self, node):
+        # 处理数字和字符串节点
+        return node.value
+
+    def interpret_variable(self, node):
+        return self.load_variable(node)
+
+    def interpret_local_variable(self, node):
+        value = self.frame.slots[node.slot]
+        if value is UNBOUND:
+            return self.load_global(node)
+        return value
+
+    def interpret_global_variable(self, node):
+        return self.load_global(node)
+
+    def interpret_assign(self, node):
+        if isinstance(node.name, str):
+            # 普通变量赋值
+            value = self.interpret(node.value)
+            self.variables[node.name] = value
+            return value
+        elif isinstance(node.name, DotAccessNode):
+            # 对象属性赋值
+            target = node.name
+            obj = self.interpret(target.receiver)
+            if isinstance(obj, BCCInstance):
                 value = self.interpret(node.value)
-                self.variables[node.name] = value
+                cache = target.cache
+                if cache.key is obj.shape:
+                    cache.hits += 1
+                    obj.values[cache.value] = value
+                else:
+                    self.cached_store(obj, target.member_name, value, cache)
                 return value
-            elif isinstance(node.name, DotAccessNode):
-                # 对象属性赋值
-                obj = self.interpret(VariableNode(node.name.object_name))
-                if isinstance(obj, BCCInstance):
-                    value = self.interpret(node.value)
-                    obj.set_attribute(node.name.member_name, value)
-                    return value
-                raise InterpreterError(f"无法给非对象类型赋值属性", node)
-            else:
-                raise InterpreterError(f"无效的赋值目标", node)
+            raise InterpreterError(f"无法给非对象类型赋值属性", node)
+        else:
+            raise InterpreterError(f"无效的赋值目标", node)
+
+    def interpret_local_assign(self, node):
+        value = self.interpret(node.value)
+        self.frame.slots[node.slot] = value
+        return value
+
+    def interpret_binop(self, node):
+        return self.evaluate(node)
+
+    def interpret_print(self, node):
+        result = self.interpret(node.expr)
+        print(result)
+        return None
+
+    def interpret_println(self, node):
+        # 不换行打印
+        result = self.interpret(node.expr)
+        print(result, end='')
+        return None
+
+    def interpret_if(self, node):
+        condition_value = self.evaluate(node.condition)
+        if condition_value:
+            for statement in node.body:
+                result = self.interpret(statement)
+                if type(result) is Return:
+                    return result
+        return None
+
+    def interpret_for(self, node):
+        # 执行初始化语句
+        self.interpret(node.init)
+        
+        # 计数循环按 range 执行；注册了钩子时仍逐次执行条件和更新语句，
+        # 钩子能看到与原来相同的事件
+        loop = self.counted_loop(node)
+        if loop is not None and not self.hooks:
+            result = self.interpret_counted_for(node, loop)
+            if result is not UNBOUND:
+                return result
+        
+        # 循环执行
+        while True:
+            # 检查条件
+            if not self.evaluate(node.condition):
+                break
             
-        # 处理二元运算节点
-        if isinstance(node, BinOpNode):
-            return self.evaluate(node)
+            # 执行循环体
+            for stmt in node.body:
+                result = self.interpret(stmt)
+                if type(result) is Return:
+                    return result
             
-        # 处理打印节点
-        if isinstance(node, PrintNode):
-            if self.debug:
-                print("DEBUG: 执行打印操作")
-            result = self.interpret(node.expr)
-            print(result)
-            return None
+            # 执行更新语句
+            self.interpret(node.update)
+        
+        return None
 
-        # 处理不换行打印节点
-        if isinstance(node, PrintlnNode):
-            result = self.interpret(node.expr)
-            print(result, end='')
-            return None 
-
-        if isinstance(node, IfNode):
-            condition_value = self.evaluate(node.condition)
-            if condition_value:
-                for statement in node.body:
-                    self.interpret(statement)
-            return None
+    def counted_loop(self, node):
+        """for 循环节点对应的 CountedLoop，不是计数循环时返回 None"""
+        loop = self.counted_loops.get(node, UNBOUND)
+        if loop is UNBOUND:
+            loop = self.counted_loops[node] = counted_loop(node)
+        return loop
 
-        if isinstance(node, ForNode):
-            # 执行初始化语句
-            self.interpret(node.init)
-            
-            # 循环执行
-            while True:
-                # 检查条件
-                if not self.evaluate(node.condition):
-                    break
-                
-                # 执行循环体
-                for stmt in node.body:
-                    self.interpret(stmt)
-                
-                # 执行更新语句
+    def interpret_counted_for(self, node, loop):
+        """按 range 执行已经初始化的计数循环，循环变量每次和最后的值都与逐次执行条件、更新语句时相同
+
+        终点在初始化之后读取一次。起点或终点不是整数时不执行，返回
+        UNBOUND。循环体中调用的函数可能执行代码块给循环变量或终点变量
+        赋值，每次循环后检查两者，被改变时执行更新语句并返回 UNBOUND。
+        两种情况都由调用者按一般的方式继续循环。
+        """
+        if loop.slot is None:
+            variables, key = self.variables, loop.name
+        else:
+            variables, key = self.frame.slots, loop.slot
+        start = variables[key]
+        location = self.loop_limit(loop)
+        if type(start) is not int or location is None:
+            return UNBOUND
+        limits, limit_key = location
+        limit = limits[limit_key]
+        if type(limit) is not int:
+            return UNBOUND
+        counters = range(start, limit + loop.offset, loop.step)
+        for counter in counters:
+            variables[key] = counter
+            for stmt in node.body:
+                result = self.interpret(stmt)
+                if type(result) is Return:
+                    return result
+            if variables[key] is not counter or limits[limit_key] is not limit:
                 self.interpret(node.update)
-            
-            return None
+                return UNBOUND
+        if counters:
+            # 条件不成立时循环变量的值
+            variables[key] = counters[-1] + loop.step
+        return None
 
-        if isinstance(node, FunctionNode):
-            # 存储函数定义
-            if self.debug:
-                print(f"DEBUG: 定义函数: {node.name}")
-            self.functions[node.name] = node
-            return None
-            
-        if isinstance(node, CallNode):
-            if self.debug:
-                print(f"DEBUG: 调用函数: {node.name}")
-            # 检查是否是内置函数
-            if isinstance(node.name, str) and node.name in self.builtin_functions:
+    def loop_limit(self, loop):
+        """计数循环的终点保存在哪里：(变量字典或槽位列表, 键)
+
+        终点是常量时返回只有这个常量的元组和 0；终点变量还没有赋值（局部
+        变量槽位为空时会读取同名的全局变量）时返回 None，按一般的方式执行。
+        """
+        limit = loop.limit
+        limit_type = type(limit)
+        if limit_type is NumberNode:
+            return (limit.value,), 0
+        if limit_type is LocalVariableNode:
+            slots = self.frame.slots
+            return (slots, limit.slot) if slots[limit.slot] is not UNBOUND else None
+        variables = self.globals if limit_type is GlobalVariableNode else self.variables
+        return (variables, limit.name) if limit.name in variables else None
+
+    def interpret_while(self, node):
+        while self.evaluate(node.condition):
+            for stmt in node.body:
+                result = self.interpret(stmt)
+                if type(result) is Return:
+                    return result
+        return None
+
+    def interpret_function(self, node):
+        # 存储函数定义
+        self.functions[node.name] = node
+        return None
+
+    def interpret_call(self, node):
+        # 检查是否是内置函数
+        if isinstance(node.name, str) and node.name in self.builtin_functions:
+            args = [self.interpret(arg) for arg in node.args]
+            return self.builtin_functions[node.name](args)
+        
+        # 处理方法调用
+        if isinstance(node.name, DotAccessNode):
+            target = node.name
+            obj = self.interpret(target.receiver)
+            if isinstance(obj, BCCInstance):
+                cache = target.cache
+                if cache.key is obj.bcc_class:
+                    cache.hits += 1
+                    method = cache.value
+                else:
+                    method = self.cached_method(obj, target.member_name, cache)
                 args = [self.interpret(arg) for arg in node.args]
-                return self.builtin_functions[node.name](args)
-            
-            # 处理方法调用
-            if isinstance(node.name, DotAccessNode):
-                obj = self.interpret(VariableNode(node.name.object_name))
-                if isinstance(obj, BCCInstance):
-                    method = obj.get_method(node.name.member_name)
-                    args = [self.interpret(arg) for arg in node.args]
-                    # 将实例作为第一个参数（self）传入
-                    return self.execute_function(method, [obj] + args)
-                raise InterpreterError(f"无法在非对象类型上调用方法", node)
+                # 将实例作为第一个参数（self）传入
+                return self.execute_function(method, [obj] + args)
+            raise InterpreterError(f"无法在非对象类型上调用方法", node)
+        
+        # 处理普通函数调用或类实例化
+        if isinstance(node.name, str):
+            # 检查是否是类名
+            bcc_class = self.get_variable(node.name)
+            if isinstance(bcc_class, BCCClass):
+                # 创建类实例
+                instance = BCCInstance(bcc_class)
+                return instance
             
-            # 处理普通函数调用或类实例化
-            if isinstance(node.name, str):
-                # 检查是否是类名
-                if node.name in self.variables and isinstance(self.variables[node.name], BCCClass):
-                    # 创建类实例
-                    bcc_class = self.variables[node.name]
-                    instance = BCCInstance(bcc_class)
-                    return instance
-                
-                # 检查是否是函数调用
-                if node.name not in self.functions:
-                    raise InterpreterError(f"未定义的函数或类: {node.name}", node, node.token)
-                
-                func = self.functions[node.name]
-                args = [self.interpret(arg) for arg in node.args]
-                return self.execute_function(func, args)
+            # 检查是否是函数调用
+            if node.name not in self.functions:
+                raise InterpreterError(f"未定义的函数或类: {node.name}", node, node.token)
             
-            raise InterpreterError(f"无效的函数调用", node)
-
-        if isinstance(node, ReturnNode):
-            raise ReturnException(self.interpret(node.value))
-
-        if isinstance(node, ArrayAccessNode):
-            array = self.variables.get(node.array)
-            if array is None:
-                raise InterpreterError(f"未定义的变量: {node.array}", node)
-            if not hasattr(array, 'lines'):
-                raise InterpreterError(f"变量 {node.array} 不是数组", node)
-            index = self.interpret(node.index)
-            if not isinstance(index, int):
-                raise InterpreterError("数组索引必须是整数", node)
-            if index < 0 or index >= len(array.lines):
-                raise InterpreterError("数组索引越界", node)
-            return array.lines[index]
-
-        if isinstance(node, NsReturnNode):
-            value = self.interpret(node.value)
-            if isinstance(value, CodeBlock):
-                value.execute()
-            return None  # 不中断执行
-
-        if isinstance(node, WhileNode):
-            while self.evaluate(node.condition):
-                for stmt in node.body:
-                    self.interpret(stmt)
-            return None
+            func = self.functions[node.name]
+            args = [self.interpret(arg) for arg in node.args]
+            if func.memo:
+                return self.call_memoized(func, args)
+            return self.execute_function(func, args)
+        
+        raise InterpreterError(f"无效的函数调用", node)
 
-        if isinstance(node, ClassNode):
-            if self.debug:
-                print(f"DEBUG: 定义类: {node.name}")
-            # 处理方法
-            methods = {}
-            for method in node.methods:
-                methods[method.name] = method
-            
-            # 处理属性的初始值
-            attributes = {}
-            for name, value_node in node.attributes.items():
-                attributes[name] = self.interpret(value_node)
-            
-            # 创建类对象
-            bcc_class = BCCClass(node.name, methods, attributes)
-            self.variables[node.name] = bcc_class
-            return bcc_class
+    def interpret_return(self, node):
+        value = self.interpret(node.value)
+        if not self.call_depth:
+            raise InterpreterError("return 语句只能在函数中使用", node)
+        return Return(value)
+
+    def interpret_array_access(self, node):
+        array = self.get_variable(node.array)
+        if array is None:
+            raise InterpreterError(f"未定义的变量: {node.array}", node)
+        if not hasattr(array, 'lines'):
+            raise InterpreterError(f"变量 {node.array} 不是数组", node)
+        index = self.interpret(node.index)
+        if not isinstance(index, int):
+            raise InterpreterError("数组索引必须是整数", node)
+        if index < 0 or index >= len(array.lines):
+            raise InterpreterError("数组索引越界", node)
+        return array.lines[index]
+
+    def interpret_nsreturn(self, node):
+        value = self.interpret(node.value)
+        if isinstance(value, CodeBlock):
+            result = value.execute()
+            if type(result) is Return:
+                return result
+        return None  # 不中断执行
+
+    def interpret_class(self, node):
+        # 处理方法
+        methods = {}
+        for method in node.methods:
+            methods[method.name] = method
+        
+        # 处理属性的初始值
+        attributes = {}
+        for name, value_node in node.attributes.items():
+            attributes[name] = self.interpret(value_node)
+        
+        # 创建类对象
+        bcc_class = BCCClass(node.name, methods, attributes)
+        self.store_variable(node.name, bcc_class)
+        return bcc_class
+
+    def load_program(self, source, parse, ast_cache=None):
+        """得到 source 的可执行形式，树遍历解释器直接执行解析过名字的AST
+
+        传入 ast_cache 时优先使用缓存的结果。
+        """
+        if ast_cache is not None:
+            suffix, version = self.cache_key('.ast', PARSER_VERSION)
+            return self.cached_program(source, lambda: self.parse_program(parse), ast_cache, suffix, version)
+        return self.parse_program(parse)
+
+    def cached_program(self, source, build, ast_cache, suffix, version):
+        """从缓存中取得 build() 的结果
+
+        build() 过程中名字解析的警告与结果一起缓存，命中时同样记入
+        self.warnings，警告不会因为使用了缓存而消失。
+        """
+        def build_with_warnings():
+            start = len(self.warnings)
+            program = build()
+            warnings = self.warnings[start:]
+            del self.warnings[start:]
+            return program, warnings
+        program, warnings = ast_cache.parse(source, build_with_warnings, suffix, version)
+        self.warnings.extend(warnings)
+        return program
 
-        raise InterpreterError(f"未知的节点类型: {type(node)}", node)
+    def cache_key(self, suffix, version):
+        """缓存文件的后缀和版本，优化过的程序按优化级别分别缓存"""
+        if not self.optimize:
+            return suffix, version
+        return f".O{self.optimize}{suffix}", f"{version}-{OPTIMIZER_VERSION}"
+
+    def parse_program(self, parse):
+        """解析源码，按优化级别优化后为函数分配局部变量槽位
+
+        无法解析的名字记录在 self.warnings 中，由调用者决定如何报告。
+        """
+        ast = parse()
+        if self.optimize:
+            optimizer = Optimizer(self.optimize, self.builtin_functions)
+            ast = optimizer.optimize(ast)
+            self.optimizations.append(optimizer)
+        self.warnings.extend(Resolver(self.globals).resolve_program(ast))
+        return ast
 
     def import_module(self, module_name):
         """导入模块"""
@@ -549,35 +1056,202 @@ class Interpreter:
         # 将模块的函数添加到当前作用域
         self.functions.update(module.functions)
 
-    def execute_function(self, func, args):
-        """执行函数调用"""
+    def lookup(self, name):
+        """按名字查找变量：当前栈帧、局部变量槽位、全局变量，找不到时返回 UNBOUND"""
+        variables = self.variables
+        if name in variables:
+            return variables[name]
+        frame = self.frame
+        if frame.slots is not None:
+            slot = frame.function.slot_index.get(name)
+            if slot is not None and frame.slots[slot] is not UNBOUND:
+                return frame.slots[slot]
+        return self.globals.get(name, UNBOUND)
+
+    def load_variable(self, node):
+        """按名字读取变量"""
+        value = self.lookup(node.name)
+        if value is UNBOUND:
+            raise InterpreterError(f"未定义的变量: {node.name}", node)
+        return value
+
+    def load_global(self, node):
+        """读取全局变量"""
+        try:
+            return self.globals[node.name]
+        except KeyError:
+            raise InterpreterError(f"未定义的变量: {node.name}", node) from None
+
+    def get_variable(self, name, default=None):
+        """查找变量，找不到时返回 default"""
+        value = self.lookup(name)
+        return default if value is UNBOUND else value
+
+    def cached_method(self, obj, name, cache):
+        """方法调用处的内联缓存未命中：查找方法并记入缓存"""
+        method = obj.get_method(name)
+        cache.key = obj.bcc_class
+        cache.value = method
+        cache.misses += 1
+        self.inline_caches.add(cache)
+        return method
+
+    def cached_attribute(self, obj, name, cache):
+        """属性读取处的内联缓存未命中：读取属性并记入实例的 shape 和属性下标"""
+        value = obj.get_attribute(name)
+        cache.key = obj.shape
+        cache.value = obj.shape.index[name]
+        cache.misses += 1
+        self.inline_caches.add(cache)
+        return value
+
+    def cached_store(self, obj, name, value, cache):
+        """属性赋值处的内联缓存未命中：设置属性并记入赋值之后实例的 shape 和属性下标
+
+        添加新属性时实例转移到新的 shape，下一次给同一个 shape 的实例赋值
+        时属性已经存在，缓存只用于给已有的属性赋值。
+        """
+        obj.set_attribute(name, value)
+        cache.key = obj.shape
+        cache.value = obj.shape.index[name]
+        cache.misses += 1
+        self.inline_caches.add(cache)
+
+    def inline_cache_stats(self):
+        """本解释器用到的内联缓存的 (命中次数, 未命中次数)
+
+        计数保存在 AST 节点上，同一个 AST 多次执行时累计。
+        """
+        hits = sum(cache.hits for cache in self.inline_caches)
+        misses = sum(cache.misses for cache in self.inline_caches)
+        return hits, misses
+
+    def store_variable(self, name, value):
+        """按名字给当前栈帧中的变量赋值，局部变量有槽位时写入槽位"""
+        frame = self.frame
+        if frame.slots is not None:
+            slot = frame.function.slot_index.get(name)
+            if slot is not None:
+                frame.slots[slot] = value
+                return
+        self.variables[name] = value
+
+    def enter_frame(self, frame):
+        """切换当前栈帧"""
+        self.frame = frame
+        self.variables = frame.variables
+
+    def new_frame(self, func, args):
+        """为函数调用创建栈帧并绑定参数，栈帧中只有参数和之后的局部变量"""
+        if self.call_depth >= self.max_recursion_depth:
+            raise InterpreterError(f"超过最大递归深度: {self.max_recursion_depth}")
         if len(args) != len(func.params):
             raise InterpreterError(f"函数 {func.name} 需要 {len(func.params)} 个参数，但提供了 {len(args)} 个")
         
-        # 保存当前变量环境
-        old_vars = self.variables.copy()
+        if func.slot_index is None:
+            # 没有解析过的函数，参数和局部变量按名字保存
+            variables = {}
+            for param, arg in zip(func.params, args):
+                variables[param.name] = self.bind_argument(param, arg)
+            return Frame(func, variables, self.frame)
+        
+        # 参数占据最前面的槽位
+        slots = [self.bind_argument(param, arg) for param, arg in zip(func.params, args)]
+        slots.extend([UNBOUND] * (len(func.local_names) - len(slots)))
+        return Frame(func, {}, self.frame, slots)
+
+    def bind_argument(self, param, arg):
+        """参数的值，代码块参数转换为在调用者的栈帧中执行的 CodeBlock"""
+        if isinstance(param, CodeBlockParamNode):
+            if isinstance(arg, CodeBlockNode):
+                return CodeBlock(arg.statements, self, self.frame)
+            raise InterpreterError(f"参数 {param.name} 需要代码块")
+        return arg
+
+    def execute_function(self, func, args):
+        """执行函数调用"""
+        frame = self.new_frame(func, args)
+        self.enter_frame(frame)
+        self.call_depth += 1
         
         try:
-            # 设置参数
-            for param, arg in zip(func.params, args):
-                if isinstance(param, CodeBlockParamNode):
-                    # 如果是代码块参数，创建 CodeBlock 对象
-                    if isinstance(arg, CodeBlockNode):
-                        self.variables[param.name] = CodeBlock(arg.statements, self)
-                    else:
-                        raise InterpreterError(f"参数 {param.name} 需要代码块")
-                else:
-                    self.variables[param.name] = arg
-            
             # 执行函数体
             result = None
             for stmt in func.body:
                 result = self.interpret(stmt)
+                if type(result) is Return:
+                    return result.value
             return result
             
-        except ReturnException as e:
-            return e.value
-            
         finally:
-            # 恢复变量环境
-            self.variables = old_vars
\ No newline at end of file
+            # 回到调用者的栈帧
+            self.call_depth -= 1
+            self.enter_frame(frame.parent)
+
+    def add_hook(self, hook):
+        """注册执行钩子（hooks.ExecutionHook），之后导入的模块也使用它"""
+        self.hooks.append(hook)
+        self.install_hooks()
+
+    def remove_hook(self, hook):
+        """移除执行钩子，没有钩子时恢复不做检查的执行路径"""
+        self.hooks.remove(hook)
+        self.install_hooks()
+
+    def install_hooks(self):
+        """按已注册的钩子切换执行路径
+
+        有钩子时在实例上用通知钩子的方法覆盖 interpret、execute_function，
+        并让各执行后端退回树遍历（evaluate、load_program 使用 Interpreter
+        的实现），这样才能逐节点报告事件。没有钩子时删除这些覆盖，执行
+        路径上没有任何针对钩子的检查。
+        """
+        for event in ExecutionHook.EVENTS:
+            hooks = [getattr(hook, event) for hook in self.hooks if hook.overrides(event)]
+            setattr(self, event[3:] + '_hooks', hooks)
+        for name in ('interpret', 'evaluate', 'execute_function', 'load_program'):
+            self.__dict__.pop(name, None)
+        if self.hooks:
+            self.interpret = self.hooked_interpret
+            self.evaluate = MethodType(Interpreter.evaluate, self)
+            self.execute_function = self.hooked_execute_function
+            self.load_program = MethodType(Interpreter.load_program, self)
+
+    def hooked_interpret(self, node):
+        """注册了钩子时的 interpret：报告 on_node、on_line 和 on_error 事件"""
+        if node is None:
+            return None
+        for hook in self.node_hooks:
+            hook(self, node)
+        if self.line_hooks and type(node) is not list:
+            line = self.node_lines.get(node, UNBOUND)
+            if line is UNBOUND:
+                line = self.node_lines[node] = node_line(node)
+            if line is not None and line != self.line:
+                self.line = line
+                for hook in self.line_hooks:
+                    hook(self, line)
+        try:
+            handler = self.interpret_handlers.get(type(node))
+            if handler is None:
+                raise InterpreterError(f"未知的节点类型: {type(node)}", node)
+            return handler(node)
+        except Exception as error:
+            # 错误经过外层的节点时不再重复报告
+            if error is not self.reported_error:
+                self.reported_error = error
+                for hook in self.error_hooks:
+                    hook(self, error, node)
+            raise
+
+    def hooked_execute_function(self, func, args):
+        """注册了钩子时的 execute_function：报告 on_call 和 on_return 事件"""
+        for hook in self.call_hooks:
+            hook(self, func, args)
+        value = None
+        try:
+            value = Interpreter.execute_function(self, func, args)
+            return value
+        finally:
+            for hook in self.return_hooks:
+                hook(self, func, value)
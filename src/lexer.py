@@ -1,191 +1,343 @@
-from .bcc_token import Token, TokenType
+from array import array
+import re
+
+from .bcc_token import Token, TokenStore, TokenType
+from .source import StringSource
+
+# 关键字表
+KEYWORDS = {
+    'print': TokenType.PRINT,
+    'printnln': TokenType.PRINTNLN,
+    'if': TokenType.IF,
+    'for': TokenType.FOR,
+    'while': TokenType.WHILE,
+    'def': TokenType.DEF,
+    'public': TokenType.PUBLIC,
+    'private': TokenType.PRIVATE,
+    'return': TokenType.RETURN,
+    'nsreturn': TokenType.NSRETURN,
+    'expr': TokenType.EXPR,
+    'class': TokenType.CLASS,
+    'import': TokenType.IMPORT,
+    'from': TokenType.FROM,
+    'as': TokenType.AS
+}
+
+# 运算符和符号表（单字符与双字符）
+OPERATORS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    '[': TokenType.LBRACKET,
+    ']': TokenType.RBRACKET,
+    ',': TokenType.COMMA,
+    ';': TokenType.SEMICOLON,
+    '.': TokenType.DOT,
+    ':': TokenType.COLON,
+    '=': TokenType.EQUALS,
+    '<': TokenType.LT,
+    '>': TokenType.GT,
+    '==': TokenType.EQ,
+    '<=': TokenType.LE,
+    '>=': TokenType.GE,
+}
+
+# 主匹配模式：每个分支对应一种词法单元，常见的分支排在前面
+# （注释必须先于运算符，才能把 // 与除号区分开）
+TOKEN_PATTERN = re.compile('|'.join([
+    r'(?P<NAME>[^\W\d]\w*)',               # 标识符和关键字
+    r'(?P<WS>\s+)',                       # 空白
+    r'(?P<COMMENT>//[^\n]*\n?)',           # 单行注释（连同行尾换行）
+    r'(?P<NUMBER>\d+)',                    # 数字
+    r'(?P<STRING>"[^"]*")',                # 字符串
+    r'(?P<OP>==|<=|>=|[-+*/(){}\[\],;.:=<>])',  # 运算符和符号
+    r'(?P<UNCLOSED>")',                    # 未闭合的字符串
+    r'(?P<UNKNOWN>.)',                     # 未知字符
+]), re.DOTALL)
+
+
+# 写入 TokenStore 时使用的枚举值
+KEYWORD_CODES = {name: token_type.value for name, token_type in KEYWORDS.items()}
+OPERATOR_CODES = {op: token_type.value for op, token_type in OPERATORS.items()}
+IDENTIFIER_CODE = TokenType.IDENTIFIER.value
+NUMBER_CODE = TokenType.NUMBER.value
+STRING_CODE = TokenType.STRING.value
+EOF_CODE = TokenType.EOF.value
+
+# 扫描 UTF-8 字节时使用的模式：含非 ASCII 字节的连续“单词”片段会解码后
+# 再用 TOKEN_PATTERN 扫描，其余部分都可以直接按字节匹配
+BYTES_TOKEN_PATTERN = re.compile(b'|'.join([
+    rb'(?P<WORD>[\w\x80-\xff]+)',          # 标识符、关键字、数字及非 ASCII 字符
+    rb'(?P<WS>\s+)',                       # 空白
+    rb'(?P<COMMENT>//[^\n]*\n?)',           # 单行注释（连同行尾换行）
+    rb'(?P<STRING>"[^"]*")',                # 字符串
+    rb'(?P<OP>==|<=|>=|[-+*/(){}\[\],;.:=<>])',  # 运算符和符号
+    rb'(?P<UNCLOSED>")',                    # 未闭合的字符串
+    rb'(?P<UNKNOWN>.)',                     # 未知字符
+]), re.DOTALL)
+BYTES_KEYWORD_CODES = {name.encode(): code for name, code in KEYWORD_CODES.items()}
+BYTES_OPERATOR_CODES = {op.encode(): code for op, code in OPERATOR_CODES.items()}
+DIGITS = b'0123456789'
+
+
+# 从文件对象流式读取时每次读取的字符数
+CHUNK_SIZE = 64 * 1024
+
 
 class Lexer:
+    """词法分析器
+
+    token 的行号和列号都从1开始，指向token的第一个字符。
+    """
     def __init__(self, text):
-        self.text = text
+        # text 可以是源码字符串、StringSource/MappedSource，或以文本模式打开的文件对象
+        if hasattr(text, 'read'):
+            self.stream = text
+            self.source = None
+        else:
+            self.stream = None
+            self.source = text if isinstance(text, StringSource) else StringSource(text)
         self.pos = 0
-        self.current_char = self.text[0] if text else None
         self.tokens = []
-        self.line = 1      # 从1开始计数
-        self.column = 0    # 当前列号，从0开始
 
-    def advance(self):
-        """移动到下一个字符"""
-        if self.current_char == '\n':
-            self.column = 0
-        else:
-            self.column += 1
-        
-        self.pos += 1
-        if self.pos > len(self.text) - 1:
-            self.current_char = None
-        else:
-            self.current_char = self.text[self.pos]
-
-    def skip_whitespace(self):
-        """跳过所有空白字符"""
-        while self.current_char and self.current_char.isspace():
-            if self.current_char == '\n':  # 在跳过空白时也要处理换行
-                self.line += 1  # 只在这里增加行号
-                self.column = 1
-            else:
-                self.column += 1
-            self.advance()
-
-    def number(self):
-        result = ''
-        while self.current_char and self.current_char.isdigit():
-            result += self.current_char
-            self.advance()
-        return int(result)
-
-    def identifier(self):
-        result = ''
-        while self.current_char and (self.current_char.isalnum() or self.current_char == '_'):
-            result += self.current_char
-            self.advance()
+    def tokenize(self):
+        """将源代码转换为紧凑的 TokenStore，最后一个token为 EOF"""
+        source = self.read_source()
+        store = TokenStore(source)
+        append_type = store.types.append
+        append_start = store.starts.append
+        append_end = store.ends.append
         
-        # 检查是否是关键字
-        keywords = {
-            'print': TokenType.PRINT,
-            'printnln': TokenType.PRINTNLN,
-            'if': TokenType.IF,
-            'for': TokenType.FOR,
-            'while': TokenType.WHILE,
-            'def': TokenType.DEF,
-            'public': TokenType.PUBLIC,
-            'private': TokenType.PRIVATE,
-            'return': TokenType.RETURN,
-            'nsreturn': TokenType.NSRETURN,
-            'expr': TokenType.EXPR,
-            'class': TokenType.CLASS,
-            'import': TokenType.IMPORT,
-            'from': TokenType.FROM,
-            'as': TokenType.AS
-        }
+        for code, start, end in self.scan(source, 0, store):
+            append_type(code)
+            append_start(start)
+            append_end(end)
         
-        return Token(keywords.get(result, TokenType.IDENTIFIER), result)
+        store.append(TokenType.EOF, len(source), len(source))
+        self.pos = len(source)
+        self.tokens = store
+        return store
 
-    def string(self):
-        """处理字符串字面量"""
-        result = ''
-        self.advance()  # 跳过开始的引号
-        
-        while self.current_char and self.current_char != '"':
-            result += self.current_char
-            self.advance()
-        
-        if not self.current_char:
-            raise Exception("未闭合的字符串")
-        
-        self.advance()  # 跳过结束的引号
-        return result
+    def read_source(self):
+        """取得完整源码（来自文件对象时一次读完）"""
+        if self.stream is not None:
+            self.source = StringSource(self.stream.read())
+            self.stream = None
+        return self.source
 
-    def tokenize(self):
-        """将源代码转换为token列表"""
-        tokens = []
+    def scan(self, source, pos, store):
+        """从偏移 pos 开始扫描源码，逐个生成 (类型枚举值, 起始偏移, 结束偏移)
+
+        store 用于在警告中给出未知字符的位置。
+        """
+        if source.encoded:
+            yield from self.scan_bytes(source.data, pos, store)
+            return
         
-        while self.current_char is not None:
-            # 跳过空白字符
-            if self.current_char.isspace():
-                self.skip_whitespace()
-                continue
-            
-            # 跳过注释
-            if self.current_char == '/' and self.peek() == '/':
-                # 跳过整行
-                while self.current_char and self.current_char != '\n':
-                    self.advance()
-                if self.current_char == '\n':
-                    self.advance()
-                continue
-            
-            # 处理数字
-            if self.current_char.isdigit():
-                tokens.append(Token(TokenType.NUMBER, self.number(), self.line, self.column))
-                continue
-            
-            # 处理标识符和关键字
-            if self.current_char.isalpha() or self.current_char == '_':
-                token = self.identifier()
-                token.line = self.line
-                token.column = self.column
-                tokens.append(token)
-                continue
-            
-            # 处理字符串
-            if self.current_char == '"':
-                value = self.string()
-                tokens.append(Token(TokenType.STRING, value, self.line, self.column))
-                continue
-            
-            # 处理所有已知的单字符标记
-            char_to_token = {
-                '+': TokenType.PLUS,
-                '-': TokenType.MINUS,
-                '*': TokenType.MULTIPLY,
-                '/': TokenType.DIVIDE,
-                '(': TokenType.LPAREN,
-                ')': TokenType.RPAREN,
-                '{': TokenType.LBRACE,
-                '}': TokenType.RBRACE,
-                '[': TokenType.LBRACKET,
-                ']': TokenType.RBRACKET,
-                ',': TokenType.COMMA,
-                ';': TokenType.SEMICOLON,
-                '.': TokenType.DOT,
-                ':': TokenType.COLON,
-            }
+        for match in TOKEN_PATTERN.finditer(source.data, pos):
+            kind = match.lastgroup
             
-            if self.current_char in char_to_token:
-                tokens.append(Token(char_to_token[self.current_char], 
-                                  self.current_char, 
-                                  self.line, 
-                                  self.column))
-                self.advance()
-                continue
-            
-            # 处理双字符运算符
-            if self.current_char == '=':
-                if self.peek() == '=':
-                    tokens.append(Token(TokenType.EQ, '==', self.line, self.column))
-                    self.advance()
-                    self.advance()
-                else:
-                    tokens.append(Token(TokenType.EQUALS, '=', self.line, self.column))
-                    self.advance()
+            if kind == 'NAME':
+                code = KEYWORD_CODES.get(match.group(), IDENTIFIER_CODE)
+            elif kind == 'WS' or kind == 'COMMENT':
                 continue
-            
-            if self.current_char == '<':
-                if self.peek() == '=':
-                    tokens.append(Token(TokenType.LE, '<=', self.line, self.column))
-                    self.advance()
-                    self.advance()
-                else:
-                    tokens.append(Token(TokenType.LT, '<', self.line, self.column))
-                    self.advance()
+            elif kind == 'OP':
+                code = OPERATOR_CODES[match.group()]
+            elif kind == 'NUMBER':
+                code = NUMBER_CODE
+            elif kind == 'STRING':
+                code = STRING_CODE
+            elif kind == 'UNCLOSED':
+                raise Exception("未闭合的字符串")
+            else:
+                # 如果遇到未知字符，报错并跳过
+                line, column = store.position(match.start())
+                print(f"警告: 跳过未知字符 '{match.group()}' 在第 {line} 行，第 {column} 列")
                 continue
+            start, end = match.span()
+            yield code, start, end
+
+    def scan_bytes(self, data, pos, store):
+        """扫描 UTF-8 字节（如 mmap 映射的文件），偏移以字节计
+
+        非 ASCII 字符只可能出现在字符串、注释和“单词”片段中。前两者按
+        字节整体匹配、不解码；含非 ASCII 字符的单词片段解码后用
+        TOKEN_PATTERN 重新扫描，结果与扫描解码后的文本一致。
+        """
+        for match in BYTES_TOKEN_PATTERN.finditer(data, pos):
+            kind = match.lastgroup
+            start, end = match.span()
             
-            if self.current_char == '>':
-                if self.peek() == '=':
-                    tokens.append(Token(TokenType.GE, '>=', self.line, self.column))
-                    self.advance()
-                    self.advance()
+            if kind == 'WORD':
+                value = match.group()
+                if not value.isascii():
+                    piece = value.decode('utf-8')
+                    for sub in TOKEN_PATTERN.finditer(piece):
+                        sub_kind = sub.lastgroup
+                        sub_start = start + len(piece[:sub.start()].encode('utf-8'))
+                        if sub_kind == 'NAME':
+                            code = KEYWORD_CODES.get(sub.group(), IDENTIFIER_CODE)
+                        elif sub_kind == 'NUMBER':
+                            code = NUMBER_CODE
+                        elif sub_kind == 'UNKNOWN':
+                            line, column = store.position(sub_start)
+                            print(f"警告: 跳过未知字符 '{sub.group()}' 在第 {line} 行，第 {column} 列")
+                            continue
+                        else:
+                            continue
+                        yield code, sub_start, sub_start + len(sub.group().encode('utf-8'))
+                elif value.isdigit():
+                    yield NUMBER_CODE, start, end
+                elif value[:1].isdigit():
+                    # 数字后紧跟标识符，如 12ab
+                    digits = len(value) - len(value.lstrip(DIGITS))
+                    yield NUMBER_CODE, start, start + digits
+                    yield BYTES_KEYWORD_CODES.get(value[digits:], IDENTIFIER_CODE), start + digits, end
                 else:
-                    tokens.append(Token(TokenType.GT, '>', self.line, self.column))
-                    self.advance()
+                    yield BYTES_KEYWORD_CODES.get(value, IDENTIFIER_CODE), start, end
+            elif kind == 'WS' or kind == 'COMMENT':
                 continue
+            elif kind == 'OP':
+                yield BYTES_OPERATOR_CODES[match.group()], start, end
+            elif kind == 'STRING':
+                yield STRING_CODE, start, end
+            elif kind == 'UNCLOSED':
+                raise Exception("未闭合的字符串")
+            else:
+                # 如果遇到未知字符，报错并跳过
+                line, column = store.position(start)
+                print(f"警告: 跳过未知字符 '{match.group().decode('ascii')}' 在第 {line} 行，第 {column} 列")
+
+    def relex(self, tokens, start, old_end, new_end):
+        """增量重新扫描：旧源码的 [start, old_end) 被替换成了当前源码的 [start, new_end)
+
+        从编辑位置之前最后一个完整的token之后开始扫描，一旦新token的起始
+        位置越过编辑区域并与某个旧token的起始位置重合，后面的token就与旧
+        token完全相同，直接复用。
+        Args:
+            tokens: 旧源码 tokenize() 得到的 TokenStore
+            start, old_end, new_end: 编辑区域在旧源码和当前源码中的偏移
+        Returns:
+            (store, first, stop)：store 为当前源码的 TokenStore，其中
+            [first, stop) 是重新扫描得到的token，它们替换了旧token中的
+            [first, stop - (len(store) - len(tokens)))
+        """
+        source = self.read_source()
+        store = TokenStore(source)
+        delta = new_end - old_end
+        count = len(tokens) - 1  # 不含 EOF
+        
+        # 结束位置紧贴编辑位置的token可能与新内容合并，因此也要重新扫描
+        first = tokens.count_ending_before(start)
+        restart = tokens.end_of(first - 1) if first else 0
+        
+        types = array('B')
+        starts = array('i')
+        ends = array('i')
+        old_index = first  # 下一个可能与新token同步的旧token
+        synced = False
+        for code, token_start, token_end in self.scan(source, restart, store):
+            if token_start >= new_end:
+                old_start = token_start - delta
+                while old_index < count and tokens.start_of(old_index) < old_start:
+                    old_index += 1
+                if old_index < count and tokens.start_of(old_index) == old_start:
+                    synced = True
+                    break
+            types.append(code)
+            starts.append(token_start)
+            ends.append(token_end)
+        
+        if synced:
+            tail = len(tokens)
+        else:
+            # 一直扫描到文件末尾，旧的 EOF 也被替换
+            old_index = tail = len(tokens)
+            types.append(EOF_CODE)
+            starts.append(len(source))
+            ends.append(len(source))
+        
+        store.types = tokens.types[:first] + types + tokens.types[old_index:tail]
+        store.starts = tokens.rebased(tokens.starts, 0, first, 0) + starts + \
+            tokens.rebased(tokens.starts, old_index, tail, tokens.shift)
+        store.ends = tokens.rebased(tokens.ends, 0, first, 0) + ends + \
+            tokens.rebased(tokens.ends, old_index, tail, tokens.shift)
+        store.shift = tokens.shift + delta
+        store.shift_index = stop = first + len(types)
+        
+        self.pos = len(source)
+        self.tokens = store
+        return store, first, stop
+
+    def iter_tokens(self, chunk_size=CHUNK_SIZE):
+        """逐个生成 Token 对象，最后生成 EOF
+
+        使用与 tokenize() 相同的主模式扫描源码。如果源码来自文件对象，
+        则按 chunk_size 分块读取，内存占用与文件大小无关；MappedSource
+        则直接生成其 TokenStore 中的token视图。
+        """
+        if self.stream is None and self.source.encoded:
+            yield from self.tokenize()
+            return
+        
+        line = 1
+        line_start = 0  # 当前行行首的绝对偏移
+        buffer = ''
+        eof = False
+        
+        while not eof:
+            if self.stream is None:
+                buffer = self.source.data
+                eof = True
+            else:
+                chunk = self.stream.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
             
-            # 如果遇到未知字符，报错并跳过
-            print(f"警告: 跳过未知字符 '{self.current_char}' 在第 {self.line+1} 行，第 {self.column+1} 列")
-            self.advance()
+            base = self.pos  # buffer[0] 的绝对偏移
+            rest = len(buffer)
+            for match in TOKEN_PATTERN.finditer(buffer):
+                kind = match.lastgroup
+                
+                # 紧贴块尾的token可能被截断，留到与下一块拼接后再扫描
+                if not eof and (match.end() == len(buffer) or kind == 'UNCLOSED'):
+                    rest = match.start()
+                    break
+                
+                value = match.group()
+                start = base + match.start()
+                column = start - line_start + 1
+                if kind == 'NAME':
+                    yield Token(KEYWORDS.get(value, TokenType.IDENTIFIER), value, line, column)
+                    continue
+                elif kind == 'OP':
+                    yield Token(OPERATORS[value], value, line, column)
+                    continue
+                elif kind == 'NUMBER':
+                    yield Token(TokenType.NUMBER, int(value), line, column)
+                    continue
+                elif kind == 'STRING':
+                    yield Token(TokenType.STRING, value[1:-1], line, column)
+                elif kind == 'UNCLOSED':
+                    raise Exception("未闭合的字符串")
+                elif kind == 'UNKNOWN':
+                    # 如果遇到未知字符，报错并跳过
+                    print(f"警告: 跳过未知字符 '{value}' 在第 {line} 行，第 {column} 列")
+                    continue
+                
+                # 空白、注释和字符串可能跨行
+                newline = value.rfind('\n')
+                if newline != -1:
+                    line += value.count('\n')
+                    line_start = start + newline + 1
             
-        tokens.append(Token(TokenType.EOF, None, self.line, self.column))
-        return tokens
-
-    def peek(self):
-        """查看下一个字符但不移动指针"""
-        peek_pos = self.pos + 1
-        if peek_pos > len(self.text) - 1:
-            return None
-        return self.text[peek_pos]
\ No newline at end of file
+            self.pos += rest
+            buffer = buffer[rest:]
+        
+        yield Token(TokenType.EOF, None, line, self.pos - line_start + 1)
+
@@ -0,0 +1,348 @@
+from .bcc_token import TokenType
+from .parser import (
+    ASTNode, NumberNode, StringNode, BinOpNode, VariableNode, AssignNode,
+    IfNode, FunctionNode, ParamNode, CallNode, ReturnNode, ImportNode,
+    ClassNode, CodeBlockNode, ExprNode
+)
+
+# 优化器版本，改写规则变化时递增，用于使优化后的 AST 缓存失效
+OPTIMIZER_VERSION = 1
+
+# 各优化级别依次执行的优化遍；内联之后再折叠一次，内联出的常量表达式也能算出结果
+PASSES = {
+    0: (),
+    1: ('fold', 'branch'),
+    2: ('fold', 'branch', 'inline', 'fold', 'branch'),
+}
+
+PASS_TITLES = {
+    'fold': '常量折叠',
+    'branch': '删除条件为常量的 if',
+    'inline': '函数内联',
+}
+
+# 内联的函数体（return 的表达式）最多包含的节点数
+INLINE_MAX_NODES = 16
+
+# 折叠出的字符串最大长度，更长的 "..." * n 留到运行时再计算
+MAX_FOLDED_STRING = 4096
+
+# 报告中显示的运算符
+OPERATOR_SYMBOLS = {
+    TokenType.PLUS: '+',
+    TokenType.MINUS: '-',
+    TokenType.MULTIPLY: '*',
+    TokenType.DIVIDE: '/',
+    TokenType.EQ: '==',
+    TokenType.LT: '<',
+    TokenType.GT: '>',
+    TokenType.LE: '<=',
+    TokenType.GE: '>=',
+}
+
+# 不进入的节点：代码块的语句会作为值被取出（数组访问、len），
+# ExprNode 交给 eval() 求值，都保持原样
+OPAQUE_NODES = (CodeBlockNode, ExprNode)
+
+class Optimizer:
+    """AST 优化：在解析之后、名字解析之前原地改写程序
+
+    - fold: 两边都是字面量的二元运算在编译时算出结果，运行时会出错
+      的运算（如除以零）保持原样
+    - branch: 条件为常量的 if，条件为真时换成它的语句，为假时删除
+    - inline: 函数体只有一个 return 表达式、表达式只由字面量、参数和
+      运算组成的小型公有函数，在参数都没有副作用时把调用替换为代入参数
+      后的表达式
+
+    内联只针对顶层定义、没有被重新定义或赋值过的函数，并且只替换在
+    定义语句之后的调用，因此递归函数不会被内联。每一遍改写了什么记录
+    在 changes 中，format_report() 输出可读的报告。
+
+    用法:
+        optimizer = Optimizer(level, builtins)
+        statements = optimizer.optimize(statements)
+    """
+    def __init__(self, level=1, builtins=()):
+        self.level = level
+        self.builtins = set(builtins)  # 内置函数名，调用时优先于同名函数
+        self.changes = {name: [] for name in PASS_TITLES}  # 优化遍 -> [(行号, 说明)]
+        self.inlinable = {}  # 可以内联的函数：名字 -> FunctionNode
+
+    def optimize(self, statements):
+        """按优化级别依次执行各遍，返回改写后的语句列表"""
+        for name in PASSES[min(self.level, max(PASSES))]:
+            getattr(self, f'{name}_pass')(statements)
+        return statements
+
+    @property
+    def change_count(self):
+        return sum(len(changes) for changes in self.changes.values())
+
+    def record(self, name, node, description):
+        """记录一处改写，node 带位置时报告行号"""
+        token = getattr(node, 'token', None)
+        self.changes[name].append((token.line if token else None, description))
+
+    def format_report(self):
+        """各遍改写内容的文字报告"""
+        lines = [f"优化级别 {self.level}，共 {self.change_count} 处改写"]
+        for name, title in PASS_TITLES.items():
+            changes = self.changes[name]
+            lines.append(f"  {title}: {len(changes)} 处")
+            for line, description in changes:
+                prefix = f"第 {line} 行: " if line else ''
+                lines.append(f"    {prefix}{description}")
+        return '\n'.join(lines)
+
+    def walk(self, node, visit):
+        """后序遍历并改写节点：先改写子节点，再用 visit 的返回值替换节点本身"""
+        if isinstance(node, list):
+            for index, item in enumerate(node):
+                node[index] = self.walk(item, visit)
+            return node
+        if isinstance(node, dict):
+            for key, value in node.items():
+                node[key] = self.walk(value, visit)
+            return node
+        if not isinstance(node, ASTNode) or isinstance(node, OPAQUE_NODES):
+            return node
+        for cls in type(node).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                value = getattr(node, name, None)
+                if isinstance(value, (ASTNode, list, dict)):
+                    setattr(node, name, self.walk(value, visit))
+        return visit(node)
+
+    # ---- 常量折叠 ----
+
+    def fold_pass(self, statements):
+        self.walk(statements, self.fold)
+
+    def fold(self, node):
+        if type(node) is not BinOpNode or node.function is None or \
+                not is_constant(node.left) or not is_constant(node.right):
+            return node
+        left, right = node.left.value, node.right.value
+        if node.op == TokenType.MULTIPLY and repeated_length(left, right) > MAX_FOLDED_STRING:
+            return node
+        try:
+            value = node.function(left, right)
+        except Exception:
+            # 除以零、类型不匹配等错误留到运行时报告
+            return node
+        result = StringNode(value) if isinstance(value, str) else NumberNode(value)
+        self.record('fold', node, f"{describe(node)} => {describe(result)}")
+        return result
+
+    # ---- 删除条件为常量的 if ----
+
+    def branch_pass(self, statements):
+        self.walk(statements, self.prune_node)
+        self.prune(statements, tail=False)
+
+    def prune_node(self, node):
+        if type(node) is FunctionNode:
+            self.prune(node.body, tail=True)
+        elif isinstance(getattr(node, 'body', None), list):
+            self.prune(node.body, tail=False)
+        return node
+
+    def prune(self, statements, tail):
+        """原地改写语句列表
+
+        tail 为 True 时是函数体，没有 return 时最后一个语句的值就是返回值；
+        这时把 if 换成它的语句列表（值与 if 一样为 None），而不是展开。
+        """
+        result = []
+        last = len(statements) - 1
+        for index, stmt in enumerate(statements):
+            if type(stmt) is not IfNode or not is_constant(stmt.condition):
+                result.append(stmt)
+                continue
+            body = stmt.body if stmt.condition.value else []
+            action = '展开' if body else '删除'
+            self.record('branch', stmt, f"if ({describe(stmt.condition)}) {action}，{len(stmt.body)} 个语句")
+            if tail and index == last:
+                result.append(body)
+            else:
+                result.extend(body)
+        statements[:] = result
+
+    # ---- 函数内联 ----
+
+    def inline_pass(self, statements):
+        """按顺序处理顶层语句，函数定义之后的调用才能内联"""
+        candidates = inline_candidates(statements, self.builtins)
+        self.inlinable = {}
+        for index, stmt in enumerate(statements):
+            statements[index] = self.walk(stmt, self.inline)
+            if stmt in candidates and inline_expression(stmt) is not None:
+                self.inlinable[stmt.name] = stmt
+
+    def inline(self, node):
+        if type(node) is not CallNode or not isinstance(node.name, str):
+            return node
+        func = self.inlinable.get(node.name)
+        if func is None or len(node.args) != len(func.params):
+            return node
+
+        expression = inline_expression(func)
+        params = [param.name for param in func.params]
+        events = evaluation_order(expression, params)
+        uses = [event for event in events if event is not None]
+        bindings = dict(zip(params, node.args))
+        evaluated = []  # 有副作用风险（可能报错）的参数，按调用时的求值顺序
+        for name, arg in bindings.items():
+            if not is_pure(arg):
+                return node
+            if is_constant(arg):
+                continue
+            count = uses.count(name)
+            # 没有用到的参数不再求值，读取未定义变量的错误会丢失；
+            # 用到多次的参数只允许是变量，避免重复计算
+            if count == 0 or (count > 1 and type(arg) is not VariableNode):
+                return node
+            evaluated.append(name)
+        # 调用时先求出全部参数再执行函数体：这些参数在表达式中第一次被读取
+        # 的顺序要与求值顺序一致，并且都在表达式的第一个运算之前，出错时
+        # 报告的仍是同一个错误
+        first_uses = list(dict.fromkeys(event for event in events if event in evaluated))
+        if first_uses != evaluated:
+            return node
+        if evaluated and None in events[:max(events.index(name) for name in evaluated)]:
+            return node
+
+        result = substitute(expression, bindings)
+        self.record('inline', node, f"{node.name}(...) => {describe(result)}")
+        return result
+
+def is_constant(node):
+    return type(node) in (NumberNode, StringNode)
+
+def is_pure(node, names=None):
+    """表达式是否只由字面量、变量和运算组成；names 不为 None 时变量只能是其中的名字"""
+    node_type = type(node)
+    if node_type in (NumberNode, StringNode):
+        return True
+    if node_type is VariableNode:
+        return names is None or node.name in names
+    if node_type is BinOpNode:
+        return node.function is not None and is_pure(node.left, names) and is_pure(node.right, names)
+    return False
+
+def repeated_length(left, right):
+    """字符串重复运算结果的长度，不是字符串重复时返回 0"""
+    if isinstance(left, str) and isinstance(right, int):
+        return len(left) * right
+    if isinstance(right, str) and isinstance(left, int):
+        return len(right) * left
+    return 0
+
+def count_nodes(node):
+    if type(node) is BinOpNode:
+        return 1 + count_nodes(node.left) + count_nodes(node.right)
+    return 1
+
+def inline_expression(func):
+    """函数可以内联时返回 return 的表达式，否则返回 None"""
+    if func.type != 'public' or len(func.body) != 1 or type(func.body[0]) is not ReturnNode:
+        return None
+    params = [param.name for param in func.params]
+    if any(type(param) is not ParamNode for param in func.params) or len(set(params)) != len(params):
+        return None
+    expression = func.body[0].value
+    if not is_pure(expression, params) or count_nodes(expression) > INLINE_MAX_NODES:
+        return None
+    return expression
+
+def evaluation_order(node, params):
+    """表达式求值时依次发生的事件：读取参数时为参数名，执行运算时为 None"""
+    if type(node) is VariableNode:
+        return [node.name] if node.name in params else []
+    if type(node) is BinOpNode:
+        return evaluation_order(node.left, params) + evaluation_order(node.right, params) + [None]
+    return []
+
+def substitute(node, bindings):
+    """复制表达式，参数替换为对应实参的副本；字面量节点不会被改写，直接共享"""
+    node_type = type(node)
+    if node_type is VariableNode:
+        return copy_expression(bindings[node.name])
+    if node_type is BinOpNode:
+        return BinOpNode(substitute(node.left, bindings), node.op, substitute(node.right, bindings))
+    return node
+
+def copy_expression(node):
+    """复制实参表达式，变量节点保留在调用处的位置"""
+    node_type = type(node)
+    if node_type is VariableNode:
+        copy = VariableNode(node.name)
+        copy.position = node.position
+        return copy
+    if node_type is BinOpNode:
+        return BinOpNode(copy_expression(node.left), node.op, copy_expression(node.right))
+    return node
+
+def inline_candidates(statements, builtins):
+    """可以内联的顶层函数定义
+
+    函数名不能是内置函数，在程序中（包括类的方法）只能定义一次，也不能
+    同时是类名、变量名或参数名：调用时变量中的类优先于函数。import 会把
+    模块的函数合并进来，函数定义之后或嵌套在语句中的 import 可能覆盖它，
+    因此只考虑最后一个顶层 import 之后的定义，有嵌套的 import 时不内联。
+    memo 函数也不内联，否则调用处不再使用它的结果缓存。
+    """
+    definitions = {}
+    bound = set(builtins)
+    imports = 0
+    for node in iter_nodes(statements):
+        if isinstance(node, FunctionNode):
+            definitions[node.name] = definitions.get(node.name, 0) + 1
+            bound.update(param.name for param in node.params)
+        elif isinstance(node, ClassNode):
+            bound.add(node.name)
+        elif isinstance(node, AssignNode) and isinstance(node.name, str):
+            bound.add(node.name)
+        elif isinstance(node, ImportNode):
+            imports += 1
+
+    top_level_imports = [index for index, stmt in enumerate(statements) if type(stmt) is ImportNode]
+    if imports > len(top_level_imports):
+        return set()
+    first = top_level_imports[-1] + 1 if top_level_imports else 0
+    return {
+        stmt for stmt in statements[first:]
+        if type(stmt) is FunctionNode and not stmt.memo and definitions[stmt.name] == 1
+        and stmt.name not in bound
+    }
+
+def iter_nodes(node):
+    """遍历全部节点，包括代码块和类的方法"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, ASTNode):
+            yield node
+            for cls in type(node).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    value = getattr(node, name, None)
+                    if isinstance(value, (ASTNode, list, dict)):
+                        stack.append(value)
+
+def describe(node):
+    """表达式在报告中的写法"""
+    node_type = type(node)
+    if node_type is StringNode:
+        return f'"{node.value}"'
+    if node_type is NumberNode:
+        return str(node.value)
+    if node_type is VariableNode:
+        return node.name
+    if node_type is BinOpNode:
+        symbol = OPERATOR_SYMBOLS.get(node.op, str(node.op))
+        return f"({describe(node.left)} {symbol} {describe(node.right)})"
+    return str(node)
@@ -1,12 +1,51 @@
+import operator
+from collections import deque, namedtuple
+
 from .bcc_token import TokenType
 
+# 解析器版本，AST 结构变化时递增，用于使 AST 缓存失效
+PARSER_VERSION = 12
+
+# 节点的源码位置压缩成一个整数：行号在高位，列号占低 COLUMN_BITS 位
+COLUMN_BITS = 20
+COLUMN_MASK = (1 << COLUMN_BITS) - 1
+
+# 报错时使用的位置信息，和token一样提供 line/column/value
+SourcePosition = namedtuple('SourcePosition', ['line', 'column', 'value'])
+
+def pack_position(token):
+    """把token的行列号压缩成一个整数，token 为 None 时返回 None"""
+    if token is None:
+        return None
+    return (token.line << COLUMN_BITS) | min(token.column, COLUMN_MASK)
+
+# 二元运算符对应的运算函数，BinOpNode 创建时解析并保存在节点上
+BINARY_OPERATORS = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.MULTIPLY: operator.mul,
+    TokenType.DIVIDE: operator.truediv,
+    TokenType.EQ: operator.eq,
+    TokenType.LT: operator.lt,
+    TokenType.GT: operator.gt,
+    TokenType.LE: operator.le,
+    TokenType.GE: operator.ge,
+}
+
 class ASTNode:
-    """抽象语法树的基类"""
+    """抽象语法树的基类
+
+    所有节点都使用 __slots__，不带实例 __dict__，以减少常驻内存中模块的AST占用。
+    """
+    __slots__ = ()
+
     def __str__(self):
         return self.__class__.__name__
 
 class NumberNode(ASTNode):
     """数字节点"""
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -15,32 +54,89 @@ class NumberNode(ASTNode):
 
 class BinOpNode(ASTNode):
     """二元运算节点"""
+    __slots__ = ('left', 'op', 'right', 'function')
+
     def __init__(self, left, op, right):
         self.left = left    # 左操作数
-        self.op = op        # 运算符
+        self.op = op        # 运算符（TokenType）
         self.right = right  # 右操作数
+        self.function = BINARY_OPERATORS.get(op)  # 运算函数，未知运算符为 None
 
     def __str__(self):
-        return f"BinOp({self.left}, {self.op.type}, {self.right})"
+        return f"BinOp({self.left}, {self.op}, {self.right})"
 
 class PrintNode(ASTNode):
     """打印节点"""
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr    # 要打印的表达式
 
     def __str__(self):
         return f"Print({self.expr})"
 
-class VariableNode(ASTNode):
+class PositionedNode(ASTNode):
+    """带源码位置的节点
+
+    只保存压缩后的行列号而不是token本身，避免AST引用整个token存储和源码。
+    token 属性按需还原出 SourcePosition，用于报错。
+    """
+    __slots__ = ('position',)
+
+    @property
+    def token(self):
+        if self.position is None:
+            return None
+        return SourcePosition(self.position >> COLUMN_BITS, self.position & COLUMN_MASK,
+                              self.source_text)
+
+    @property
+    def source_text(self):
+        """位置处token的文本，子类返回对应的名字"""
+        return ''
+
+class VariableNode(PositionedNode):
     """变量节点"""
-    def __init__(self, name):
+    __slots__ = ('name',)
+
+    def __init__(self, name, token=None):
         self.name = name    # 变量名
+        self.position = pack_position(token)  # 变量出现的位置
+
+    @property
+    def source_text(self):
+        return self.name
 
     def __str__(self):
         return f"Var({self.name})"
 
+class LocalVariableNode(VariableNode):
+    """解析后的局部变量，slot 是变量在函数栈帧中的下标（见 resolver）"""
+    __slots__ = ('slot',)
+
+    def __init__(self, name, slot, position=None):
+        self.name = name
+        self.slot = slot
+        self.position = position
+
+    def __str__(self):
+        return f"Local({self.name}, {self.slot})"
+
+class GlobalVariableNode(VariableNode):
+    """解析后确定不是局部变量的变量，只在全局变量中查找（见 resolver）"""
+    __slots__ = ()
+
+    def __init__(self, name, position=None):
+        self.name = name
+        self.position = position
+
+    def __str__(self):
+        return f"Global({self.name})"
+
 class AssignNode(ASTNode):
     """赋值节点"""
+    __slots__ = ('name', 'value')
+
     def __init__(self, name, value):
         self.name = name    # 变量名
         self.value = value  # 要赋的值
@@ -48,8 +144,22 @@ class AssignNode(ASTNode):
     def __str__(self):
         return f"Assign({self.name}, {self.value})"
 
+class LocalAssignNode(AssignNode):
+    """解析后的局部变量赋值，slot 是变量在函数栈帧中的下标（见 resolver）"""
+    __slots__ = ('slot',)
+
+    def __init__(self, name, value, slot):
+        self.name = name
+        self.value = value
+        self.slot = slot
+
+    def __str__(self):
+        return f"LocalAssign({self.name}, {self.slot}, {self.value})"
+
 class PrintlnNode(ASTNode):
     """不换行打印节点"""
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr    # 要打印的表达式
 
@@ -58,6 +168,8 @@ class PrintlnNode(ASTNode):
 
 class StringNode(ASTNode):
     """字符串节点"""
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -66,6 +178,8 @@ class StringNode(ASTNode):
 
 class IfNode(ASTNode):
     """if语句节点"""
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition  # 条件表达式
         self.body = body           # if体内的语句列表
@@ -75,6 +189,8 @@ class IfNode(ASTNode):
 
 class ForNode(ASTNode):
     """for循环节点"""
+    __slots__ = ('init', 'condition', 'update', 'body')
+
     def __init__(self, init, condition, update, body):
         self.init = init           # 初始化语句
         self.condition = condition # 条件表达式
@@ -86,6 +202,8 @@ class ForNode(ASTNode):
 
 class WhileNode(ASTNode):
     """while循环节点"""
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition  # 条件表达式
         self.body = body           # 循环体语句列表
@@ -99,11 +217,58 @@ class ParserError(Exception):
         self.token = token
         super().__init__(message)
 
+# 二元运算符的优先级，数值越大结合越紧
+COMPARISON_PRECEDENCE = 1
+ADDITIVE_PRECEDENCE = 2
+MULTIPLICATIVE_PRECEDENCE = 3
+BINARY_PRECEDENCE = {
+    TokenType.EQ: COMPARISON_PRECEDENCE,
+    TokenType.LT: COMPARISON_PRECEDENCE,
+    TokenType.GT: COMPARISON_PRECEDENCE,
+    TokenType.LE: COMPARISON_PRECEDENCE,
+    TokenType.GE: COMPARISON_PRECEDENCE,
+    TokenType.PLUS: ADDITIVE_PRECEDENCE,
+    TokenType.MINUS: ADDITIVE_PRECEDENCE,
+    TokenType.MULTIPLY: MULTIPLICATIVE_PRECEDENCE,
+    TokenType.DIVIDE: MULTIPLICATIVE_PRECEDENCE,
+}
+
+# 语句开头的token类型对应的 Parser 方法名
+STATEMENT_HANDLERS = {
+    TokenType.INDENT: 'skip_indentation',
+    TokenType.DEDENT: 'skip_indentation',
+    TokenType.CLASS: 'class_definition',
+    TokenType.WHILE: 'while_statement',
+    TokenType.IMPORT: 'import_statement',
+    TokenType.LBRACE: 'code_block',
+    TokenType.DEF: 'function_definition',
+    TokenType.IF: 'if_statement',
+    TokenType.FOR: 'for_statement',
+    TokenType.PRINT: 'print_statement',
+    TokenType.PRINTNLN: 'print_statement',
+    TokenType.NSRETURN: 'nsreturn_statement',
+    TokenType.RETURN: 'return_statement',
+    TokenType.IDENTIFIER: 'identifier_statement',
+}
+
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, tokens, recover=False):
+        # tokens 可以是token列表，也可以是 Lexer.iter_tokens() 这样的生成器；
+        # 解析器按需拉取token，只在 lookahead 中缓存尚未消费的少量token
+        self.tokens = iter(tokens)
+        self.lookahead = deque()
         self.pos = 0
-        self.current_token = tokens[0] if tokens else None
+        self.current_token = next(self.tokens, None)
+        # 本次解析中已创建的字面量节点，用于共享相同的常量
+        self.literals = {}
+        # 错误恢复模式：出错时记录到 errors 并跳到下一个语句继续解析，
+        # parse() 返回不含出错语句的部分AST
+        self.recover = recover
+        self.errors = []
+        # 语句分派表：语句开头的token类型 -> 解析方法
+        self.statement_handlers = {
+            token_type: getattr(self, name) for token_type, name in STATEMENT_HANDLERS.items()
+        }
         
     def peek_next_token(self, offset=1):
         """查看后面的token但不移动指针
@@ -112,285 +277,295 @@ class Parser:
         Returns:
             Token 或 None
         """
-        peek_pos = self.pos + offset
-        if peek_pos < len(self.tokens):
-            return self.tokens[peek_pos]
-        return None
+        while len(self.lookahead) < offset:
+            token = next(self.tokens, None)
+            if token is None:
+                return None
+            self.lookahead.append(token)
+        return self.lookahead[offset - 1]
         
     def advance(self):
         """移动到下一个token"""
         self.pos += 1
-        if self.pos < len(self.tokens):
-            self.current_token = self.tokens[self.pos]
+        if self.lookahead:
+            self.current_token = self.lookahead.popleft()
         else:
-            self.current_token = None
+            self.current_token = next(self.tokens, None)
 
     def parse(self):
         """解析程序入口"""
         statements = []
-        while self.current_token and self.current_token.type != TokenType.EOF:
-            try:
-                stmt = self.statement()
-                if stmt:  # 忽略None返回
-                    statements.append(stmt)
-            except ParserError as e:
-                # 重新抛出错误，保持原始行号
-                raise ParserError(str(e), e.token)
-            except Exception as e:
-                # 将普通异常转换为ParserError
-                raise ParserError(str(e), self.current_token)
+        while not self.at_end():
+            stmt = self.top_level_statement()
+            if stmt:  # 忽略None返回
+                statements.append(stmt)
         return statements
 
+    def at_end(self):
+        """是否已经到达文件末尾"""
+        return not self.current_token or self.current_token.type == TokenType.EOF
+
+    def top_level_statement(self):
+        """解析一个顶层语句，出错时统一转换为 ParserError
+
+        恢复模式下不抛出错误，而是记录错误后返回 None。
+        """
+        start = self.pos
+        start_token = self.current_token
+        try:
+            return self.statement()
+        except ParserError as e:
+            # 重新抛出错误，保持原始行号
+            error = ParserError(str(e), e.token)
+            if not self.recover:
+                raise error
+        except UnicodeDecodeError:
+            # 流式读取源码时的编码错误交给调用方处理
+            raise
+        except Exception as e:
+            # 将普通异常转换为ParserError
+            error = ParserError(str(e), self.current_token)
+            if not self.recover:
+                raise error
+        self.synchronize(error, start, start_token)
+        return None
+
+    def block_statement(self):
+        """解析代码块中的一个语句，恢复模式下出错时记录错误并返回 None"""
+        if not self.recover:
+            return self.statement()
+        
+        start = self.pos
+        start_token = self.current_token
+        try:
+            return self.statement()
+        except ParserError as e:
+            error = e
+        except UnicodeDecodeError:
+            raise
+        except Exception as e:
+            error = ParserError(str(e), self.current_token)
+        self.synchronize(error, start, start_token)
+        return None
+
+    def synchronize(self, error, start, start_token):
+        """记录错误，并跳过token直到下一个语句的开头
+
+        出错语句所在行之后、以语句开头token类型开始的位置视为下一个语句；
+        遇到所在代码块的 '}' 时停下，交给外层结束代码块。跳过的 '{' 和
+        与之配对的 '}' 一起跳过。
+        """
+        token = error.token
+        last = self.errors[-1].token if self.errors else None
+        # 同一位置的连锁错误（如文件末尾各层代码块都缺少 '}'）只记录一次
+        if not (last and token and (last.line, last.column) == (token.line, token.column)):
+            self.errors.append(error)
+        
+        if self.pos == start:
+            self.advance()  # 至少跳过一个token，保证解析能继续前进
+        
+        line = start_token.line if start_token else 0
+        depth = 0
+        while not self.at_end():
+            token_type = self.current_token.type
+            if token_type == TokenType.RBRACE:
+                if depth == 0:
+                    return
+                depth -= 1
+            elif token_type == TokenType.LBRACE:
+                depth += 1
+            elif depth == 0 and token_type in self.statement_handlers and \
+                    self.current_token.line > line:
+                return
+            self.advance()
+
     def statement(self):
-        """解析单个语句"""
-        if not self.current_token:
+        """解析单个语句：按当前token类型查分派表，没有对应方法时按表达式语句解析"""
+        token = self.current_token
+        if not token:
             raise Exception("意外的文件结束")
         
-        token = self.current_token
+        handler = self.statement_handlers.get(token.type)
+        if handler is not None:
+            return handler()
         
-        # 处理缩进和取消缩进
-        if token.type in (TokenType.INDENT, TokenType.DEDENT):
-            self.advance()
-            return None
+        # 如果是表达式语句
+        return self.expr()
+
+    def skip_indentation(self):
+        """跳过缩进和取消缩进"""
+        self.advance()
+        return None
+
+    def class_definition(self):
+        """解析类定义"""
+        token = self.current_token
+        self.advance()  # 跳过 class 关键字
         
-        # 处理类定义
-        if token.type == TokenType.CLASS:
-            self.advance()  # 跳过 class 关键字
-            
-            if not self.current_token or self.current_token.type != TokenType.IDENTIFIER:
-                raise ParserError("类定义后需要类名", token)
-            
-            class_name = self.current_token.value
-            self.advance()  # 跳过类名
-            
-            if not self.current_token or self.current_token.type != TokenType.LBRACE:
-                raise ParserError("类定义需要用 '{' 开始", self.current_token)
-            
-            self.advance()  # 跳过 {
-            
-            methods = []
-            attributes = {}
-            
-            # 解析类体
-            while self.current_token and self.current_token.type != TokenType.RBRACE:
-                if self.current_token.type == TokenType.DEF:
-                    # 解析方法定义
-                    method = self.function_definition()
-                    methods.append(method)
-                elif self.current_token.type == TokenType.IDENTIFIER:
-                    # 解析类属性
-                    name = self.current_token.value
-                    self.advance()  # 跳过属性名
-                    
-                    if not self.current_token or self.current_token.type != TokenType.EQUALS:
-                        raise ParserError("类属性定义需要赋值", self.current_token)
-                    
-                    self.advance()  # 跳过等号
-                    value = self.expr()
-                    attributes[name] = value
-                else:
-                    raise ParserError("类定义中只能包含方法或属性定义", self.current_token)
-            
-            if not self.current_token or self.current_token.type != TokenType.RBRACE:
-                raise ParserError("类定义未正确结束，缺少 '}'", self.current_token)
-            
-            self.advance()  # 跳过 }
-            
-            return ClassNode(class_name, methods, attributes)
+        if not self.current_token or self.current_token.type != TokenType.IDENTIFIER:
+            raise ParserError("类定义后需要类名", token)
         
-        # 处理 while 语句
-        if token.type == TokenType.WHILE:
-            self.advance()  # 跳过 while
-            if not self.current_token or self.current_token.type != TokenType.LPAREN:
-                raise ParserError("while 后需要括号", token)
-            self.advance()  # 跳过左括号
-            
-            condition = self.comparison()  # 解析条件表达式
-            
-            if not self.current_token or self.current_token.type != TokenType.RPAREN:
-                raise ParserError("缺少右括号", self.current_token)
-            self.advance()  # 跳过右括号
-            
-            # 解析循环体
-            if not self.current_token or self.current_token.type != TokenType.LBRACE:
-                raise ParserError("while 语句体需要用 '{' 开始", self.current_token)
-            self.advance()  # 跳过 {
-            
-            body = []
-            while self.current_token and self.current_token.type != TokenType.RBRACE:
-                stmt = self.statement()
-                if stmt:  # 忽略None返回
-                    body.append(stmt)
-            
-            if not self.current_token or self.current_token.type != TokenType.RBRACE:
-                raise ParserError("while 语句体未正确结束，缺少 '}'", self.current_token)
-            
-            self.advance()  # 跳过 }
-            
-            return WhileNode(condition, body)
-        
-        # 处理导入语句
-        if token.type == TokenType.IMPORT:
-            self.advance()  # 跳过 import
-            if self.current_token.type != TokenType.STRING:
-                raise ParserError("导入语句需要文件路径", self.current_token)
-            module_name = self.current_token.value
-            self.advance()  # 跳过文件路径
-            return ImportNode(module_name)
-        
-        # 处理代码块
-        if token.type == TokenType.LBRACE:
-            self.advance()  # 跳过 {
-            statements = []
-            while self.current_token and self.current_token.type != TokenType.RBRACE:
-                stmt = self.statement()
-                if stmt:  # 忽略None返回
-                    statements.append(stmt)
-            
-            if not self.current_token or self.current_token.type != TokenType.RBRACE:
-                raise ParserError("代码块未正确结束，��少 '}'", self.current_token)
-            
-            self.advance()  # 跳过 }
-            return CodeBlockNode(statements)
+        class_name = self.current_token.value
+        self.advance()  # 跳过类名
         
-        # 处理函数定义
-        if token.type == TokenType.DEF:
-            return self.function_definition()
+        if not self.current_token or self.current_token.type != TokenType.LBRACE:
+            raise ParserError("类定义需要用 '{' 开始", self.current_token)
         
-        # 处理 if 语句
-        if token.type == TokenType.IF:
-            return self.if_statement()
+        self.advance()  # 跳过 {
         
-        # 处理 for 语句
-        if token.type == TokenType.FOR:
-            return self.for_statement()
+        methods = []
+        attributes = {}
         
-        # 处理 print 语句
-        if token.type == TokenType.PRINT:
-            self.advance()  # 跳过 print
-            if not self.current_token or self.current_token.type != TokenType.LPAREN:
-                raise ParserError("print 后需要括号", token)
-            self.advance()  # 跳过左括号
-            
-            # 处理空括号的情况
-            if self.current_token and self.current_token.type == TokenType.RPAREN:
-                self.advance()  # 跳过右括号
-                return PrintNode(None)
+        # 解析类体
+        while self.current_token and self.current_token.type != TokenType.RBRACE:
+            if self.current_token.type == TokenType.DEF:
+                # 解析方法定义
+                def_token = self.current_token
+                method = self.function_definition()
+                if method.memo:
+                    # 方法的结果还取决于 self 的属性，不能按参数缓存
+                    raise ParserError(f"方法 {method.name} 不能声明为 memo", def_token)
+                methods.append(method)
+            elif self.current_token.type == TokenType.IDENTIFIER:
+                # 解析类属性
+                name = self.current_token.value
+                self.advance()  # 跳过属性名
                 
-            expr = self.expr()
-            if not self.current_token or self.current_token.type != TokenType.RPAREN:
-                raise ParserError("缺少右括号", self.current_token)
-            self.advance()  # 跳过右括号
-            return PrintNode(expr)
-        
-        # ��理 printnln 语句
-        if token.type == TokenType.PRINTNLN:
-            self.advance()  # 跳过 printnln
-            if not self.current_token or self.current_token.type != TokenType.LPAREN:
-                raise ParserError("printnln 后需要括号", token)
-            self.advance()  # 跳过左括号
-            
-            # 处理空括号的情况
-            if self.current_token and self.current_token.type == TokenType.RPAREN:
-                self.advance()  # 跳过右括号
-                return PrintlnNode(None)
+                if not self.current_token or self.current_token.type != TokenType.EQUALS:
+                    raise ParserError("类属性定义需要赋值", self.current_token)
                 
-            expr = self.expr()
-            if not self.current_token or self.current_token.type != TokenType.RPAREN:
-                raise ParserError("缺少右括号", self.current_token)
-            self.advance()  # 跳过右括号
-            return PrintlnNode(expr)
+                self.advance()  # 跳过等号
+                value = self.expr()
+                attributes[name] = value
+            else:
+                raise ParserError("类定义中只能包含方法或属性定义", self.current_token)
         
-        # 处理 nsreturn 语句
-        if token.type == TokenType.NSRETURN:
-            self.advance()
-            value = self.expr()
-            return NsReturnNode(value)
+        if not self.current_token or self.current_token.type != TokenType.RBRACE:
+            raise ParserError("类定义未正确结束，缺少 '}'", self.current_token)
         
-        # 处理 return 语句
-        if token.type == TokenType.RETURN:
-            self.advance()
-            value = self.expr()
-            return ReturnNode(value)
+        self.advance()  # 跳过 }
         
-        # 处理点号访问、数组访问或变量赋值
-        if token.type == TokenType.IDENTIFIER:
-            name = token.value
-            name_token = token  # 保存标识符token
-            self.advance()
-            
-            # 如果直接跟着左大括号，说明是代码块调用（比如 forEach { ... }）
-            if self.current_token and self.current_token.type == TokenType.LBRACE:
-                statements = []
-                self.advance()  # 跳过 {
-                while self.current_token and self.current_token.type != TokenType.RBRACE:
-                    stmt = self.statement()
-                    if stmt:  # 忽略None返回
-                        statements.append(stmt)
-                if not self.current_token or self.current_token.type != TokenType.RBRACE:
-                    raise ParserError("代码块未正确结束，缺少 '}'", self.current_token)
-                self.advance()  # 跳过 }
-                return CallNode(name, [CodeBlockNode(statements)], name_token)
-            
-            # 处理点号访问（如 self.name）
-            if self.current_token and self.current_token.type == TokenType.DOT:
-                self.advance()  # 跳过点号
-                if not self.current_token or self.current_token.type != TokenType.IDENTIFIER:
-                    raise ParserError("点号后需要标识符", self.current_token)
-                member = self.current_token.value
-                member_token = self.current_token  # 保存成员token
-                self.advance()  # 跳过成员名
-                
-                # 处理方法调用
-                if self.current_token and self.current_token.type == TokenType.LPAREN:
-                    self.advance()  # 跳过左括号
-                    args = []
-                    
-                    # 如果不是右括号，说明有参数
-                    if self.current_token and self.current_token.type != TokenType.RPAREN:
-                        # 解析第一个参数
-                        args.append(self.expr())
-                        
-                        # 解析剩余的参数
-                        while self.current_token and self.current_token.type == TokenType.COMMA:
-                            self.advance()  # 跳过逗号
-                            if not self.current_token:
-                                raise ParserError("意外的文件结束", None)
-                            args.append(self.expr())
-                    
-                    if not self.current_token or self.current_token.type != TokenType.RPAREN:
-                        raise ParserError("缺少右括号", self.current_token)
-                    self.advance()  # 跳过右括号
-                    
-                    # 创建方法调用节点
-                    return CallNode(DotAccessNode(name, member), args, member_token)
-                
-                # 检查是否是赋值语句
-                if self.current_token and self.current_token.type == TokenType.EQUALS:
-                    self.advance()  # 跳过等号
-                    value = self.expr()
-                    return AssignNode(DotAccessNode(name, member), value)
-                
-                return DotAccessNode(name, member)
+        return ClassNode(class_name, methods, attributes)
+
+    def while_statement(self):
+        """解析 while 语句"""
+        token = self.current_token
+        self.advance()  # 跳过 while
+        if not self.current_token or self.current_token.type != TokenType.LPAREN:
+            raise ParserError("while 后需要括号", token)
+        self.advance()  # 跳过左括号
+        
+        condition = self.comparison()  # 解析条件表达式
+        
+        if not self.current_token or self.current_token.type != TokenType.RPAREN:
+            raise ParserError("缺少右括号", self.current_token)
+        self.advance()  # 跳过右括号
+        
+        # 解析循环体
+        if not self.current_token or self.current_token.type != TokenType.LBRACE:
+            raise ParserError("while 语句体需要用 '{' 开始", self.current_token)
+        self.advance()  # 跳过 {
+        
+        body = []
+        while self.current_token and self.current_token.type != TokenType.RBRACE:
+            stmt = self.block_statement()
+            if stmt:  # 忽略None返回
+                body.append(stmt)
+        
+        if not self.current_token or self.current_token.type != TokenType.RBRACE:
+            raise ParserError("while 语句体未正确结束，缺少 '}'", self.current_token)
+        
+        self.advance()  # 跳过 }
+        
+        return WhileNode(condition, body)
+
+    def import_statement(self):
+        """解析导入语句"""
+        self.advance()  # 跳过 import
+        if self.current_token.type != TokenType.STRING:
+            raise ParserError("导入语句需要文件路径", self.current_token)
+        module_name = self.current_token.value
+        self.advance()  # 跳过文件路径
+        return ImportNode(module_name)
+
+    def code_block(self):
+        """解析代码块"""
+        self.advance()  # 跳过 {
+        statements = []
+        while self.current_token and self.current_token.type != TokenType.RBRACE:
+            stmt = self.block_statement()
+            if stmt:  # 忽略None返回
+                statements.append(stmt)
+        
+        if not self.current_token or self.current_token.type != TokenType.RBRACE:
+            raise ParserError("代码块未正确结束，缺少 '}'", self.current_token)
+        
+        self.advance()  # 跳过 }
+        return CodeBlockNode(statements)
+
+    def print_statement(self):
+        """解析 print 和 printnln 语句"""
+        token = self.current_token
+        node_class = PrintNode if token.type == TokenType.PRINT else PrintlnNode
+        self.advance()  # 跳过 print/printnln
+        if not self.current_token or self.current_token.type != TokenType.LPAREN:
+            raise ParserError(f"{token.value} 后需要括号", token)
+        self.advance()  # 跳过左括号
+        
+        # 处理空括号的情况
+        if self.current_token and self.current_token.type == TokenType.RPAREN:
+            self.advance()  # 跳过右括号
+            return node_class(None)
             
-            # 处理数组访问（如 lines[i]）
-            if self.current_token and self.current_token.type == TokenType.LBRACKET:
-                self.advance()  # 跳过 [
-                index = self.expr()  # 解析索引表达式
-                if not self.current_token or self.current_token.type != TokenType.RBRACKET:
-                    raise ParserError("缺少右方括号 ']'", self.current_token)
-                self.advance()  # 跳过 ]
-                
-                # 检查是否是赋值语句
-                if self.current_token and self.current_token.type == TokenType.EQUALS:
-                    self.advance()  # 跳过 =
-                    value = self.expr()
-                    return AssignNode(ArrayAccessNode(name, index, name_token), value)
-                
-                return ArrayAccessNode(name, index, name_token)
+        expr = self.expr()
+        if not self.current_token or self.current_token.type != TokenType.RPAREN:
+            raise ParserError("缺少右括号", self.current_token)
+        self.advance()  # 跳过右括号
+        return node_class(expr)
+
+    def nsreturn_statement(self):
+        """解析 nsreturn 语句"""
+        self.advance()
+        value = self.expr()
+        return NsReturnNode(value)
+
+    def return_statement(self):
+        """解析 return 语句"""
+        self.advance()
+        value = self.expr()
+        return ReturnNode(value)
+
+    def identifier_statement(self):
+        """解析以标识符开头的语句：点号访问、数组访问、函数调用或变量赋值"""
+        token = self.current_token
+        name = token.value
+        name_token = token  # 保存标识符token
+        self.advance()
+        
+        # 如果直接跟着左大括号，说明是代码块调用（比如 forEach { ... }）
+        if self.current_token and self.current_token.type == TokenType.LBRACE:
+            statements = []
+            self.advance()  # 跳过 {
+            while self.current_token and self.current_token.type != TokenType.RBRACE:
+                stmt = self.block_statement()
+                if stmt:  # 忽略None返回
+                    statements.append(stmt)
+            if not self.current_token or self.current_token.type != TokenType.RBRACE:
+                raise ParserError("代码块未正确结束，缺少 '}'", self.current_token)
+            self.advance()  # 跳过 }
+            return CallNode(name, [CodeBlockNode(statements)], name_token)
+        
+        # 处理点号访问（如 self.name）
+        if self.current_token and self.current_token.type == TokenType.DOT:
+            self.advance()  # 跳过点号
+            if not self.current_token or self.current_token.type != TokenType.IDENTIFIER:
+                raise ParserError("点号后需要标识符", self.current_token)
+            member = self.current_token.value
+            member_token = self.current_token  # 保存成员token
+            self.advance()  # 跳过成员名
             
-            # 如果是函数调用
-            elif self.current_token and self.current_token.type == TokenType.LPAREN:
+            # 处理方法调用
+            if self.current_token and self.current_token.type == TokenType.LPAREN:
                 self.advance()  # 跳过左括号
                 args = []
                 
@@ -406,49 +581,103 @@ class Parser:
                             raise ParserError("意外的文件结束", None)
                         args.append(self.expr())
                 
-                # 检查右括号
                 if not self.current_token or self.current_token.type != TokenType.RPAREN:
                     raise ParserError("缺少右括号", self.current_token)
                 self.advance()  # 跳过右括号
                 
-                return CallNode(name, args, name_token)
+                # 创建方法调用节点
+                return CallNode(DotAccessNode(name, member, name_token), args, member_token)
             
-            # 如果是赋值语句
-            elif self.current_token and self.current_token.type == TokenType.EQUALS:
-                self.advance()
+            # 检查是否是赋值语句
+            if self.current_token and self.current_token.type == TokenType.EQUALS:
+                self.advance()  # 跳过等号
                 value = self.expr()
-                return AssignNode(name, value)
+                return AssignNode(DotAccessNode(name, member, name_token), value)
             
-            # 如果是变量引用
-            return VariableNode(name)
+            return DotAccessNode(name, member, name_token)
         
-        # 如果是表达式语句
-        expr = self.expr()
-        return expr
-
-    def expr(self):
-        """解析加减表达式"""
-        node = self.term()
-
-        while self.current_token and self.current_token.type in (TokenType.PLUS, TokenType.MINUS):
-            op = self.current_token
+        # 处理数组访问（如 lines[i]）
+        if self.current_token and self.current_token.type == TokenType.LBRACKET:
+            self.advance()  # 跳过 [
+            index = self.expr()  # 解析索引表达式
+            if not self.current_token or self.current_token.type != TokenType.RBRACKET:
+                raise ParserError("缺少右方括号 ']'", self.current_token)
+            self.advance()  # 跳过 ]
+            
+            # 检查是否是赋值语句
+            if self.current_token and self.current_token.type == TokenType.EQUALS:
+                self.advance()  # 跳过 =
+                value = self.expr()
+                return AssignNode(ArrayAccessNode(name, index, name_token), value)
+            
+            return ArrayAccessNode(name, index, name_token)
+        
+        # 如果是函数调用
+        elif self.current_token and self.current_token.type == TokenType.LPAREN:
+            self.advance()  # 跳过左括号
+            args = []
+            
+            # 如果不是右括号，说明有参数
+            if self.current_token and self.current_token.type != TokenType.RPAREN:
+                # 解析第一个参数
+                args.append(self.expr())
+                
+                # 解析剩余的参数
+                while self.current_token and self.current_token.type == TokenType.COMMA:
+                    self.advance()  # 跳过逗号
+                    if not self.current_token:
+                        raise ParserError("意外的文件结束", None)
+                    args.append(self.expr())
+            
+            # 检查右括号
+            if not self.current_token or self.current_token.type != TokenType.RPAREN:
+                raise ParserError("缺少右括号", self.current_token)
+            self.advance()  # 跳过右括号
+            
+            return CallNode(name, args, name_token)
+        
+        # 如果是赋值语句
+        elif self.current_token and self.current_token.type == TokenType.EQUALS:
             self.advance()
-            right = self.term()
-            node = BinOpNode(node, op, right)
+            value = self.expr()
+            return AssignNode(name, value)
+        
+        # 如果是变量引用
+        return VariableNode(name, name_token)
 
+    def literal(self, node_class, value):
+        """返回字面量节点，同一次解析中相同的字面量共用一个节点"""
+        # 键里带上值的类型，避免 1 和 1.0 被当成同一个字面量
+        key = (node_class, type(value), value)
+        node = self.literals.get(key)
+        if node is None:
+            node = self.literals[key] = node_class(value)
         return node
 
-    def term(self):
-        """解析乘除表达式"""
-        node = self.factor()
+    def expr(self):
+        """解析加减乘除表达式（不含比较运算）"""
+        return self.binary(ADDITIVE_PRECEDENCE)
+
+    def comparison(self):
+        """解析比较表达式（比较运算不可连用，如 a < b < c）"""
+        return self.binary(COMPARISON_PRECEDENCE)
 
-        while self.current_token and self.current_token.type in (TokenType.MULTIPLY, TokenType.DIVIDE):
+    def binary(self, min_precedence):
+        """优先级爬升：解析优先级不低于 min_precedence 的二元运算表达式"""
+        node = self.factor()
+        
+        while True:
             op = self.current_token
+            if op is None:
+                return node
+            precedence = BINARY_PRECEDENCE.get(op.type)
+            if precedence is None or precedence < min_precedence:
+                return node
             self.advance()
-            right = self.factor()
-            node = BinOpNode(node, op, right)
-
-        return node
+            right = self.binary(precedence + 1)
+            node = BinOpNode(node, op.type, right)
+            if precedence == COMPARISON_PRECEDENCE:
+                return node
 
     def factor(self):
         """解析基本因子"""
@@ -474,11 +703,11 @@ class Parser:
             
         if token.type == TokenType.NUMBER:
             self.advance()
-            return NumberNode(token.value)
+            return self.literal(NumberNode, token.value)
             
         if token.type == TokenType.STRING:
             self.advance()
-            return StringNode(token.value)
+            return self.literal(StringNode, token.value)
             
         if token.type == TokenType.IDENTIFIER:
             name = token.value
@@ -497,9 +726,9 @@ class Parser:
                 if self.current_token and self.current_token.type == TokenType.EQUALS:
                     self.advance()  # 跳过等号
                     value = self.expr()
-                    return AssignNode(DotAccessNode(name, member), value)
+                    return AssignNode(DotAccessNode(name, member, name_token), value)
                 
-                return DotAccessNode(name, member)
+                return DotAccessNode(name, member, name_token)
             
             # 处理数组访问（如 lines[i]）
             if self.current_token and self.current_token.type == TokenType.LBRACKET:
@@ -528,7 +757,7 @@ class Parser:
                 
                 return CallNode(name, args, name_token)
             
-            return VariableNode(name)
+            return VariableNode(name, name_token)
             
         if token.type == TokenType.LPAREN:
             self.advance()
@@ -564,7 +793,7 @@ class Parser:
         
         body = []
         while self.current_token and self.current_token.type != TokenType.RBRACE:
-            stmt = self.statement()
+            stmt = self.block_statement()
             if stmt:  # 忽略None返回
                 body.append(stmt)
         
@@ -575,31 +804,17 @@ class Parser:
         
         return IfNode(condition, body)
 
-    def comparison(self):
-        """解析比较表达式"""
-        # 获取左边的表达式
-        left = self.expr()
-        
-        # 如果有比较运算符，处理右边的表达式
-        if self.current_token and self.current_token.type in (TokenType.EQ, TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE):
-            op = self.current_token
-            self.advance()
-            right = self.expr()
-            return BinOpNode(left, op, right)
-        
-        return left
-
     def parse_for_condition(self):
         """解析for循环的条件表达式"""
         if self.current_token.type == TokenType.IDENTIFIER:
-            left = VariableNode(self.current_token.value)
+            left = VariableNode(self.current_token.value, self.current_token)
             self.advance()
         else:
             left = self.expr()
         
         # 跳过比较运算符
         if self.current_token and self.current_token.type in (TokenType.EQ, TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE):
-            op = self.current_token
+            op = self.current_token.type
             self.advance()
             right = self.expr()
             return BinOpNode(left, op, right)
@@ -648,7 +863,7 @@ class Parser:
         
         body = []
         while self.current_token and self.current_token.type != TokenType.RBRACE:
-            stmt = self.statement()
+            stmt = self.block_statement()
             if stmt:
                 body.append(stmt)
         
@@ -669,10 +884,20 @@ class Parser:
         func_type = self.current_token.value
         self.advance()
         
+        # 可选的 memo 修饰：按参数缓存函数的结果。memo 不是关键字，
+        # 后面紧跟函数名时才是修饰，否则就是名为 memo 的函数
+        memo = False
+        if (self.current_token.type == TokenType.IDENTIFIER and self.current_token.value == 'memo'
+                and self.peek_next_token() is not None
+                and self.peek_next_token().type == TokenType.IDENTIFIER):
+            memo = True
+            self.advance()
+        
         # 解析函数名
         if self.current_token.type != TokenType.IDENTIFIER:
             raise ParserError("需要函数名", self.current_token)
-        func_name = self.current_token.value
+        name_token = self.current_token
+        func_name = name_token.value
         self.advance()
         
         # 解析参数列表
@@ -730,7 +955,7 @@ class Parser:
         
         body = []
         while self.current_token and self.current_token.type != TokenType.RBRACE:
-            stmt = self.statement()
+            stmt = self.block_statement()
             if stmt:  # 忽略None返回
                 body.append(stmt)
         
@@ -739,7 +964,7 @@ class Parser:
         
         self.advance()  # 跳过 '}'
         
-        return FunctionNode(func_type, func_name, params, body)
+        return FunctionNode(func_type, func_name, params, body, memo, name_token)
 
     def parse_class(self):
         """解析类定义"""
@@ -781,37 +1006,60 @@ class Parser:
         
         return ClassNode(class_name, methods, attributes)
 
-class FunctionNode(ASTNode):
+class FunctionNode(PositionedNode):
     """函数定义节点"""
-    def __init__(self, type, name, params, body):
+    __slots__ = ('type', 'name', 'params', 'body', 'memo', 'local_names', 'slot_index')
+
+    def __init__(self, type, name, params, body, memo=False, token=None):
         self.type = type      # 函数类型（public/private）
         self.name = name      # 函数名
         self.params = params  # 参数列表
         self.body = body      # 函数体
+        self.memo = memo      # 是否按参数缓存结果（def public memo name(...)）
+        self.position = pack_position(token)  # 定义中函数名的位置
+        # 由 resolver 填写：按槽位排列的参数和局部变量名，以及名字到槽位的映射
+        self.local_names = None
+        self.slot_index = None
+
+    @property
+    def source_text(self):
+        return self.name
 
     def __str__(self):
         return f"Function({self.type}, {self.name}, {self.params}, {self.body})"
 
 class ParamNode(ASTNode):
     """函数参数节点"""
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
     def __str__(self):
         return f"Param({self.name})"
 
-class CallNode(ASTNode):
+class CallNode(PositionedNode):
     """函数调用节点"""
+    __slots__ = ('name', 'args')
+
     def __init__(self, name, args, token=None):
         self.name = name    # 函数名
         self.args = args    # 参数列表
-        self.token = token  # 保存token以获取位置信息
+        self.position = pack_position(token)  # 调用位置
+
+    @property
+    def source_text(self):
+        if isinstance(self.name, DotAccessNode):
+            return self.name.member_name
+        return self.name
 
     def __str__(self):
         return f"Call({self.name}, {self.args})"
 
 class ReturnNode(ASTNode):
     """返回语句节点"""
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
         
@@ -820,6 +1068,8 @@ class ReturnNode(ASTNode):
 
 class CodeBlockNode(ASTNode):
     """代码块节点"""
+    __slots__ = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements  # 代码块中的语句列表
         
@@ -828,42 +1078,78 @@ class CodeBlockNode(ASTNode):
 
 class CodeBlockParamNode(ParamNode):
     """代码块参数节点"""
-    def __init__(self, name):
-        super().__init__(name)
-        self.is_codeblock = True
+    __slots__ = ()
+
+    is_codeblock = True
 
     def __str__(self):
         return f"CodeBlockParam({self.name})"
 
 class ImportNode(ASTNode):
     """导入语句节点"""
+    __slots__ = ('module_name',)
+
     def __init__(self, module_name):
         self.module_name = module_name
         
     def __str__(self):
         return f"Import({self.module_name})"
 
-class ArrayAccessNode(ASTNode):
+class ArrayAccessNode(PositionedNode):
     """数组访问节点"""
+    __slots__ = ('array', 'index')
+
     def __init__(self, array, index, token=None):
         self.array = array  # 数组名
         self.index = index  # 索引表达式
-        self.token = token  # 保存token以获取位置信息
+        self.position = pack_position(token)  # 访问位置
+
+    @property
+    def source_text(self):
+        return self.array
 
     def __str__(self):
         return f"ArrayAccess({self.array}[{self.index}])"
 
+class InlineCache:
+    """方法调用、属性读写处的内联缓存（见 DotAccessNode）
+
+    key 是上一次查找时接收者的布局，value 是查找结果：方法调用处为
+    BCCClass 和方法，属性读写处为实例的 shape 和属性在实例中的下标。
+    类定义执行之后方法不再变化，重新定义类会创建新的 BCCClass；shape
+    创建后也不再变化，实例添加属性时换成新的 shape。所以接收者的布局就是
+    key 时结果仍然有效，否则由解释器重新查找并更新缓存。hits 和 misses
+    统计命中和未命中的次数。缓存的内容只在运行时有意义，序列化（AST
+    缓存）后得到空缓存。
+    """
+    __slots__ = ('key', 'value', 'hits', 'misses')
+
+    def __init__(self):
+        self.key = None
+        self.value = None
+        self.hits = 0
+        self.misses = 0
+
+    def __reduce__(self):
+        return (InlineCache, ())
+
 class DotAccessNode(ASTNode):
     """点号访问节点，用于处理如 BCC.Codeblock 这样的表达式"""
-    def __init__(self, object_name, member_name):
+    __slots__ = ('object_name', 'member_name', 'receiver', 'cache')
+
+    def __init__(self, object_name, member_name, token=None):
         self.object_name = object_name  # 对象名（如 BCC）
         self.member_name = member_name  # 成员名（�� Codeblock）
+        self.receiver = VariableNode(object_name, token)  # 读取对象的变量节点，函数中由 resolver 改写
+        self.cache = InlineCache()  # 按对象的类或 shape 缓存查到的方法或属性下标
 
     def __str__(self):
         return f"DotAccess({self.object_name}.{self.member_name})"
 
 class NsReturnNode(ASTNode):
     """不停的返回语句节点"""
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
         
@@ -872,6 +1158,8 @@ class NsReturnNode(ASTNode):
 
 class ExprNode(ASTNode):
     """表达式节点，用于包装表达式以延迟求值"""
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
         
@@ -880,6 +1168,8 @@ class ExprNode(ASTNode):
 
 class ClassNode(ASTNode):
     """类定义节点"""
+    __slots__ = ('name', 'methods', 'attributes')
+
     def __init__(self, name, methods, attributes=None):
         self.name = name            # 类名
         self.methods = methods      # 方法列表
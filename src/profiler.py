@@ -0,0 +1,427 @@
+import bisect
+import json
+import sys
+import threading
+import time
+
+from .bytecode import (
+    CodeObject, OPERAND_COUNTS, LOAD_CALLEE, LOAD_CALLEE_OR_CLASS, LOAD_METHOD, LOAD_ATTR
+)
+from .closure_interpreter import ClosureInterpreter
+from .hooks import ExecutionHook, node_line
+from .interpreter import Interpreter, BCCClass, UNBOUND
+from .parser import ASTNode
+from .vm import VMInterpreter
+
+# 执行 BCC 函数调用的 Python 函数，采样时据此把 Python 的调用栈分成各个 BCC 栈帧。
+# 按 id 查找，计算代码对象的哈希要遍历其中的字节码和常量
+EXECUTE_FUNCTION_CODES = {
+    id(Interpreter.execute_function.__code__),
+    id(ClosureInterpreter.execute_function.__code__),
+    id(VMInterpreter.execute_function.__code__),
+}
+# 字节码虚拟机的指令循环，同一个 Python 帧中执行全部的 BCC 函数调用
+DISPATCH_CODE = VMInterpreter.dispatch.__code__
+ENTER_FUNCTION_CODE = VMInterpreter.enter_function.__code__
+
+# 采样时 Python 帧的种类：无关的帧、执行 BCC 函数调用、虚拟机正在进入函数、
+# 虚拟机的指令循环、局部变量中有正在执行的节点
+OTHER_FRAME, CALL_FRAME, ENTER_FRAME, DISPATCH_FRAME, NODE_FRAME = range(5)
+
+
+class FunctionLocator:
+    """函数在报告中的名字和所在的文件
+
+    类的方法显示为 类名.方法名。导入的函数在导入它的解释器中执行，按已
+    加载的模块找到定义它的文件，找不到时属于执行它的解释器的文件。
+    """
+    def __init__(self):
+        self.functions = {}  # FunctionNode -> (名字, 文件名)
+
+    def locate(self, interpreter, func):
+        info = self.functions.get(func)
+        if info is None:
+            # 第一次遇到的函数：查找各模块和解释器中定义的函数和类
+            for filepath, module in list(interpreter.module_manager.modules.items()):
+                self.add(module, filepath)
+            self.add(interpreter, interpreter.filename)
+            info = self.functions.get(func)
+            if info is None:
+                info = self.functions[func] = (func.name, interpreter.filename)
+        return info
+
+    def add(self, interpreter, filename):
+        for value in list(interpreter.globals.values()):
+            if isinstance(value, BCCClass):
+                for method in value.methods.values():
+                    self.functions.setdefault(method, (f"{value.name}.{method.name}", filename))
+        for function in list(interpreter.functions.values()):
+            self.functions.setdefault(function, (function.name, filename))
+
+
+class ProfileEntry:
+    """一个函数（或方法）或一行源码的统计
+
+    calls 对函数是调用次数，对源码行是执行到该行的次数。wall/cpu 是累计
+    时间，包括其中调用的函数；self_wall/self_cpu 是自身时间，不包括调用
+    的 BCC 函数。递归调用只在最外层计入累计时间。
+    """
+    __slots__ = ('name', 'filename', 'line', 'calls', 'wall', 'cpu', 'self_wall', 'self_cpu')
+
+    def __init__(self, name, filename, line):
+        self.name = name
+        self.filename = filename
+        self.line = line
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.self_wall = 0.0
+        self.self_cpu = 0.0
+
+    @property
+    def location(self):
+        if self.line is None:
+            return self.filename
+        return f"{self.filename}:{self.line}"
+
+    def to_dict(self):
+        """源码行的统计没有名字，执行次数记为 hits"""
+        result = {'name': self.name} if self.name is not None else {}
+        result.update({
+            'file': self.filename,
+            'line': self.line,
+            'calls' if self.name is not None else 'hits': self.calls,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'self_wall': self.self_wall,
+            'self_cpu': self.self_cpu,
+        })
+        return result
+
+
+class Profiler(ExecutionHook):
+    """确定性的 BCC 性能分析器，把时间记到 BCC 函数、类的方法和源码行上
+
+    作为执行钩子注册到解释器上：每次函数调用、返回和执行到新的一行时
+    同时读取墙钟时间（perf_counter）和 CPU 时间（process_time）。两次
+    事件之间的时间记入当前行的自身时间，函数调用的时间记入函数，并
+    记入调用所在行的累计时间。
+
+    注册钩子后各执行后端都按树遍历执行（见 Interpreter.install_hooks），
+    分析结果反映的是树遍历解释器上的耗时。只有带位置的节点才有行号，
+    没有行号的语句的时间记在之前执行的行上。
+    """
+    def __init__(self):
+        self.functions = {}      # FunctionNode -> ProfileEntry
+        self.lines = {}          # (文件名, 行号) -> ProfileEntry
+        self.locator = FunctionLocator()
+        # 正在执行的调用：[函数的统计, 调用所在行的统计, 开始的墙钟时间,
+        # 开始的 CPU 时间, 其中调用的函数的墙钟时间, 其中调用的函数的 CPU 时间]
+        self.stack = []
+        self.active = {}       # 统计 -> 在 stack 中的层数，用于递归时只计一次累计时间
+        self.current_line = None
+        self.line_wall = 0.0   # 当前行这一段开始的时间
+        self.line_cpu = 0.0
+        self.start_wall = self.start_cpu = None
+        self.total_wall = 0.0
+        self.total_cpu = 0.0
+
+    def start(self):
+        self.start_wall = self.line_wall = time.perf_counter()
+        self.start_cpu = self.line_cpu = time.process_time()
+
+    def stop(self):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.flush(wall, cpu)
+        self.current_line = None
+        self.total_wall += wall - self.start_wall
+        self.total_cpu += cpu - self.start_cpu
+
+    def flush(self, wall, cpu):
+        """把当前行从上次事件到现在的时间记入该行"""
+        line = self.current_line
+        if line is not None:
+            elapsed_wall = wall - self.line_wall
+            elapsed_cpu = cpu - self.line_cpu
+            line.self_wall += elapsed_wall
+            line.self_cpu += elapsed_cpu
+            if not self.active.get(line):
+                # 外层的调用也在这一行时，这段时间会随那次调用记入累计时间
+                line.wall += elapsed_wall
+                line.cpu += elapsed_cpu
+        self.line_wall = wall
+        self.line_cpu = cpu
+
+    def on_line(self, interpreter, line):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.flush(wall, cpu)
+        filename = self.stack[-1][0].filename if self.stack else interpreter.filename
+        entry = self.lines.get((filename, line))
+        if entry is None:
+            entry = self.lines[filename, line] = ProfileEntry(None, filename, line)
+        entry.calls += 1
+        self.current_line = entry
+
+    def on_call(self, interpreter, func, args):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.flush(wall, cpu)
+        entry = self.functions.get(func)
+        if entry is None:
+            entry = self.functions[func] = self.function_entry(interpreter, func)
+        entry.calls += 1
+        self.active[entry] = self.active.get(entry, 0) + 1
+        caller_line = self.current_line
+        if caller_line is not None:
+            self.active[caller_line] = self.active.get(caller_line, 0) + 1
+        self.stack.append([entry, caller_line, wall, cpu, 0.0, 0.0])
+        # 执行到函数体的第一行之前不记入任何行
+        self.current_line = None
+
+    def on_return(self, interpreter, func, value):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self.flush(wall, cpu)
+        entry, caller_line, start_wall, start_cpu, child_wall, child_cpu = self.stack.pop()
+        elapsed_wall = wall - start_wall
+        elapsed_cpu = cpu - start_cpu
+        entry.self_wall += elapsed_wall - child_wall
+        entry.self_cpu += elapsed_cpu - child_cpu
+        self.active[entry] -= 1
+        if not self.active[entry]:
+            entry.wall += elapsed_wall
+            entry.cpu += elapsed_cpu
+        if self.stack:
+            caller = self.stack[-1]
+            caller[4] += elapsed_wall
+            caller[5] += elapsed_cpu
+        if caller_line is not None:
+            self.active[caller_line] -= 1
+            if not self.active[caller_line]:
+                caller_line.wall += elapsed_wall
+                caller_line.cpu += elapsed_cpu
+        self.current_line = caller_line
+
+    def function_entry(self, interpreter, func):
+        """第一次调用函数时创建它的统计"""
+        name, filename = self.locator.locate(interpreter, func)
+        return ProfileEntry(name, filename, node_line(func))
+
+    def to_dict(self):
+        """可以写成 JSON 的分析结果，函数按累计时间、源码行按自身时间从大到小排序"""
+        functions = sorted(self.functions.values(), key=lambda entry: entry.wall, reverse=True)
+        lines = sorted(self.lines.values(), key=lambda entry: entry.self_wall, reverse=True)
+        return {
+            'wall': self.total_wall,
+            'cpu': self.total_cpu,
+            'functions': [entry.to_dict() for entry in functions],
+            'lines': [entry.to_dict() for entry in lines],
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def format_report(self, limit=20):
+        """按时间排序的文本报告，各显示最多 limit 个函数和源码行"""
+        # 中文标题每个字占两列，按显示宽度对齐
+        columns = f"{'调用次数':>6}{'累计(秒)':>10}{'自身(秒)':>10}{'累计CPU':>10}{'自身CPU':>10}"
+        report = [f"总耗时 {self.total_wall:.3f} 秒，CPU {self.total_cpu:.3f} 秒", ""]
+        report.append(f"{'函数':<24}{columns}  位置")
+        for entry in sorted(self.functions.values(), key=lambda entry: entry.wall, reverse=True)[:limit]:
+            report.append(f"{entry.name:<26}{self.format_times(entry)}  {entry.location}")
+        report.append("")
+        report.append(f"{'源码行':<23}{columns.replace('调用次数', '执行次数')}")
+        for entry in sorted(self.lines.values(), key=lambda entry: entry.self_wall, reverse=True)[:limit]:
+            report.append(f"{entry.location:<26}{self.format_times(entry)}")
+        return '\n'.join(report)
+
+    def format_times(self, entry):
+        return (f"{entry.calls:10}{entry.wall:12.4f}{entry.self_wall:12.4f}"
+                f"{entry.cpu:12.4f}{entry.self_cpu:12.4f}")
+
+
+class SamplingProfiler:
+    """采样性能分析器，定期记录 BCC 的调用栈，输出火焰图工具使用的折叠栈格式
+
+    后台线程每隔 interval 秒取一次执行程序的线程的 Python 调用栈，从中还原
+    BCC 的调用栈：每个 execute_function 帧是一次 BCC 函数调用，字节码虚拟机
+    在指令循环中执行的调用保存在它的 calls 中；各个 BCC 栈帧正在执行的行
+    取自树遍历和闭包后端的 Python 帧中的 node 变量，或者字节码中之前最近
+    的带位置的指令（见 line_table）。不注册执行钩子，程序仍在原来的执行
+    后端上以原来的速度执行，开销只在采样线程中。
+
+    折叠栈的每一行是由外向内、用分号分隔的栈帧和采样次数，例如：
+    <module> (test.bcs:18);fib (test.bcs:12);fib (test.bcs:10) 3
+    """
+    def __init__(self, interpreter, interval=0.01):
+        self.interpreter = interpreter
+        self.interval = interval
+        self.samples = {}  # 由外向内的栈帧标签 -> 采样次数
+        self.locator = FunctionLocator()
+        self.node_lines = {}   # 节点的行号，以节点对象为键缓存
+        self.line_tables = {}  # CodeObject -> line_table 的结果
+        self.frame_kinds = {}  # id(Python 代码对象) -> (代码对象, 帧的种类)
+        self.labels = {}       # (函数或 CodeObject, 行号) -> 栈帧标签
+        self.sampling_time = 0.0  # 采样线程取调用栈花费的时间，期间程序不能执行
+        self.thread_id = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        """在当前线程执行程序期间开始采样"""
+        self.thread_id = threading.get_ident()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name='bcc-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            start = time.perf_counter()
+            python_frame = sys._current_frames().get(self.thread_id)
+            if python_frame is not None:
+                stack = self.sample(python_frame)
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+            del python_frame
+            self.sampling_time += time.perf_counter() - start
+
+    @property
+    def sample_count(self):
+        return sum(self.samples.values())
+
+    def sample(self, python_frame):
+        """python_frame 所在的 BCC 调用栈，返回由外向内的栈帧标签"""
+        # 由内向外的 (函数或 CodeObject, 行号)，函数为 None 表示顶层代码
+        frames = []
+        line = None
+        entering = None  # 虚拟机正在进入的函数
+        frame_kinds = self.frame_kinds
+        while python_frame is not None:
+            code = python_frame.f_code
+            entry = frame_kinds.get(id(code))
+            if entry is None or entry[0] is not code:
+                entry = frame_kinds[id(code)] = (code, frame_kind(code))
+            kind = entry[1]
+            if kind == OTHER_FRAME:
+                pass
+            elif kind == CALL_FRAME:
+                frames.append((python_frame.f_locals.get('func'), line))
+                line = None
+                entering = None
+            elif kind == ENTER_FRAME:
+                entering = python_frame.f_locals.get('func')
+            elif kind == DISPATCH_FRAME:
+                variables = python_frame.f_locals
+                current = variables['code']
+                calls = variables['calls']
+                if entering is not None and calls and calls[-1][0] is current:
+                    # 调用者已经压入 calls，被调用的函数还没有开始执行
+                    current = entering
+                elif line is None:
+                    line = self.code_line(current, variables['pc'])
+                entering = None
+                # 指令循环内的调用，calls 中由内向外依次是调用者和返回地址
+                for caller, _, _, return_pc in reversed(calls):
+                    frames.append((current, line))
+                    current = caller
+                    line = self.code_line(caller, return_pc)
+            elif line is None:
+                line = self.node_line(python_frame.f_locals.get('node'))
+            python_frame = python_frame.f_back
+        frames.append((None, line))
+        labels = self.labels
+        stack = []
+        for key in reversed(frames):
+            label = labels.get(key)
+            if label is None:
+                label = labels[key] = self.label(*key)
+            stack.append(label)
+        return tuple(stack)
+
+    def label(self, function, line):
+        """栈帧的标签：名字 (文件:行号)"""
+        interpreter = self.interpreter
+        function = self.code_function(function)
+        if function is None:
+            name, filename = '<module>', interpreter.filename
+        elif isinstance(function, CodeObject):
+            name, filename = function.name, interpreter.filename
+        else:
+            name, filename = self.locator.locate(interpreter, function)
+        if line is None:
+            return f"{name} ({filename})"
+        return f"{name} ({filename}:{line})"
+
+    def code_function(self, code):
+        """虚拟机中函数体的字节码对应的函数，找不到时返回 code 本身"""
+        if not isinstance(code, CodeObject):
+            return code
+        return self.interpreter.code_functions.get(code, code)
+
+    def node_line(self, node):
+        if not isinstance(node, ASTNode):
+            return None
+        line = self.node_lines.get(node, UNBOUND)
+        if line is UNBOUND:
+            line = self.node_lines[node] = node_line(node)
+        return line
+
+    def code_line(self, code, pc):
+        """字节码中 pc 处的行号"""
+        table = self.line_tables.get(code)
+        if table is None:
+            table = self.line_tables[code] = line_table(code)
+        positions, lines = table
+        index = bisect.bisect_right(positions, pc)
+        return lines[index - 1] if index else None
+
+    def format_collapsed(self):
+        """折叠栈格式的采样结果，可以直接交给 flamegraph.pl 等工具"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.samples.items()))
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.format_collapsed())
+
+
+def frame_kind(code):
+    """Python 代码对象执行时的帧在采样中的种类"""
+    if id(code) in EXECUTE_FUNCTION_CODES:
+        return CALL_FRAME
+    if code is ENTER_FUNCTION_CODE:
+        return ENTER_FRAME
+    if code is DISPATCH_CODE:
+        return DISPATCH_FRAME
+    if 'node' in code.co_varnames or 'node' in code.co_freevars:
+        return NODE_FRAME
+    return OTHER_FRAME
+
+
+def line_table(code):
+    """CodeObject 的行号表：(指令位置列表, 行号列表)，都按指令位置排序
+
+    行号来自读取变量的指令记录的变量节点，以及调用、方法调用和属性访问
+    指令的常量中的节点。执行到没有记录的指令时，使用之前最近的有行号
+    的指令的行号。
+    """
+    table = {}
+    for position, node in code.nodes.items():
+        line = node_line(node)
+        if line is not None:
+            table[position] = line
+    position = 0
+    while position < len(code.code):
+        opcode = code.code[position]
+        if opcode in (LOAD_CALLEE, LOAD_CALLEE_OR_CLASS, LOAD_METHOD, LOAD_ATTR):
+            line = node_line(code.consts[code.code[position + 1]][1])
+            if line is not None:
+                table.setdefault(position, line)
+        position += 1 + OPERAND_COUNTS.get(opcode, 1)
+    positions = sorted(table)
+    return positions, [table[position] for position in positions]
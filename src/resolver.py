@@ -0,0 +1,300 @@
+from .parser import (
+    ASTNode, PositionedNode, VariableNode, AssignNode, FunctionNode, ClassNode,
+    LocalVariableNode, GlobalVariableNode, LocalAssignNode,
+    PrintNode, PrintlnNode, CallNode, ImportNode, NsReturnNode, DotAccessNode,
+    ArrayAccessNode
+)
+
+# 没有副作用的内置函数，memo 函数可以调用
+PURE_BUILTINS = frozenset({'len', 'eval', 'str', 'int', 'float', 'bool', 'type'})
+
+class ResolverError(Exception):
+    """名字解析时发现的问题，包含出错位置"""
+    def __init__(self, message, token):
+        self.token = token
+        super().__init__(message)
+
+    def __reduce__(self):
+        # 警告与解析结果一起写入缓存
+        return ResolverError, (str(self), self.token)
+
+class Resolver:
+    """名字解析：在执行前为函数的参数和局部变量分配槽位
+
+    函数中被赋值的名字（包括参数和在函数中定义的类）都是局部变量，按
+    第一次出现的顺序编号，参数在最前面。函数体中的 VariableNode 和以
+    名字为目标的 AssignNode 被改写为按下标访问栈帧的 LocalVariableNode、
+    LocalAssignNode；其余的变量读取改写为 GlobalVariableNode，如果程序
+    顶层从未给这个名字赋值，就记录一个带位置的 ResolverError。
+
+    嵌套定义的函数和类的方法各自单独解析。顶层代码仍然按名字访问全局变量。
+
+    memo 函数的函数体中有副作用或者读取了可变的状态（见 side_effect），
+    包括调用了可能这样做的函数时，记录一个 ResolverError 并取消 memo，这个
+    函数照常每次执行。
+
+    用法:
+        errors = Resolver(known_globals).resolve_program(statements)
+    """
+    def __init__(self, known_globals=()):
+        self.globals = set(known_globals)  # 已知的全局变量名
+        self.variables = set(known_globals)  # 可能被重新赋值的全局变量名（不包括函数名和类名）
+        self.errors = []
+        self.function = None  # 正在解析的函数
+        self.functions = {}   # 程序中定义的函数：函数名 -> 同名的 FunctionNode 列表
+        self.impure = set()   # 可能有副作用或读取可变状态的函数名
+
+    def resolve_program(self, statements):
+        """解析整个程序中的函数，返回无法解析的名字列表"""
+        self.globals.update(bound_names(statements))
+        self.variables.update(bound_names(statements, classes=False))
+        self.functions = defined_functions(statements)
+        if any(func.memo for definitions in self.functions.values() for func in definitions):
+            self.impure = impure_functions(self.functions, self.variables)
+        for func in nested_functions(statements):
+            self.resolve_function(func)
+        return self.errors
+
+    def resolve_function(self, func):
+        """为函数分配槽位并改写函数体，已经解析过的函数直接跳过"""
+        if func.local_names is not None:
+            return
+        local_names = [param.name for param in func.params]
+        for name in bound_names(func.body):
+            if name not in local_names:
+                local_names.append(name)
+        func.local_names = tuple(local_names)
+        func.slot_index = {name: slot for slot, name in enumerate(local_names)}
+        if func.memo:
+            effect = side_effect(func, self.functions, self.impure, self.variables)
+            if effect is not None:
+                description, token = effect
+                self.errors.append(ResolverError(
+                    f"memo 函数 {func.name} 中{description}，不缓存它的结果", token))
+                func.memo = False
+        self.function = func
+        func.body = self.rewrite(func.body)
+        for nested in nested_functions(func.body):
+            self.resolve_function(nested)
+
+    def rewrite(self, node):
+        """返回改写后的节点，列表和普通节点的子节点原地替换"""
+        if isinstance(node, list):
+            for index, item in enumerate(node):
+                node[index] = self.rewrite(item)
+            return node
+        if isinstance(node, dict):
+            for key, value in node.items():
+                node[key] = self.rewrite(value)
+            return node
+        if not isinstance(node, ASTNode) or isinstance(node, FunctionNode):
+            # 嵌套的函数单独解析
+            return node
+
+        node_type = type(node)
+        if node_type is VariableNode:
+            slot = self.function.slot_index.get(node.name)
+            if slot is not None:
+                return LocalVariableNode(node.name, slot, node.position)
+            if node.name not in self.globals:
+                self.errors.append(ResolverError(
+                    f"函数 {self.function.name} 中使用了未定义的变量: {node.name}", node.token))
+            return GlobalVariableNode(node.name, node.position)
+        if node_type is AssignNode and isinstance(node.name, str):
+            return LocalAssignNode(node.name, self.rewrite(node.value), self.function.slot_index[node.name])
+        if node_type is ClassNode:
+            # 方法单独解析，只改写属性的初始值
+            self.rewrite(node.attributes)
+            return node
+
+        for cls in node_type.__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                value = getattr(node, name, None)
+                if isinstance(value, (ASTNode, list, dict)):
+                    setattr(node, name, self.rewrite(value))
+        return node
+
+def bound_names(statements, classes=True):
+    """收集语句中被赋值的变量名（按出现顺序），不进入嵌套的函数和方法
+
+    classes 为 True 时包括语句中定义的类名。
+    """
+    names = []
+    seen = set()
+    stack = [statements]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, ASTNode) and not isinstance(node, FunctionNode):
+            name = None
+            if isinstance(node, AssignNode) and isinstance(node.name, str):
+                name = node.name
+            elif isinstance(node, ClassNode) and classes:
+                name = node.name
+            if name is not None and name not in seen:
+                seen.add(name)
+                names.append(name)
+            if isinstance(node, ClassNode):
+                stack.append(node.attributes)
+                continue
+            children = []
+            for cls in type(node).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    children.append(getattr(node, slot, None))
+            stack.extend(reversed(children))
+    return names
+
+def nested_functions(statements):
+    """找出语句中直接定义的函数和类的方法，不进入函数体"""
+    functions = []
+    stack = [statements]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, FunctionNode):
+            functions.append(node)
+        elif isinstance(node, ClassNode):
+            functions.extend(node.methods)
+            stack.append(node.attributes)
+        elif isinstance(node, ASTNode):
+            for cls in type(node).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    stack.append(getattr(node, slot, None))
+    return functions
+
+def side_effect(func, functions, impure, variables):
+    """找出函数体中第一个使缓存结果不可靠的操作，返回 (描述, 位置) 或 None
+
+    函数中被赋值的名字都是局部变量，不会改变全局变量；这里检查的是打印、
+    给对象属性赋值、执行代码块（可能改变调用者的变量）、导入模块和定义
+    函数（二者改变全局的函数表），以及调用可能有副作用的函数：functions
+    中名字在 impure 里的函数、不在 functions 中的函数（如导入的函数和类）
+    和方法。PURE_BUILTINS 中的内置函数没有副作用。
+
+    结果还可能随可变的状态变化：读取 variables 中的全局变量（顶层赋值过
+    的名字）和读取对象的属性也使缓存的结果不可靠。
+    """
+    if func.local_names is not None:
+        local_names = set(func.local_names)
+    else:
+        local_names = {param.name for param in func.params}
+        local_names.update(bound_names(func.body))
+    stack = [func.body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+            continue
+        if not isinstance(node, ASTNode):
+            continue
+        node_type = type(node)
+        description = None
+        if node_type is PrintNode or node_type is PrintlnNode:
+            description = "打印了输出"
+        elif node_type is CallNode:
+            description = call_effect(node.name, functions, impure)
+        elif node_type is AssignNode and isinstance(node.name, DotAccessNode):
+            description = f"给对象属性 {node.name.member_name} 赋值"
+        elif node_type is NsReturnNode:
+            description = "执行了代码块"
+        elif node_type is ImportNode:
+            description = f"导入了模块 {node.module_name}"
+        elif node_type is FunctionNode:
+            description = f"定义了函数 {node.name}"
+        elif node_type is DotAccessNode:
+            description = f"读取了对象属性 {node.member_name}"
+        elif node_type is GlobalVariableNode or node_type is VariableNode or node_type is ArrayAccessNode:
+            name = node.array if node_type is ArrayAccessNode else node.name
+            if name in variables and (node_type is GlobalVariableNode or name not in local_names):
+                description = f"读取了全局变量 {name}"
+        if description is not None:
+            return description, first_token(node)
+        if node_type is ClassNode:
+            stack.append(node.attributes)
+            continue
+        children = []
+        for cls in node_type.__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                children.append(getattr(node, slot, None))
+        stack.extend(reversed(children))
+    return None
+
+def call_effect(name, functions, impure):
+    """调用 name 可能产生的副作用的描述，没有副作用时返回 None"""
+    if isinstance(name, DotAccessNode):
+        return f"调用了方法 {name.member_name}"
+    if name in PURE_BUILTINS:
+        return None
+    if name == 'print':
+        return "调用了 print"
+    if name not in functions:
+        return f"调用了 {name}，无法确定它没有副作用"
+    if name in impure:
+        return f"调用了有副作用或读取可变状态的函数 {name}"
+    return None
+
+def impure_functions(functions, variables):
+    """可能有副作用或读取可变状态的函数名
+
+    先假定全部函数都没有副作用（递归调用自己不算副作用），反复找出函数体
+    中有副作用（见 side_effect）或者调用了已经确定有副作用的函数，直到不再
+    变化。同名的函数只要有一个有副作用，这个名字就算有副作用。
+    """
+    impure = set()
+    changed = True
+    while changed:
+        changed = False
+        for name, definitions in functions.items():
+            if name in impure:
+                continue
+            if any(side_effect(func, functions, impure, variables) is not None for func in definitions):
+                impure.add(name)
+                changed = True
+    return impure
+
+def defined_functions(statements):
+    """程序中定义的函数（包括嵌套定义的，不包括类的方法）：函数名 -> FunctionNode 列表"""
+    functions = {}
+    stack = [statements]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, FunctionNode):
+            functions.setdefault(node.name, []).append(node)
+            stack.append(node.body)
+        elif isinstance(node, ClassNode):
+            stack.append(node.attributes)
+        elif isinstance(node, ASTNode):
+            for cls in type(node).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    stack.append(getattr(node, slot, None))
+    return functions
+
+def first_token(node):
+    """节点自己或其中第一个带位置的子节点的位置，没有时返回 None"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, PositionedNode) and node.position is not None:
+            return node.token
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, ASTNode) and not isinstance(node, FunctionNode):
+            children = []
+            for cls in type(node).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    children.append(getattr(node, slot, None))
+            stack.extend(reversed(children))
+    return None
@@ -0,0 +1,106 @@
+from array import array
+from bisect import bisect_right
+import mmap
+import re
+
+class StringSource:
+    """内存中的源码字符串，偏移以字符计"""
+    encoded = False
+    newline = '\n'
+
+    def __init__(self, text):
+        self.data = text  # 词法分析器直接扫描的内容
+        self._line_starts = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def slice(self, start, end):
+        """取出 [start, end) 之间的源码文本"""
+        return self.data[start:end]
+
+    @property
+    def line_starts(self):
+        """每一行行首的偏移，第一次需要位置信息时才建立"""
+        if self._line_starts is None:
+            line_starts = array('l', [0])
+            line_starts.extend(match.end() for match in re.finditer(self.newline, self.data))
+            self._line_starts = line_starts
+        return self._line_starts
+
+    def position(self, offset):
+        """将偏移转换为 (行号, 列号)，两者都从1开始，列号以字符计"""
+        line_starts = self.line_starts
+        line = bisect_right(line_starts, offset)
+        return line, len(self.slice(line_starts[line - 1], offset)) + 1
+
+    def line_count(self):
+        """行数，与 str.splitlines() 的结果一致"""
+        line_starts = self.line_starts
+        if line_starts[-1] == len(self):
+            return len(line_starts) - 1
+        return len(line_starts)
+
+    def line(self, index):
+        """第 index 行（从0开始）的内容，不含换行符"""
+        line_starts = self.line_starts
+        start = line_starts[index]
+        end = line_starts[index + 1] - 1 if index + 1 < len(line_starts) else len(self)
+        return self.slice(start, end)
+
+    @property
+    def lines(self):
+        """按需读取的行序列，可以代替 splitlines() 的结果用于错误提示"""
+        return SourceLines(self)
+
+class MappedSource(StringSource):
+    """用 mmap 映射的 UTF-8 源文件，偏移以字节计
+
+    词法分析器直接扫描映射的字节，只有标识符、字符串等需要取值的片段
+    才解码，错误提示所需的代码行也按需从映射中读取。映射在 close()
+    或对象被回收时释放。
+    """
+    encoded = True
+    newline = b'\n'
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件无法映射
+                data = b''
+        super().__init__(data)
+
+    def slice(self, start, end):
+        return self.data[start:end].decode('utf-8')
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            try:
+                self.data.close()
+            except BufferError:
+                # 仍有未释放的扫描器引用映射，留给垃圾回收处理
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SourceLines:
+    """源码行的只读序列视图"""
+    def __init__(self, source):
+        self.source = source
+
+    def __len__(self):
+        return self.source.line_count()
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("行号越界")
+        return self.source.line(index)
@@ -0,0 +1,496 @@
+from .bytecode import (
+    CACHE_VERSION, CodeObject, Compiler,
+    LOAD_CONST, LOAD_NAME, STORE_NAME, POP_TOP, DUP_TOP,
+    BINARY_ADD, BINARY_SUBTRACT, BINARY_MULTIPLY, BINARY_DIVIDE,
+    COMPARE_EQ, COMPARE_LT, COMPARE_GT, COMPARE_LE, COMPARE_GE,
+    JUMP, POP_JUMP_IF_FALSE, PRINT, PRINTNLN,
+    LOAD_CALLEE, LOAD_CALLEE_OR_CLASS, CALL, LOAD_METHOD, CALL_METHOD,
+    RETURN_VALUE, END, NSRETURN, DEFINE_FUNCTION, DEFINE_CLASS, IMPORT,
+    CHECK_INSTANCE, STORE_ATTR, LOAD_ATTR, LOAD_ARRAY, ARRAY_INDEX, RAISE_ERROR,
+    ADD_NAME_CONST, SUBTRACT_NAME_CONST, JUMP_IF_NOT_LESS, JUMP_IF_NOT_LESS_EQUAL,
+    LOAD_FAST, STORE_FAST, LOAD_GLOBAL, ADD_FAST_CONST, SUBTRACT_FAST_CONST,
+    JUMP_IF_NOT_LESS_FAST, JUMP_IF_NOT_LESS_EQUAL_FAST,
+)
+from .parser import FunctionNode
+from .interpreter import (
+    Interpreter, InterpreterError, Return, DEFAULT_MAX_RECURSION_DEPTH,
+    CodeBlock, BCCClass, BCCInstance, UNBOUND
+)
+
+class VMInterpreter(Interpreter):
+    """字节码虚拟机后端
+
+    程序先由 bytecode.Compiler 编译成 CodeObject，再由基于栈的 run() 执行。
+    BCC 函数之间的调用不递归调用 run()：CALL/CALL_METHOD 把调用者的
+    (CodeObject, 指令, 操作数栈, 返回地址) 压入显式的调用栈，切换到被调用
+    函数的字节码继续执行，RETURN_VALUE 再弹出调用者。因此递归深度只受
+    max_recursion_depth 限制，不占用 Python 的调用栈。
+    注册了执行钩子时退回树遍历执行（见 Interpreter.install_hooks）。
+    """
+    # 编译结果缓存文件的后缀
+    CACHE_SUFFIX = '.bcx'
+
+    def __init__(self, parent_module_manager=None, debug=False, ast_cache=None, optimize=0,
+                 max_recursion_depth=DEFAULT_MAX_RECURSION_DEPTH):
+        super().__init__(parent_module_manager, debug, ast_cache, optimize, max_recursion_depth)
+        # 函数体的字节码，以 FunctionNode 为键，以及反过来由字节码找到函数
+        self.function_codes = {}
+        self.code_functions = {}
+        # interpret/evaluate 单个节点时编译出的字节码，以节点对象为键
+        self.node_codes = {}
+        self.expression_codes = {}
+        # CodeObject 的指令数组转成的列表，按列表取指比按数组快
+        self.instructions = {}
+
+    def compile_program(self, ast):
+        """把整个程序的AST编译成 CodeObject"""
+        return Compiler().compile_program(ast)
+
+    def load_program(self, source, parse, ast_cache=None):
+        """得到可执行的程序，编译后的字节码与AST一样缓存在 __bcccache__ 中"""
+        def build():
+            return self.compile_program(self.parse_program(parse))
+        if ast_cache is not None:
+            suffix, version = self.cache_key(self.CACHE_SUFFIX, CACHE_VERSION)
+            return self.cached_program(source, build, ast_cache, suffix, version)
+        return build()
+
+    def interpret(self, node):
+        """执行 CodeObject 或AST节点"""
+        if isinstance(node, CodeObject):
+            return self.run(node)
+        if isinstance(node, list):
+            return self.run(self.compile_program(node))
+        code = self.node_codes.get(node)
+        if code is None:
+            code = self.node_codes[node] = Compiler().compile_node(node)
+        return self.run(code)
+
+    def evaluate(self, node):
+        """计算表达式的值"""
+        code = self.expression_codes.get(node)
+        if code is None:
+            code = self.expression_codes[node] = Compiler().compile_expression(node)
+        return self.run(code)
+
+    def execute_function(self, func, args):
+        """执行函数调用"""
+        code = self.enter_function(func, args)
+        try:
+            return self.run(code)
+        finally:
+            self.leave_function()
+
+    def enter_function(self, func, args):
+        """创建栈帧并进入函数，返回函数体的 CodeObject"""
+        frame = self.new_frame(func, args)
+        code = self.function_codes.get(func)
+        if code is None:
+            # 从其他模块导入的函数在第一次调用时编译
+            code = self.function_codes[func] = Compiler(func.name, is_function=True).compile_function(func)
+            self.code_functions[code] = func
+        self.call_depth += 1
+        self.enter_frame(frame)
+        return code
+
+    def leave_function(self):
+        """回到调用者的栈帧"""
+        self.call_depth -= 1
+        self.enter_frame(self.frame.parent)
+
+    def raise_error(self, description):
+        """按常量池中的 (类型, 消息, 节点) 抛出错误"""
+        error_type, message, node = description
+        if error_type == 'interpreter':
+            raise InterpreterError(message, node)
+        raise Exception(message)
+
+    def run(self, code):
+        """执行 CodeObject，返回 RETURN_VALUE 或 END 的结果
+
+        出错时调用栈上还没有返回的函数不会执行 leave_function，这里恢复进入
+        run() 时的栈帧和调用层数。
+        """
+        frame = self.frame
+        call_depth = self.call_depth
+        try:
+            return self.dispatch(code)
+        except BaseException:
+            self.call_depth = call_depth
+            self.enter_frame(frame)
+            raise
+
+    def dispatch(self, code):
+        """run() 的指令循环"""
+        instructions = self.instructions.get(code)
+        if instructions is None:
+            instructions = self.instructions[code] = code.code.tolist()
+        consts = code.consts
+        names = code.names
+        nodes = code.nodes
+        builtins = self.builtin_functions
+        functions = self.functions
+        variables = self.variables
+        global_variables = self.globals
+        slots = self.frame.slots
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        # 调用者的 (CodeObject, 指令, 操作数栈, 返回地址)
+        calls = []
+
+        # 按执行频率排列的分派链
+        while True:
+            opcode = instructions[pc]
+            if opcode == LOAD_FAST:
+                value = slots[instructions[pc + 1]]
+                if value is UNBOUND:
+                    # 局部变量还没有赋值时读取同名的全局变量
+                    value = self.load_global(nodes[pc])
+                push(value)
+                pc += 2
+            elif opcode == LOAD_NAME:
+                try:
+                    push(variables[names[instructions[pc + 1]]])
+                except KeyError:
+                    push(self.load_variable(nodes[pc]))
+                pc += 2
+            elif opcode == LOAD_CONST:
+                push(consts[instructions[pc + 1]])
+                pc += 2
+            elif opcode == STORE_FAST:
+                slots[instructions[pc + 1]] = pop()
+                pc += 2
+            elif opcode == STORE_NAME:
+                variables[names[instructions[pc + 1]]] = pop()
+                pc += 2
+            elif opcode == LOAD_GLOBAL:
+                try:
+                    push(global_variables[names[instructions[pc + 1]]])
+                except KeyError:
+                    push(self.load_global(nodes[pc]))
+                pc += 2
+            elif opcode == ADD_FAST_CONST:
+                slot = instructions[pc + 1]
+                value = slots[slot]
+                if value is UNBOUND:
+                    value = self.load_global(nodes[pc])
+                slots[slot] = value + consts[instructions[pc + 2]]
+                pc += 3
+            elif opcode == JUMP_IF_NOT_LESS_FAST:
+                value = slots[instructions[pc + 1]]
+                if value is UNBOUND:
+                    value = self.load_global(nodes[pc])
+                if value < consts[instructions[pc + 2]]:
+                    pc += 4
+                else:
+                    pc = instructions[pc + 3]
+            elif opcode == ADD_NAME_CONST:
+                name = names[instructions[pc + 1]]
+                try:
+                    value = variables[name]
+                except KeyError:
+                    value = self.load_variable(nodes[pc])
+                variables[name] = value + consts[instructions[pc + 2]]
+                pc += 3
+            elif opcode == JUMP_IF_NOT_LESS:
+                name = names[instructions[pc + 1]]
+                try:
+                    value = variables[name]
+                except KeyError:
+                    value = self.load_variable(nodes[pc])
+                if value < consts[instructions[pc + 2]]:
+                    pc += 4
+                else:
+                    pc = instructions[pc + 3]
+            elif opcode == JUMP:
+                pc = instructions[pc + 1]
+            elif opcode == POP_JUMP_IF_FALSE:
+                if pop():
+                    pc += 2
+                else:
+                    pc = instructions[pc + 1]
+            elif opcode == BINARY_ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+                pc += 1
+            elif opcode == BINARY_SUBTRACT:
+                right = pop()
+                stack[-1] = stack[-1] - right
+                pc += 1
+            elif opcode == BINARY_MULTIPLY:
+                right = pop()
+                stack[-1] = stack[-1] * right
+                pc += 1
+            elif opcode == COMPARE_LT:
+                right = pop()
+                stack[-1] = stack[-1] < right
+                pc += 1
+            elif opcode == JUMP_IF_NOT_LESS_EQUAL:
+                name = names[instructions[pc + 1]]
+                try:
+                    value = variables[name]
+                except KeyError:
+                    value = self.load_variable(nodes[pc])
+                if value <= consts[instructions[pc + 2]]:
+                    pc += 4
+                else:
+                    pc = instructions[pc + 3]
+            elif opcode == JUMP_IF_NOT_LESS_EQUAL_FAST:
+                value = slots[instructions[pc + 1]]
+                if value is UNBOUND:
+                    value = self.load_global(nodes[pc])
+                if value <= consts[instructions[pc + 2]]:
+                    pc += 4
+                else:
+                    pc = instructions[pc + 3]
+            elif opcode == SUBTRACT_FAST_CONST:
+                slot = instructions[pc + 1]
+                value = slots[slot]
+                if value is UNBOUND:
+                    value = self.load_global(nodes[pc])
+                slots[slot] = value - consts[instructions[pc + 2]]
+                pc += 3
+            elif opcode == SUBTRACT_NAME_CONST:
+                name = names[instructions[pc + 1]]
+                try:
+                    value = variables[name]
+                except KeyError:
+                    value = self.load_variable(nodes[pc])
+                variables[name] = value - consts[instructions[pc + 2]]
+                pc += 3
+            elif opcode == POP_TOP:
+                pop()
+                pc += 1
+            elif opcode == DUP_TOP:
+                push(stack[-1])
+                pc += 1
+            elif opcode == CALL:
+                count = instructions[pc + 1]
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                else:
+                    args = []
+                callee = pop()
+                if isinstance(callee, FunctionNode):
+                    if callee.memo:
+                        # 先查找结果缓存，未命中时另外执行函数
+                        push(self.call_memoized(callee, args))
+                        pc += 2
+                        continue
+                    # 在当前循环中执行被调用的函数
+                    calls.append((code, instructions, stack, pc + 2))
+                    code = self.enter_function(callee, args)
+                    instructions = self.instructions.get(code)
+                    if instructions is None:
+                        instructions = self.instructions[code] = code.code.tolist()
+                    consts = code.consts
+                    names = code.names
+                    nodes = code.nodes
+                    variables = self.variables
+                    slots = self.frame.slots
+                    stack = []
+                    push = stack.append
+                    pop = stack.pop
+                    pc = 0
+                else:
+                    push(callee(args))
+                    pc += 2
+            elif opcode == LOAD_CALLEE:
+                name, node = consts[instructions[pc + 1]]
+                if name in builtins:
+                    push(builtins[name])
+                elif name in functions:
+                    push(functions[name])
+                else:
+                    raise InterpreterError(f"未定义的函数: {name}", node, node.token)
+                pc += 2
+            elif opcode == LOAD_CALLEE_OR_CLASS:
+                name, node = consts[instructions[pc + 1]]
+                if name in builtins:
+                    push(builtins[name])
+                    pc += 3
+                elif isinstance(self.get_variable(name), BCCClass):
+                    # 创建类实例，不计算参数
+                    push(BCCInstance(self.get_variable(name)))
+                    pc = instructions[pc + 2]
+                elif name in functions:
+                    push(functions[name])
+                    pc += 3
+                else:
+                    raise InterpreterError(f"未定义的函数或类: {name}", node, node.token)
+            elif opcode == COMPARE_GT:
+                right = pop()
+                stack[-1] = stack[-1] > right
+                pc += 1
+            elif opcode == COMPARE_LE:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+                pc += 1
+            elif opcode == COMPARE_GE:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+                pc += 1
+            elif opcode == COMPARE_EQ:
+                right = pop()
+                stack[-1] = stack[-1] == right
+                pc += 1
+            elif opcode == BINARY_DIVIDE:
+                right = pop()
+                stack[-1] = stack[-1] / right
+                pc += 1
+            elif opcode == RETURN_VALUE:
+                if code.is_function:
+                    if not calls:
+                        return pop()
+                    # 回到调用者，把返回值压入调用者的操作数栈
+                    value = pop()
+                    self.leave_function()
+                    code, instructions, stack, pc = calls.pop()
+                    consts = code.consts
+                    names = code.names
+                    nodes = code.nodes
+                    variables = self.variables
+                    slots = self.frame.slots
+                    push = stack.append
+                    pop = stack.pop
+                    push(value)
+                elif self.call_depth:
+                    # 代码块中的 return，由执行代码块的函数返回
+                    return Return(pop())
+                else:
+                    raise InterpreterError("return 语句只能在函数中使用", nodes.get(pc))
+            elif opcode == PRINT:
+                print(pop())
+                pc += 1
+            elif opcode == PRINTNLN:
+                print(pop(), end='')
+                pc += 1
+            elif opcode == LOAD_METHOD:
+                member, node, cache = consts[instructions[pc + 1]]
+                obj = pop()
+                if not isinstance(obj, BCCInstance):
+                    raise InterpreterError(f"无法在非对象类型上调用方法", node)
+                if cache.key is obj.bcc_class:
+                    cache.hits += 1
+                    push(cache.value)
+                else:
+                    push(self.cached_method(obj, member, cache))
+                push(obj)
+                pc += 2
+            elif opcode == CALL_METHOD:
+                count = instructions[pc + 1]
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                else:
+                    args = []
+                obj = pop()
+                method = pop()
+                # 将实例作为第一个参数（self）传入
+                calls.append((code, instructions, stack, pc + 2))
+                code = self.enter_function(method, [obj] + args)
+                instructions = self.instructions.get(code)
+                if instructions is None:
+                    instructions = self.instructions[code] = code.code.tolist()
+                consts = code.consts
+                names = code.names
+                nodes = code.nodes
+                variables = self.variables
+                slots = self.frame.slots
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                pc = 0
+            elif opcode == LOAD_ATTR:
+                member, node, cache = consts[instructions[pc + 1]]
+                obj = pop()
+                if not isinstance(obj, BCCInstance):
+                    raise InterpreterError(f"无法访问非对象类型的属性", node)
+                if cache.key is obj.shape:
+                    cache.hits += 1
+                    push(obj.values[cache.value])
+                else:
+                    push(self.cached_attribute(obj, member, cache))
+                pc += 2
+            elif opcode == CHECK_INSTANCE:
+                if not isinstance(stack[-1], BCCInstance):
+                    self.raise_error(consts[instructions[pc + 1]])
+                pc += 2
+            elif opcode == STORE_ATTR:
+                member, cache = consts[instructions[pc + 1]]
+                value = pop()
+                obj = pop()
+                if cache.key is obj.shape:
+                    cache.hits += 1
+                    obj.values[cache.value] = value
+                else:
+                    self.cached_store(obj, member, value, cache)
+                push(value)
+                pc += 2
+            elif opcode == LOAD_ARRAY:
+                name, node = consts[instructions[pc + 1]]
+                array = self.get_variable(name)
+                if array is None:
+                    raise InterpreterError(f"未定义的变量: {name}", node)
+                if not hasattr(array, 'lines'):
+                    raise InterpreterError(f"变量 {name} 不是数组", node)
+                push(array)
+                pc += 2
+            elif opcode == ARRAY_INDEX:
+                name, node = consts[instructions[pc + 1]]
+                index = pop()
+                array = pop()
+                if not isinstance(index, int):
+                    raise InterpreterError("数组索引必须是整数", node)
+                if index < 0 or index >= len(array.lines):
+                    raise InterpreterError("数组索引越界", node)
+                push(array.lines[index])
+                pc += 2
+            elif opcode == NSRETURN:
+                value = pop()
+                if isinstance(value, CodeBlock):
+                    value = value.execute()
+                    if type(value) is Return:
+                        if not code.is_function:
+                            return value
+                        # 代码块中执行了 return：由最后的 RETURN_VALUE 返回
+                        push(value.value)
+                        pc = len(instructions) - 1
+                        continue
+                pc += 1
+            elif opcode == DEFINE_FUNCTION:
+                func, func_code = consts[instructions[pc + 1]]
+                self.function_codes[func] = func_code
+                self.code_functions[func_code] = func
+                functions[func.name] = func
+                pc += 2
+            elif opcode == DEFINE_CLASS:
+                node, methods = consts[instructions[pc + 1]]
+                # 处理方法
+                method_nodes = {}
+                for method, method_code in methods:
+                    self.function_codes[method] = method_code
+                    self.code_functions[method_code] = method
+                    method_nodes[method.name] = method
+                # 处理属性的初始值
+                count = len(node.attributes)
+                values = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                attributes = dict(zip(node.attributes, values))
+                # 创建类对象
+                bcc_class = BCCClass(node.name, method_nodes, attributes)
+                self.store_variable(node.name, bcc_class)
+                push(bcc_class)
+                pc += 2
+            elif opcode == IMPORT:
+                self.import_module(consts[instructions[pc + 1]])
+                pc += 2
+            elif opcode == RAISE_ERROR:
+                self.raise_error(consts[instructions[pc + 1]])
+            elif opcode == END:
+                return stack[-1] if stack else None
+            else:
+                raise InterpreterError(f"未知的操作码: {opcode}")